@@ -0,0 +1,237 @@
+import copy
+import logging
+import math
+import threading
+from collections import OrderedDict, deque
+from typing import Iterable, List, Optional, Tuple
+
+from result_cache import CacheBackend
+
+logger = logging.getLogger(__name__)
+
+
+class RunningStats:
+    """Welford's online mean/variance."""
+
+    __slots__ = ("n", "mean", "m2")
+
+    def __init__(self, n: int = 0, mean: float = 0.0, m2: float = 0.0):
+        self.n = n
+        self.mean = mean
+        self.m2 = m2
+
+    def update(self, x: float):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+    @property
+    def std(self) -> float:
+        """Population standard deviation (what ``np.std`` computes)."""
+        return math.sqrt(self.m2 / self.n) if self.n else 0.0
+
+    def zscore(self, x: float, min_count: int = 2) -> Optional[float]:
+        """z-score of ``x``, or None with fewer than ``min_count`` observations.
+        A zero std counts as 1, as in the payload-based spike check."""
+        if self.n < min_count:
+            return None
+        std = self.std
+        return (x - self.mean) / (std if std > 0 else 1)
+
+
+class AccountState:
+    """Rolling per-account history: running stats of amounts and of minutes
+    between transactions, plus the last ``window`` (location, timestamp, amount)
+    and the ids of the last ``MAX_TXN_IDS`` transactions recorded."""
+
+    __slots__ = ("amounts", "gaps", "last_ts", "recent", "txn_ids")
+
+    MAX_TXN_IDS = 64
+
+    def __init__(self, window: int = 10):
+        self.amounts = RunningStats()
+        self.gaps = RunningStats()
+        self.last_ts: Optional[float] = None
+        self.recent: deque = deque(maxlen=window)
+        self.txn_ids: deque = deque(maxlen=self.MAX_TXN_IDS)
+
+    def has_seen(self, txn_id: Optional[str]) -> bool:
+        return txn_id is not None and txn_id in self.txn_ids
+
+    def observe(self, amount: float, location: str, ts: float, txn_id: Optional[str] = None):
+        if txn_id is not None:
+            self.txn_ids.append(txn_id)
+        self.amounts.update(amount)
+        if self.last_ts is not None:
+            self.gaps.update((ts - self.last_ts) / 60)
+        self.last_ts = ts if self.last_ts is None else max(self.last_ts, ts)
+        self.recent.append((location, ts, amount))
+
+    def gap_minutes(self, ts: float) -> Optional[float]:
+        return None if self.last_ts is None else (ts - self.last_ts) / 60
+
+    def window(self) -> List[Tuple[str, float, float]]:
+        """Recent (location, timestamp, amount) entries, newest first."""
+        return list(reversed(self.recent))
+
+    def to_dict(self) -> dict:
+        return {
+            "amounts": [self.amounts.n, self.amounts.mean, self.amounts.m2],
+            "gaps": [self.gaps.n, self.gaps.mean, self.gaps.m2],
+            "last_ts": self.last_ts,
+            "recent": [list(entry) for entry in self.recent],
+            "txn_ids": list(self.txn_ids)
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict, window: int = 10) -> "AccountState":
+        state = cls(window)
+        state.amounts = RunningStats(*data["amounts"])
+        state.gaps = RunningStats(*data["gaps"])
+        state.last_ts = data["last_ts"]
+        state.recent.extend(tuple(entry) for entry in data["recent"])
+        state.txn_ids.extend(data.get("txn_ids", ()))
+        return state
+
+
+class AccountStateStore:
+    """Per-account ``AccountState``.
+
+    Without ``persistent`` the states live in a bounded in-memory LRU local to
+    the process. With a shared ``CacheBackend`` (e.g. Redis) that backend is
+    the only copy: every ``observe`` re-reads the account and writes it back
+    in one atomic read-modify-write (``CacheBackend.update``), so workers
+    sharing it never overwrite each other's transactions. The network calls
+    are made outside the store lock.
+
+    Scoring reads a copy with ``snapshot``; the transaction is recorded with
+    ``observe`` once it has been scored. An ``observe`` whose ``txn_id`` the
+    account has already recorded (a client retry) changes nothing.
+    """
+
+    def __init__(self, max_accounts: int = 100000, window: int = 10,
+                 persistent: Optional[CacheBackend] = None, ttl: float = 30 * 24 * 3600.0):
+        self.max_accounts = max_accounts
+        self.window = window
+        self.persistent = persistent
+        self.ttl = ttl
+        self._states: "OrderedDict[str, AccountState]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.hits = 0
+        self.persistent_hits = 0
+        self.seeded = 0
+        self.observed = 0
+        self.duplicates = 0
+        self.backend_errors = 0
+
+    def _seed(self, history: Iterable[Tuple[float, str, float]]) -> AccountState:
+        state = AccountState(self.window)
+        for past_amount, past_location, past_ts in sorted(history, key=lambda entry: entry[2]):
+            state.observe(past_amount, past_location, past_ts)
+        return state
+
+    def snapshot(self, account: str, history: Iterable[Tuple[float, str, float]] = ()) -> AccountState:
+        """A copy of the account's state, or one seeded from ``history`` for an
+        account not seen yet; the store itself is left unchanged."""
+        if self.persistent is not None:
+            try:
+                data = self.persistent.get(account)
+            except Exception as e:
+                with self._lock:
+                    self.backend_errors += 1
+                logger.warning(f"account state: backend get failed: {str(e)}")
+                data = None
+            return AccountState.from_dict(data, self.window) if data is not None else self._seed(history)
+        with self._lock:
+            state = self._states.get(account)
+            if state is not None:
+                return copy.deepcopy(state)
+        return self._seed(history)
+
+    def _observe_local(self, account: str, amount: float, location: str, ts: float,
+                       history: Iterable[Tuple[float, str, float]], txn_id: Optional[str]) -> AccountState:
+        with self._lock:
+            state = self._states.get(account)
+            if state is not None:
+                self._states.move_to_end(account)
+                self.hits += 1
+            else:
+                state = self._seed(history)
+                self._states[account] = state
+                while len(self._states) > self.max_accounts:
+                    self._states.popitem(last=False)
+                self.seeded += 1
+            before = copy.deepcopy(state)
+            if state.has_seen(txn_id):
+                self.duplicates += 1
+            else:
+                state.observe(amount, location, ts, txn_id)
+                self.observed += 1
+        return before
+
+    def _observe_shared(self, account: str, amount: float, location: str, ts: float,
+                        history: Iterable[Tuple[float, str, float]], txn_id: Optional[str]) -> AccountState:
+        history = list(history)
+        # Written by the last (committed) run of apply; it may run again on a conflict
+        result = {}
+
+        def apply(data: Optional[dict]) -> dict:
+            state = AccountState.from_dict(data, self.window) if data is not None else self._seed(history)
+            result["before"] = copy.deepcopy(state)
+            result["found"] = data is not None
+            result["duplicate"] = state.has_seen(txn_id)
+            if not result["duplicate"]:
+                state.observe(amount, location, ts, txn_id)
+            return state.to_dict()
+
+        try:
+            self.persistent.update(account, apply, self.ttl)
+        except Exception as e:
+            # Without the shared copy the account is scored from the payload alone
+            with self._lock:
+                self.backend_errors += 1
+            logger.warning(f"account state: backend update failed: {str(e)}")
+            return self._seed(history)
+        with self._lock:
+            if result["found"]:
+                self.persistent_hits += 1
+            else:
+                self.seeded += 1
+            if result["duplicate"]:
+                self.duplicates += 1
+            else:
+                self.observed += 1
+        return result["before"]
+
+    def observe(self, account: str, amount: float, location: str, ts: float,
+                history: Iterable[Tuple[float, str, float]] = (), txn_id: Optional[str] = None) -> AccountState:
+        """Records a scored transaction and returns the state as it was before it.
+
+        An account seen for the first time is seeded from ``history``
+        ((amount, location, timestamp) entries, e.g. the payload's previous
+        transactions) before the new transaction is recorded. A ``txn_id``
+        the account has already recorded is not recorded again.
+        """
+        if self.persistent is not None:
+            return self._observe_shared(account, amount, location, ts, history, txn_id)
+        return self._observe_local(account, amount, location, ts, history, txn_id)
+
+    def __len__(self):
+        return len(self._states)
+
+    def stats(self) -> dict:
+        return {
+            "accounts": len(self._states),
+            "max_accounts": self.max_accounts,
+            "window": self.window,
+            "persistent": type(self.persistent).__name__ if self.persistent is not None else None,
+            "hits": self.hits,
+            "persistent_hits": self.persistent_hits,
+            "seeded": self.seeded,
+            "observed": self.observed,
+            "duplicates": self.duplicates,
+            "backend_errors": self.backend_errors
+        }
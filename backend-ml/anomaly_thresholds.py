@@ -0,0 +1,122 @@
+"""Calibrated decision thresholds for the KMeans and autoencoder detectors.
+
+A row is anomalous when its distance to the nearest KMeans centre, or its
+autoencoder reconstruction MSE, exceeds the given percentile of the same
+quantity over a reference dataset. The thresholds are computed once here and
+saved as a small versioned JSON file next to the model artifacts:
+
+    anomaly_thresholds.json      the thresholds the API loads
+    anomaly_thresholds.v<N>.json a copy of every calibration, for rollback
+
+Usage:
+    python anomaly_thresholds.py calibrate --data reference.csv [--percentile 95] [--out anomaly_thresholds.json]
+    python anomaly_thresholds.py show [--path anomaly_thresholds.json]
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import List, Optional
+
+import numpy as np
+
+DEFAULT_THRESHOLDS_PATH = 'anomaly_thresholds.json'
+CALIBRATED_ARTIFACTS = [
+    'preprocessor.pkl', 'scaler.pkl', 'kmeans_model.pkl', 'autoencoder_model.h5', 'autoencoder_weights.npz'
+]
+
+
+def kmeans_distances(kmeans, X_scaled: np.ndarray) -> np.ndarray:
+    """Distance from each row to the centre of its assigned cluster."""
+    labels = kmeans.predict(X_scaled)
+    return np.linalg.norm(X_scaled - kmeans.cluster_centers_[labels], axis=1)
+
+
+def reconstruction_mse(autoencoder, X_scaled: np.ndarray) -> np.ndarray:
+    reconstruction = autoencoder.predict(X_scaled, batch_size=1024, verbose=0)
+    return np.mean(np.power(X_scaled - reconstruction, 2), axis=1)
+
+
+def load_thresholds(path: str = DEFAULT_THRESHOLDS_PATH) -> Optional[dict]:
+    """Returns the saved thresholds, or None when nothing has been calibrated."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        thresholds = json.load(f)
+    for key in ("kmeans_distance", "autoencoder_mse"):
+        if not isinstance(thresholds.get(key), (int, float)):
+            raise ValueError(f"{path} has no numeric {key} threshold")
+    return thresholds
+
+
+def _fingerprint(path: str) -> Optional[str]:
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def calibrate(data_path: str, percentile: float = 95.0, out_path: str = DEFAULT_THRESHOLDS_PATH) -> dict:
+    """Scores the reference CSV (with the /predict input columns) through the
+    preprocessor, scaler, KMeans and autoencoder and saves the thresholds."""
+    import pandas as pd
+
+    from model_artifacts import OLD_MODEL_FEATURES, OLD_MODEL_INPUT_FIELDS, register_fraud_artifacts
+    from model_registry import ModelRegistry
+
+    registry = ModelRegistry()
+    register_fraud_artifacts(registry)
+    data = pd.read_csv(data_path)
+    input_old = data[OLD_MODEL_INPUT_FIELDS]
+    input_old.columns = OLD_MODEL_FEATURES
+    X_scaled = registry.get("scaler").transform(registry.get("preprocessor").transform(input_old))
+
+    distances = kmeans_distances(registry.get("kmeans"), X_scaled)
+    mses = reconstruction_mse(registry.get("autoencoder"), X_scaled)
+
+    previous = load_thresholds(out_path)
+    thresholds = {
+        "version": (previous or {}).get("version", 0) + 1,
+        "calibrated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "percentile": percentile,
+        "kmeans_distance": float(np.percentile(distances, percentile)),
+        "autoencoder_mse": float(np.percentile(mses, percentile)),
+        "reference": {"path": os.path.basename(data_path), "rows": len(data), "sha256": _fingerprint(data_path)},
+        "artifacts": {name: _fingerprint(name) for name in CALIBRATED_ARTIFACTS}
+    }
+    with open(out_path, "w") as f:
+        json.dump(thresholds, f, indent=2)
+    root, ext = os.path.splitext(out_path)
+    shutil.copyfile(out_path, f"{root}.v{thresholds['version']}{ext}")
+    return thresholds
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Calibrate the KMeans and autoencoder anomaly thresholds")
+    sub = parser.add_subparsers(dest="command", required=True)
+    calibrate_cmd = sub.add_parser("calibrate", help="Compute thresholds over a reference CSV")
+    calibrate_cmd.add_argument("--data", required=True, help="CSV with the /predict input columns")
+    calibrate_cmd.add_argument("--percentile", type=float, default=95.0)
+    calibrate_cmd.add_argument("--out", default=DEFAULT_THRESHOLDS_PATH)
+    show_cmd = sub.add_parser("show", help="Print the current thresholds")
+    show_cmd.add_argument("--path", default=DEFAULT_THRESHOLDS_PATH)
+    args = parser.parse_args(argv)
+
+    if args.command == "calibrate":
+        thresholds = calibrate(args.data, args.percentile, args.out)
+        print(f"Wrote version {thresholds['version']} to {args.out}: "
+              f"kmeans_distance={thresholds['kmeans_distance']:.6g}, "
+              f"autoencoder_mse={thresholds['autoencoder_mse']:.6g} "
+              f"(p{thresholds['percentile']:g} of {thresholds['reference']['rows']} rows)")
+    else:
+        thresholds = load_thresholds(args.path)
+        print(json.dumps(thresholds, indent=2) if thresholds else f"No thresholds at {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+import httpx
+import requests
+
+from streaming import parse_sse, text_chunks
+
+logger = logging.getLogger(__name__)
+
+# Headers required by the Einstein generations API on every call
+EINSTEIN_HEADERS = {
+    "Content-Type": "application/json",
+    "x-sfdc-app-context": "EinsteinGPT",
+    "x-client-feature-id": "ai-platform-models-connected-app"
+}
+
+
+class EinsteinTokenService:
+    """Process-wide Einstein access token shared by the fraud app and the
+    LangGraph agent.
+
+    The token is refreshed by a background thread ``refresh_margin`` seconds
+    before it expires, so requests normally just read the cached value. If a
+    request does find the token missing or expired, the refresh is
+    single-flight: one caller fetches it while the rest wait on the lock and
+    reuse the result, instead of all hitting the token URL at once.
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, token_url: str, client_id: str, client_secret: str,
+                 refresh_margin: Optional[float] = None, default_ttl: Optional[float] = None):
+        if not all([client_id, client_secret, token_url]):
+            raise ValueError("EINSTEIN_CLIENT_ID, EINSTEIN_CLIENT_SECRET, and EINSTEIN_TOKEN_URL must be set in the .env file")
+        self.token_url = token_url
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.refresh_margin = (refresh_margin if refresh_margin is not None
+                               else float(os.getenv("EINSTEIN_TOKEN_REFRESH_MARGIN_SECONDS", "120")))
+        # Used when the token response carries no expires_in
+        self.default_ttl = (default_ttl if default_ttl is not None
+                            else float(os.getenv("EINSTEIN_TOKEN_TTL_SECONDS", "1800")))
+        self.access_token: Optional[str] = None
+        self.token_expiry = 0.0
+        self.valid_until = 0.0
+        self.refresh_at = 0.0
+        self.refreshes = 0
+        self._lock = threading.Lock()
+        self._session = requests.Session()
+        self._refresher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @classmethod
+    def instance(cls) -> "EinsteinTokenService":
+        """Returns the shared service, configured from the environment."""
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls(
+                        os.getenv("EINSTEIN_TOKEN_URL"),
+                        os.getenv("EINSTEIN_CLIENT_ID"),
+                        os.getenv("EINSTEIN_CLIENT_SECRET")
+                    )
+        return cls._instance
+
+    @classmethod
+    def after_fork(cls):
+        """Drops an instance inherited from a parent process: its refresher
+        thread did not survive the fork and its locks may be held. The child
+        creates (and starts) its own on next use."""
+        cls._instance = None
+        cls._instance_lock = threading.Lock()
+
+    def _cached_token(self) -> Optional[str]:
+        if self.access_token and time.time() < self.valid_until:
+            return self.access_token
+        return None
+
+    def get_access_token(self) -> str:
+        """Returns a valid token, fetching one (single-flight) only if needed."""
+        token = self._cached_token()
+        if token:
+            return token
+        with self._lock:
+            # Another thread may have refreshed while we waited for the lock
+            token = self._cached_token()
+            if token:
+                return token
+            return self._fetch()
+
+    async def aget_access_token(self) -> str:
+        """Async variant: free when the token is cached, otherwise the blocking
+        fetch runs in a worker thread."""
+        token = self._cached_token()
+        if token:
+            return token
+        return await asyncio.to_thread(self.get_access_token)
+
+    def _fetch(self) -> str:
+        # Callers hold self._lock
+        try:
+            response = self._session.post(
+                self.token_url,
+                data={
+                    "grant_type": "client_credentials",
+                    "client_id": self.client_id,
+                    "client_secret": self.client_secret
+                },
+                timeout=10
+            )
+            response.raise_for_status()
+            token_data = response.json()
+        except Exception as e:
+            logger.error(f"Error fetching Einstein AI token: {str(e)}")
+            raise
+        now = time.time()
+        ttl = float(token_data.get("expires_in") or self.default_ttl)
+        self.access_token = token_data["access_token"]
+        self.token_expiry = now + ttl
+        # Stop handing the token out shortly before it expires (1 minute, or
+        # less for short-lived tokens), and refresh it well before that
+        self.valid_until = self.token_expiry - min(60.0, ttl / 10)
+        self.refresh_at = now + max(ttl / 2, ttl - self.refresh_margin)
+        self.refreshes += 1
+        logger.info("Fetched new Einstein AI access token")
+        return self.access_token
+
+    def start(self):
+        """Starts the background refresher (idempotent). The first fetch happens
+        right away so the token is warm before traffic arrives."""
+        if self._refresher is not None and self._refresher.is_alive():
+            return
+        self._stop.clear()
+        self._refresher = threading.Thread(target=self._refresh_loop, name="einstein-token-refresher", daemon=True)
+        self._refresher.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _refresh_loop(self):
+        while not self._stop.is_set():
+            wait = self.refresh_at - time.time()
+            if wait > 0:
+                if self._stop.wait(wait):
+                    return
+                continue
+            try:
+                with self._lock:
+                    self._fetch()
+            except Exception:
+                # Keep serving the current token (if any) and retry shortly
+                remaining = self.token_expiry - time.time()
+                self._stop.wait(min(30.0, max(5.0, remaining / 4)))
+
+
+class EinsteinClient:
+    """Async client for the Einstein generations API.
+
+    All calls share one ``httpx.AsyncClient`` so connections to Einstein are
+    pooled and kept alive between requests instead of being re-established
+    (TLS handshake included) for every prompt. The client is created lazily on
+    first use so it binds to the running event loop.
+    """
+
+    def __init__(self, api_url: str, token_provider: Callable[[], Awaitable[str]],
+                 timeout: Optional[float] = None, connect_timeout: Optional[float] = None,
+                 max_connections: Optional[int] = None,
+                 sync_token_provider: Optional[Callable[[], str]] = None):
+        self.api_url = api_url
+        self.token_provider = token_provider
+        # For generate_raw_sync, used by callers outside an event loop
+        self.sync_token_provider = sync_token_provider
+        self.timeout = timeout if timeout is not None else float(os.getenv("EINSTEIN_TIMEOUT_SECONDS", "30"))
+        self.connect_timeout = (connect_timeout if connect_timeout is not None
+                                else float(os.getenv("EINSTEIN_CONNECT_TIMEOUT_SECONDS", "5")))
+        self.max_connections = (max_connections if max_connections is not None
+                                else int(os.getenv("EINSTEIN_MAX_CONNECTIONS", "20")))
+        # Streaming generations endpoint (server-sent events); without one,
+        # generate_stream falls back to chunking the finished generation
+        self.stream_url = os.getenv("EINSTEIN_STREAM_API_URL")
+        self._warned_no_stream = False
+        self._client: Optional[httpx.AsyncClient] = None
+        self._session: Optional[requests.Session] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=60
+                )
+            )
+        return self._client
+
+    @property
+    def session(self) -> requests.Session:
+        """Pooled session for the synchronous calls, with the same pool size."""
+        if self._session is None:
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.max_connections)
+            self._session = requests.Session()
+            self._session.mount("https://", adapter)
+            self._session.mount("http://", adapter)
+        return self._session
+
+    def generate_raw_sync(self, prompt: str) -> dict:
+        """Blocking ``generate_raw``, with the same token service and timeouts."""
+        if not self.api_url:
+            raise ValueError("EINSTEIN_API_URL must be set in the .env file")
+        if self.sync_token_provider is None:
+            raise ValueError("generate_raw_sync needs a sync_token_provider")
+
+        headers = {"Authorization": f"Bearer {self.sync_token_provider()}", **EINSTEIN_HEADERS}
+        response = self.session.post(self.api_url, headers=headers, json={"prompt": prompt},
+                                     timeout=(self.connect_timeout, self.timeout))
+        response.raise_for_status()
+        return response.json()
+
+    async def generate_raw(self, prompt: str) -> dict:
+        """Sends ``prompt`` to Einstein and returns the decoded JSON response."""
+        if not self.api_url:
+            raise ValueError("EINSTEIN_API_URL must be set in the .env file")
+
+        access_token = await self.token_provider()
+        headers = {"Authorization": f"Bearer {access_token}", **EINSTEIN_HEADERS}
+        response = await self.client.post(self.api_url, headers=headers, json={"prompt": prompt})
+        response.raise_for_status()
+        return response.json()
+
+    async def generate(self, prompt: str) -> str:
+        """Sends ``prompt`` to Einstein and returns the stripped generated text."""
+        response_data = await self.generate_raw(prompt)
+        return response_data["generation"]["generatedText"].strip()
+
+    async def generate_stream(self, prompt: str) -> AsyncIterator[str]:
+        """Yields the generated text as it arrives from the streaming endpoint.
+
+        The stream is server-sent events whose data is a generation response
+        ({"generation": {"generatedText": ...}}, as from ``generate``),
+        terminated by a "[DONE]" data line or the end of the response; an
+        "error" event raises. Each event normally carries the next piece of
+        text. Some deployments resend the whole text so far instead: once an
+        event extends everything received before it, only the new suffix is
+        yielded from then on.
+
+        Without EINSTEIN_STREAM_API_URL there is nothing to stream from: the
+        whole generation is awaited and then split with ``text_chunks`` (a
+        warning is logged once).
+        """
+        if not self.stream_url:
+            if not self._warned_no_stream:
+                logger.warning("EINSTEIN_STREAM_API_URL is not set; streaming chunks the finished generation")
+                self._warned_no_stream = True
+            for chunk in text_chunks(await self.generate(prompt)):
+                yield chunk
+            return
+
+        access_token = await self.token_provider()
+        headers = {"Authorization": f"Bearer {access_token}", "Accept": "text/event-stream", **EINSTEIN_HEADERS}
+        async with self.client.stream("POST", self.stream_url, headers=headers, json={"prompt": prompt}) as response:
+            response.raise_for_status()
+            received, cumulative = "", False
+            async for event, data in parse_sse(response.aiter_lines()):
+                if data == "[DONE]":
+                    break
+                if event == "error":
+                    raise RuntimeError(f"Einstein stream failed: {data}")
+                text = (json.loads(data).get("generation") or {}).get("generatedText")
+                if not text:
+                    continue
+                if not cumulative and received and len(text) > len(received) and text.startswith(received):
+                    cumulative = True
+                if cumulative:
+                    if not text.startswith(received):
+                        raise ValueError("Einstein stream resent text that does not extend the text so far")
+                    text, received = text[len(received):], text
+                else:
+                    received += text
+                if text:
+                    yield text
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self._session is not None:
+            self._session.close()
+            self._session = None
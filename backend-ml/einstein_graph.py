@@ -1,7 +1,6 @@
 import os
-import requests
+import httpx
 import json
-import time
 import uuid
 from typing import TypedDict, Annotated, Sequence, Optional, Dict
 
@@ -9,11 +8,15 @@ from fastapi import FastAPI, Body, HTTPException
 from pydantic import BaseModel, Field
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, ToolMessage, AnyMessage
 from langchain_core.tools import tool
+from langchain_core.callbacks import adispatch_custom_event
 from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda
 from langgraph.graph import StateGraph, END, START
 from langgraph.prebuilt import ToolNode, tools_condition
-from langgraph.graph.message import add_messages
 from dotenv import load_dotenv
+from einstein_client import EinsteinClient, EinsteinTokenService
+from session_store import SessionCheckpointer, capped_messages
+from prompt_history import HistoryRenderer
+from streaming import sse_event, sse_response, text_chunks
 
 # --- 0. Load Environment Variables & Setup ---
 
@@ -33,45 +36,66 @@ load_dotenv()
 BASE_URL = os.getenv("BASE_URL", "http://localhost:5000/api/v1/admin")
 
 # --- 1. Define Tool Schemas and Functions ---
-# This section remains unchanged. The tools define the capabilities of your agent.
+# The tools define the capabilities of your agent. They are async and share one
+# pooled client to the Node backend, so a chat turn waiting on a tool does not
+# block the worker.
+
+_node_client: Optional[httpx.AsyncClient] = None
+
+def node_client() -> httpx.AsyncClient:
+    """The shared Node backend client, created on first use so it binds to the running event loop."""
+    global _node_client
+    if _node_client is None or _node_client.is_closed:
+        max_connections = int(os.getenv("NODE_API_MAX_CONNECTIONS", "20"))
+        _node_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(float(os.getenv("NODE_API_TIMEOUT_SECONDS", "30")), connect=5.0),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections,
+                                keepalive_expiry=60)
+        )
+    return _node_client
+
+def _request_failed(e: httpx.HTTPError) -> dict:
+    details = e.response.text if isinstance(e, httpx.HTTPStatusError) else "No response"
+    return {"error": f"API request failed: {e}", "details": details}
 
 class GetStatsByRegionArgs(BaseModel):
     """Input schema for the get_stats_by_region tool."""
     region: str = Field(..., description="The region to get statistics for (e.g., 'North', 'South').")
 
 @tool(args_schema=GetStatsByRegionArgs)
-def get_stats_by_region(region: str) -> dict:
+async def get_stats_by_region(region: str) -> dict:
     """
     Fetches statistics for a specific region by hitting the /stats/region endpoint.
     """
     print(f"--- Calling Tool: get_stats_by_region with region: {region} ---")
     try:
-        response = requests.get(
+        response = await node_client().request(
+            "GET",
             f"{BASE_URL}/stats/region",
             json={"region": region},
             headers={"Content-Type": "application/json"}
         )
         response.raise_for_status()
         return response.json()
-    except requests.exceptions.RequestException as e:
-        return {"error": f"API request failed: {e}", "details": str(e.response.text if e.response else "No response")}
+    except httpx.HTTPError as e:
+        return _request_failed(e)
 
 class GetStatsByUserArgs(BaseModel):
     """Input schema for the get_stats_by_user tool."""
     user_id: str = Field(..., description="The unique identifier of the user.")
 
 @tool(args_schema=GetStatsByUserArgs)
-def get_stats_by_user(user_id: str) -> dict:
+async def get_stats_by_user(user_id: str) -> dict:
     """
     Fetches statistics for a specific user by ID by hitting the /stats/user/:id endpoint.
     """
     print(f"--- Calling Tool: get_stats_by_user with user_id: {user_id} ---")
     try:
-        response = requests.get(f"{BASE_URL}/stats/user/{user_id}")
+        response = await node_client().get(f"{BASE_URL}/stats/user/{user_id}")
         response.raise_for_status()
         return response.json()
-    except requests.exceptions.RequestException as e:
-        return {"error": f"API request failed: {e}", "details": str(e.response.text if e.response else "No response")}
+    except httpx.HTTPError as e:
+        return _request_failed(e)
 
 class RegisterEmployeeArgs(BaseModel):
     """Input schema for the register_employee tool."""
@@ -81,106 +105,75 @@ class RegisterEmployeeArgs(BaseModel):
     pin: str = Field(..., description="A numeric PIN for the employee.")
 
 @tool(args_schema=RegisterEmployeeArgs)
-def register_employee(name: str, email: str, contact: str, pin: str) -> dict:
+async def register_employee(name: str, email: str, contact: str, pin: str) -> dict:
     """
     Registers a new employee by hitting the /register-employee endpoint.
     """
     print(f"--- Calling Tool: register_employee with data: name={name}, email={email} ---")
     try:
         payload = {"name": name, "email": email, "contact": contact, "pin": pin}
-        response = requests.post(
+        response = await node_client().post(
             f"{BASE_URL}/register-employee",
             json=payload,
             headers={"Content-Type": "application/json"}
         )
         response.raise_for_status()
         return response.json()
-    except requests.exceptions.RequestException as e:
-        return {"error": f"API request failed: {e}", "details": str(e.response.text if e.response else "No response")}
+    except httpx.HTTPError as e:
+        return _request_failed(e)
 
 # List of tools available to the agent
 tools = [get_stats_by_region, get_stats_by_user, register_employee]
 
 # --- 2. Define Graph State ---
 # The state manages the flow of messages and errors within the graph.
+# A session keeps at most SESSION_MAX_MESSAGES messages; older ones are dropped.
+SESSION_MAX_MESSAGES = int(os.getenv("SESSION_MAX_MESSAGES", "40"))
+
 class State(TypedDict):
-    messages: Annotated[list[AnyMessage], add_messages]
+    messages: Annotated[list[AnyMessage], capped_messages(SESSION_MAX_MESSAGES)]
     error: Optional[str]
 
 # --- 3. Define Einstein AI LLM Integration as a Runnable ---
-# This section manages authentication and interaction with the Einstein AI model.
-
-class EinsteinTokenManager:
-    """Manages fetching and caching of the Einstein AI access token using a Singleton pattern."""
-    _instance = None
-
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super(EinsteinTokenManager, cls).__new__(cls)
-            cls._instance.access_token: Optional[str] = None
-            cls._instance.token_expiry: float = 0.0
-            cls._instance.client_id = os.getenv("EINSTEIN_CLIENT_ID")
-            cls._instance.client_secret = os.getenv("EINSTEIN_CLIENT_SECRET")
-            cls._instance.token_url = os.getenv("EINSTEIN_TOKEN_URL")
-            if not all([cls._instance.client_id, cls._instance.client_secret, cls._instance.token_url]):
-                raise ValueError("EINSTEIN_CLIENT_ID, EINSTEIN_CLIENT_SECRET, and EINSTEIN_TOKEN_URL must be set in the .env file")
-        return cls._instance
-
-    def get_access_token(self) -> str:
-        """Fetches a new token if the current one is expired or non-existent."""
-        if self.access_token and time.time() < self.token_expiry - 60:  # 60-second buffer
-            return self.access_token
-
-        print("--- Fetching new Einstein AI access token ---")
-        try:
-            response = requests.post(
-                self.token_url,
-                data={
-                    "grant_type": "client_credentials",
-                    "client_id": self.client_id,
-                    "client_secret": self.client_secret
-                }
-            )
-            response.raise_for_status()
-            token_data = response.json()
-            self.access_token = token_data["access_token"]
-            self.token_expiry = time.time() + 1800  # Token is valid for 30 minutes
-            print("--- Successfully fetched new token ---")
-            return self.access_token
-        except Exception as e:
-            print(f"Error fetching Einstein AI token: {str(e)}")
-            raise
+# This section manages interaction with the Einstein AI model. Authentication is
+# handled by the shared EinsteinTokenService (see einstein_client.py).
+
+# Prompt size stays bounded however long a session runs: the newest messages
+# that fit in PROMPT_HISTORY_TOKENS go in verbatim, older ones as a short
+# extractive summary of at most PROMPT_SUMMARY_TOKENS.
+PROMPT_HISTORY_TOKENS = int(os.getenv("PROMPT_HISTORY_TOKENS", "3000"))
+PROMPT_SUMMARY_TOKENS = int(os.getenv("PROMPT_SUMMARY_TOKENS", "400"))
+# Tool output is cut to PROMPT_TOOL_CONTENT_CHARS in the prompt
+PROMPT_TOOL_CONTENT_CHARS = int(os.getenv("PROMPT_TOOL_CONTENT_CHARS", "4000"))
+
+# Pooled async Einstein client for the agent (see einstein_client.py)
+einstein_client = EinsteinClient(
+    os.getenv("EINSTEIN_API_URL"),
+    token_provider=lambda: EinsteinTokenService.instance().aget_access_token(),
+    sync_token_provider=lambda: EinsteinTokenService.instance().get_access_token()
+)
+
+# Custom event carrying a piece of the assistant's answer as Einstein
+# generates it (only with EINSTEIN_STREAM_API_URL set)
+STREAM_TOKEN_EVENT = "assistant_token"
 
 class EinsteinRunnable(Runnable):
     """A custom runnable that invokes the Einstein AI model and parses its response."""
 
+    def __init__(self):
+        # System prompts by tool names; the tool schemas never change at runtime
+        self._system_prompts: Dict[tuple, str] = {}
+        self.history = HistoryRenderer(PROMPT_HISTORY_TOKENS, PROMPT_SUMMARY_TOKENS,
+                                       max_tool_chars=PROMPT_TOOL_CONTENT_CHARS)
+
     def invoke(self, state: State, config: Optional[RunnableConfig] = None) -> BaseMessage:
         print("--- Calling Custom Einstein AI Runnable ---")
-        
-        api_url = os.getenv("EINSTEIN_API_URL")
-        if not api_url:
-            raise ValueError("EINSTEIN_API_URL must be set in the .env file")
-            
-        token_manager = EinsteinTokenManager()
-        
+
         prompt_text = self._create_einstein_prompt(state['messages'], tools)
-        
-        try:
-            access_token = token_manager.get_access_token()
-            headers = {
-                "Authorization": f"Bearer {access_token}",
-                "Content-Type": "application/json",
-                # *** ADDED: Required headers for the Einstein API call ***
-                "x-sfdc-app-context": "EinsteinGPT",
-                "x-client-feature-id": "ai-platform-models-connected-app"
-            }
-            payload = {"prompt": prompt_text}
 
+        try:
             print("--- Sending prompt to Einstein AI ---")
-            response = requests.post(api_url, headers=headers, json=payload)
-            response.raise_for_status()
-            response_data = response.json()
-            
+            response_data = einstein_client.generate_raw_sync(prompt_text)
             response_text = response_data.get("generation", {}).get("generatedText", "").strip()
 
             return self._parse_einstein_response(response_text)
@@ -190,48 +183,97 @@ class EinsteinRunnable(Runnable):
             # Pass the actual error message for better debugging
             return AIMessage(content=f"Sorry, I encountered an error: {e}")
 
-    def _create_einstein_prompt(self, messages: Sequence[BaseMessage], tools_list: list) -> str:
-        """Creates a comprehensive prompt for the Einstein AI model, including tool definitions."""
-        tool_defs_str = "\n".join([json.dumps(t.get_input_schema().model_json_schema()) for t in tools_list])
-        
-        system_prompt = f"""You are a helpful assistant. Your goal is to assist users by calling tools on their behalf.
+    async def ainvoke(self, state: State, config: Optional[RunnableConfig] = None, **kwargs) -> BaseMessage:
+        print("--- Calling Custom Einstein AI Runnable (async) ---")
+
+        prompt_text = self._create_einstein_prompt(state['messages'], tools)
+
+        try:
+            print("--- Sending prompt to Einstein AI ---")
+            if einstein_client.stream_url:
+                response_text = await self._generate_streaming(prompt_text, config)
+            else:
+                response_data = await einstein_client.generate_raw(prompt_text)
+                response_text = response_data.get("generation", {}).get("generatedText", "").strip()
+
+            return self._parse_einstein_response(response_text)
+
+        except Exception as e:
+            print(f"Error calling Einstein AI model: {e}")
+            return AIMessage(content=f"Sorry, I encountered an error: {e}")
+
+    async def _generate_streaming(self, prompt_text: str, config: Optional[RunnableConfig]) -> str:
+        """Streams the generation, dispatching a STREAM_TOKEN_EVENT custom event
+        per piece of a text answer. A reply that starts like JSON may be a tool
+        call, so it is only buffered; /invoke/stream chunks it afterwards if it
+        turns out to be text."""
+        parts, streaming = [], None
+        async for chunk in einstein_client.generate_stream(prompt_text):
+            parts.append(chunk)
+            if streaming is None:
+                head = "".join(parts).lstrip()
+                if not head:
+                    continue
+                streaming = head[0] not in "{["
+                chunk = head
+            if streaming:
+                await adispatch_custom_event(STREAM_TOKEN_EVENT, {"text": chunk}, config=config)
+        return "".join(parts).strip()
+
+    def _system_prompt(self, tools_list: list) -> str:
+        """Instructions and tool definitions, built once per tool set."""
+        tool_names = tuple(t.name for t in tools_list)
+        system_prompt = self._system_prompts.get(tool_names)
+        if system_prompt is None:
+            tool_defs_str = "\n".join([json.dumps(t.get_input_schema().model_json_schema()) for t in tools_list])
+            system_prompt = f"""You are a helpful assistant. Your goal is to assist users by calling tools on their behalf.
 Based on the user's query and the conversation history, decide if a tool is needed.
 - If a tool is appropriate, you MUST respond with ONLY a single JSON object with two keys: 'name' and 'args'.
   'name' must be one of the available tool names.
   'args' must be an object containing the required parameters for that tool.
-- If the last message was a ToolMessage containing data, your job is to summarize the result for the user in a clear and helpful way.
+- If the query needs several independent tool calls (e.g. the same statistics for two regions), respond with ONLY a JSON array of such objects; they are run together.
+- If the last messages are ToolMessages containing data, your job is to summarize the results for the user in a clear and helpful way.
 - If no tool is needed and you are not summarizing a tool result, respond in natural language.
 
 Available Tools:
 {tool_defs_str}
 
 Conversation History:"""
-        history = "\n".join([f"{msg.__class__.__name__}: {msg.content}" for msg in messages])
-        return f"{system_prompt}\n{history}\n\nUser Query: {messages[-1].content}\nResponse:"
+            self._system_prompts[tool_names] = system_prompt
+        return system_prompt
+
+    def _create_einstein_prompt(self, messages: Sequence[BaseMessage], tools_list: list) -> str:
+        """Creates a comprehensive prompt for the Einstein AI model, including tool definitions."""
+        history = self.history.render(messages)
+        return f"{self._system_prompt(tools_list)}\n{history}\n\nUser Query: {messages[-1].content}\nResponse:"
 
     def _parse_einstein_response(self, response_text: str) -> AIMessage:
-        """Parses the model's response to be either a tool call or a text message."""
+        """Parses the model's response to be either tool calls (one JSON object,
+        or an array of them) or a text message."""
         try:
             tool_call_data = json.loads(response_text)
-            tool_name = tool_call_data.get("name")
-            tool_args = tool_call_data.get("args")
-
-            if tool_name and isinstance(tool_args, dict):
-                print(f"--- Einstein AI requested tool: {tool_name} with args: {tool_args} ---")
-                return AIMessage(
-                    content="",
-                    tool_calls=[{
-                        "id": f"tool_{uuid.uuid4()}",
-                        "name": tool_name,
-                        "args": tool_args,
-                    }]
-                )
-            else:
-                return AIMessage(content=response_text)
         except json.JSONDecodeError:
             print("--- Einstein AI responded with text ---")
             return AIMessage(content=response_text)
 
+        requested = tool_call_data if isinstance(tool_call_data, list) else [tool_call_data]
+        valid = requested and all(
+            isinstance(call, dict) and call.get("name") and isinstance(call.get("args"), dict) for call in requested
+        )
+        if not valid:
+            return AIMessage(content=response_text)
+
+        for call in requested:
+            print(f"--- Einstein AI requested tool: {call['name']} with args: {call['args']} ---")
+        return AIMessage(
+            content="",
+            tool_calls=[{
+                "id": f"tool_{uuid.uuid4()}",
+                "name": call["name"],
+                "args": call["args"],
+            } for call in requested]
+        )
+
 
 # --- 4. Define Graph Nodes ---
 # These nodes form the structure of our agent's logic.
@@ -241,32 +283,37 @@ class Assistant:
     def __init__(self, runnable: Runnable):
         self.runnable = runnable
 
-    def __call__(self, state: State, config: RunnableConfig):
-        result = self.runnable.invoke(state)
+    async def __call__(self, state: State, config: RunnableConfig):
+        result = await self.runnable.ainvoke(state, config)
         return {"messages": [result]}
 
+def tool_error_message(error: Exception) -> str:
+    return f"Error: {repr(error)}\n. Please review your input and try again."
+
 def handle_tool_error(state: State) -> dict:
-    """A fallback node for handling tool execution errors gracefully."""
+    """A fallback node for handling tool execution errors gracefully.
+
+    Failures of individual calls are already turned into error ToolMessages by
+    the ToolNode; this covers the node failing as a whole, answering every
+    pending call so none is left without a result.
+    """
     error = state.get("error")
     print(f"--- Tool Execution Error: {error} ---")
     last_message = state["messages"][-1]
-    
-    tool_call_id = ""
-    if hasattr(last_message, 'tool_calls') and last_message.tool_calls:
-        tool_call_id = last_message.tool_calls[0]['id']
+    tool_calls = getattr(last_message, "tool_calls", None) or [{"id": ""}]
 
     return {
         "messages": [
-            ToolMessage(
-                content=f"Error: {repr(error)}\n. Please review your input and try again.",
-                tool_call_id=tool_call_id,
-            )
+            ToolMessage(content=tool_error_message(error), tool_call_id=tool_call["id"])
+            for tool_call in tool_calls
         ]
     }
 
 # Instantiate the primary nodes for the graph
 assistant_runnable = EinsteinRunnable()
-tool_node = ToolNode(tools).with_fallbacks(
+# Multiple tool calls in one assistant turn run concurrently; a failing call
+# gets its own error ToolMessage without failing the others
+tool_node = ToolNode(tools, handle_tool_errors=tool_error_message).with_fallbacks(
     [RunnableLambda(handle_tool_error)], exception_key="error"
 )
 
@@ -289,8 +336,18 @@ graph_builder.add_conditional_edges(
 )
 graph_builder.add_edge("tools", "assistant")
 
+# Conversation state is kept by the checkpointer, keyed by session id (the
+# LangGraph thread_id): idle sessions expire, and past the memory budget the
+# least recently used ones are evicted, to SQLite if SESSION_SPILL_PATH is set.
+session_checkpointer = SessionCheckpointer(
+    max_bytes=int(float(os.getenv("SESSION_MEMORY_BUDGET_MB", "64")) * 1024 * 1024),
+    idle_ttl=float(os.getenv("SESSION_IDLE_TTL_SECONDS", str(6 * 3600))),
+    spill_path=os.getenv("SESSION_SPILL_PATH") or None,
+    max_tool_chars=int(os.getenv("SESSION_TOOL_CONTENT_CHARS", "4000"))
+)
+
 # Compile the graph into a runnable application
-langgraph_app = graph_builder.compile()
+langgraph_app = graph_builder.compile(checkpointer=session_checkpointer)
 
 
 # --- 6. FastAPI Application Setup ---
@@ -302,9 +359,18 @@ api = FastAPI(
     version="1.0.0"
 )
 
-# In-memory store for conversation histories.
-# For production, consider a more persistent store like Redis.
-conversation_histories: Dict[str, list[AnyMessage]] = {}
+@api.on_event("startup")
+def start_einstein_token_service():
+    try:
+        EinsteinTokenService.instance().start()
+    except ValueError as e:
+        print(f"--- Einstein token service not started: {e} ---")
+
+@api.on_event("shutdown")
+async def close_http_clients():
+    await einstein_client.aclose()
+    if _node_client is not None:
+        await _node_client.aclose()
 
 class QueryRequest(BaseModel):
     """The request body for the /invoke endpoint."""
@@ -327,26 +393,18 @@ async def invoke_agent(request: QueryRequest = Body(...)):
 
     session_id = request.session_id or str(uuid.uuid4())
     
-    # Retrieve existing history or start a new one
-    messages = conversation_histories.get(session_id, [])
-    
-    # Add the new user query to the history
-    messages.append(HumanMessage(content=request.query))
-    
-    config = {"recursion_limit": 10}
-    initial_state = {"messages": messages}
+    # The checkpointer restores the session's history; only the new query is passed in
+    config = {"recursion_limit": 10, "configurable": {"thread_id": session_id}}
+    initial_state = {"messages": [HumanMessage(content=request.query)]}
     
     try:
         # Invoke the graph to get the final state
-        final_state = langgraph_app.invoke(initial_state, config=config)
+        final_state = await langgraph_app.ainvoke(initial_state, config=config)
         
         # The final response is the last message in the state
         final_response_message = final_state["messages"][-1]
         response_content = final_response_message.content if final_response_message.content else "Conversation ended with a tool call."
 
-        # Save the updated history
-        conversation_histories[session_id] = final_state["messages"]
-
         print(f"\n✅ Final Response for session {session_id}:")
         print(response_content)
         print(f"{'='*50}\n")
@@ -358,6 +416,82 @@ async def invoke_agent(request: QueryRequest = Body(...)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Tool arguments whose values are never echoed in stream events, and the
+# longest tool output a "tool_end" event carries
+STREAM_REDACTED_ARGS = {"pin", "password", "secret", "token"}
+STREAM_TOOL_OUTPUT_CHARS = int(os.getenv("STREAM_TOOL_OUTPUT_CHARS", "2000"))
+
+
+def stream_tool_args(args) -> dict:
+    if not isinstance(args, dict):
+        return {}
+    return {name: "[redacted]" if name.lower() in STREAM_REDACTED_ARGS else value for name, value in args.items()}
+
+
+def stream_tool_output(output) -> str:
+    content = getattr(output, "content", output)
+    content = content if isinstance(content, str) else json.dumps(content, default=str)
+    if len(content) <= STREAM_TOOL_OUTPUT_CHARS:
+        return content
+    dropped = len(content) - STREAM_TOOL_OUTPUT_CHARS
+    return f"{content[:STREAM_TOOL_OUTPUT_CHARS]}... [{dropped} characters truncated]"
+
+
+@api.post("/invoke/stream")
+async def invoke_agent_stream(request: QueryRequest = Body(...)):
+    """
+    Streams the agent's progress as server-sent events: "session" first, then
+    "tool_start"/"tool_end" for every tool hop (secret arguments redacted,
+    output cut to STREAM_TOOL_OUTPUT_CHARS), "chunk" events with the final
+    answer, and "done" with the full response (or "error"). With
+    EINSTEIN_STREAM_API_URL set the chunks are Einstein's tokens as they are
+    generated; otherwise the finished answer is chunked.
+    """
+    session_id = request.session_id or str(uuid.uuid4())
+    config = {"recursion_limit": 10, "configurable": {"thread_id": session_id}}
+    initial_state = {"messages": [HumanMessage(content=request.query)]}
+
+    async def events():
+        yield sse_event("session", {"session_id": session_id})
+        response_content = "Conversation ended with a tool call."
+        # Whether the current assistant turn's text already went out as tokens
+        streamed = False
+        try:
+            async for event in langgraph_app.astream_events(initial_state, config=config, version="v2"):
+                kind = event["event"]
+                if kind == "on_custom_event" and event["name"] == STREAM_TOKEN_EVENT:
+                    streamed = True
+                    yield sse_event("chunk", {"text": event["data"]["text"]})
+                elif kind == "on_tool_start":
+                    yield sse_event("tool_start", {"tool": event["name"],
+                                                   "args": stream_tool_args(event["data"].get("input"))})
+                elif kind == "on_tool_end":
+                    yield sse_event("tool_end", {"tool": event["name"],
+                                                 "output": stream_tool_output(event["data"].get("output"))})
+                elif kind == "on_chain_end" and event["name"] == "assistant":
+                    message = event["data"]["output"]["messages"][-1]
+                    if message.content and not getattr(message, "tool_calls", None):
+                        response_content = message.content
+                        if not streamed:
+                            # No tokens came through (no stream endpoint, or a
+                            # reply buffered as a possible tool call): chunk it
+                            print("--- Answer was not streamed; sending it in chunks ---")
+                            for chunk in text_chunks(message.content):
+                                yield sse_event("chunk", {"text": chunk})
+                    streamed = False
+            yield sse_event("done", {"response": response_content, "session_id": session_id})
+        except Exception as e:
+            print(f"--- An unexpected error occurred while streaming: {e} ---")
+            yield sse_event("error", {"detail": str(e)})
+
+    return sse_response(events())
+
+
+@api.get("/metrics/sessions")
+def session_metrics():
+    return session_checkpointer.stats()
+
+
 @api.get("/")
 def read_root():
     return {"message": "Welcome to the LangGraph Agent API. Send POST requests to /invoke."}
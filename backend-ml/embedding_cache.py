@@ -0,0 +1,196 @@
+import logging
+import queue
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional, Tuple
+
+import numpy as np
+
+from micro_batcher import MicroBatcher
+from result_cache import CacheBackend, ResultCache
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(text: str) -> str:
+    """Cache key for a query. all-MiniLM-L6-v2 is uncased and ignores extra
+    whitespace, so neither changes the embedding."""
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def _pack(vector: np.ndarray, dtype: str) -> Tuple[bytes, float]:
+    """Compacts a float32 vector to float16, or to int8 with one scale factor."""
+    vector = np.asarray(vector, dtype=np.float32)
+    if dtype == "int8":
+        scale = float(np.max(np.abs(vector))) / 127.0 or 1.0
+        return np.round(vector / scale).astype(np.int8).tobytes(), scale
+    return vector.astype(np.float16).tobytes(), 1.0
+
+
+def _unpack(data: bytes, dtype: str, scale: float) -> np.ndarray:
+    if dtype == "int8":
+        return np.frombuffer(data, dtype=np.int8).astype(np.float32) * scale
+    return np.frombuffer(data, dtype=np.float16).astype(np.float32)
+
+
+class CompactEmbeddingStore(CacheBackend):
+    """Bounded in-memory LRU of compacted embeddings, optionally backed by a
+    SQLite file that survives restarts. Entries never expire (the encoder is
+    deterministic), so the TTL passed by ``ResultCache`` is ignored.
+
+    Only the disk makes the store blocking (``ResultCache`` then reads it from
+    a thread). Writes to it are queued and committed in batches by a
+    background thread, so ``set`` only touches memory; writes still queued at
+    exit are lost, which for a cache only costs a re-encode.
+    """
+
+    WRITE_BATCH_SIZE = 256
+
+    def __init__(self, max_entries: int = 4096, dtype: str = "float16", disk_path: Optional[str] = None):
+        if dtype not in ("float16", "int8"):
+            raise ValueError(f"Unsupported embedding cache dtype: {dtype}")
+        self.max_entries = max_entries
+        self.dtype = dtype
+        self._entries: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.disk_hits = 0
+        self.disk_errors = 0
+        self.disk_path = disk_path
+        self.blocking = disk_path is not None
+        self._db = self._connect() if disk_path else None
+        self._db_lock = threading.Lock()
+        self._pending: "queue.Queue[tuple]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.disk_path, check_same_thread=False)
+        # WAL lets the reads go on while the writer commits
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, dtype TEXT, scale REAL, data BLOB)")
+        db.commit()
+        return db
+
+    def after_fork(self):
+        """A SQLite connection must not be shared across a fork, and the writer
+        thread does not survive it: reopen the one, restart the other lazily."""
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._pending = queue.Queue()
+        self._writer = None
+        if self.disk_path:
+            self._db = self._connect()
+
+    def compact(self, vector: np.ndarray) -> np.ndarray:
+        """``vector`` as the store returns it: float32, with the precision
+        left after compaction."""
+        data, scale = _pack(vector, self.dtype)
+        return _unpack(data, self.dtype, scale)
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return _unpack(entry[0], self.dtype, entry[1])
+        if self._db is None:
+            return None
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT data, scale FROM embeddings WHERE key = ? AND dtype = ?", (key, self.dtype)
+            ).fetchone()
+        if row is None:
+            return None
+        with self._lock:
+            self.disk_hits += 1
+            self._remember(key, (row[0], row[1]))
+        return _unpack(row[0], self.dtype, row[1])
+
+    def set(self, key: str, value: np.ndarray, ttl: float = 0):
+        data, scale = _pack(value, self.dtype)
+        with self._lock:
+            self._remember(key, (data, scale))
+            if self._db is not None:
+                self._pending.put((key, self.dtype, scale, data))
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_behind, name="embedding-cache-writer",
+                                                    daemon=True)
+                    self._writer.start()
+
+    def _write_behind(self):
+        db = self._connect()
+        pending = self._pending
+        while True:
+            rows = [pending.get()]
+            while len(rows) < self.WRITE_BATCH_SIZE:
+                try:
+                    rows.append(pending.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                db.executemany("INSERT OR REPLACE INTO embeddings (key, dtype, scale, data) VALUES (?, ?, ?, ?)", rows)
+                db.commit()
+            except Exception as e:
+                self.disk_errors += 1
+                logger.warning(f"embedding cache: disk write of {len(rows)} entries failed: {str(e)}")
+            finally:
+                for _ in rows:
+                    pending.task_done()
+
+    def flush(self):
+        """Blocks until every queued write is on disk."""
+        self._pending.join()
+
+    def pending_writes(self) -> int:
+        return self._pending.qsize()
+
+    def _remember(self, key: str, entry: Tuple[bytes, float]):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def memory_bytes(self) -> int:
+        return sum(len(data) for data, _ in self._entries.values())
+
+
+class EmbeddingCache:
+    """Query-embedding cache in front of a SentenceTransformer.
+
+    Hits are served from ``store``. Misses for the same text are coalesced,
+    and misses arriving together are micro-batched into one ``encode`` call,
+    so the transformer runs once per batch instead of once per request.
+    """
+
+    def __init__(self, get_encoder: Callable[[], Any], store: CompactEmbeddingStore,
+                 max_batch_size: int = 32, max_wait_ms: float = 2.0):
+        # Resolved on first miss, so the model can still be loading at startup
+        self.get_encoder = get_encoder
+        self.store = store
+        self.cache = ResultCache(store, name="embedding")
+        self.batcher = MicroBatcher(self._encode_batch, max_batch_size, max_wait_ms, name="embedding")
+
+    async def encode(self, text: str) -> np.ndarray:
+        key = normalize_query(text)
+        return await self.cache.get_or_compute(key, lambda: self.batcher.submit(key))
+
+    def _encode_batch(self, texts: List[str]) -> List[np.ndarray]:
+        vectors = self.get_encoder().encode(texts, batch_size=len(texts))
+        # A miss returns what a later hit for the same text will
+        return [self.store.compact(vector) for vector in vectors]
+
+    def stats(self) -> dict:
+        return {
+            **self.cache.stats(),
+            "dtype": self.store.dtype,
+            "memory_entries": len(self.store),
+            "memory_bytes": self.store.memory_bytes(),
+            "disk_hits": self.store.disk_hits,
+            "disk_errors": self.store.disk_errors,
+            "pending_writes": self.store.pending_writes(),
+            "batcher": self.batcher.stats()
+        }
@@ -0,0 +1,179 @@
+"""In-process vector index for the FAQ RAG path.
+
+The FAQ corpus is small and static, so instead of a Pinecone round trip per
+query it is kept as one L2-normalised float32 matrix; cosine similarity is a
+single matrix-vector product. The snapshot is two files:
+
+    <prefix>.npy   embeddings, memory-mapped read-only at load time
+    <prefix>.json  FAQ records (id, question, answer) in matrix row order
+
+Usage:
+    python faq_index.py build --source faqs.csv [--out faq_index]
+    python faq_index.py pull [--out faq_index]      # snapshot the Pinecone index
+    python faq_index.py push [--snapshot faq_index] # sync the snapshot to Pinecone
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+EMBEDDING_MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
+PINECONE_INDEX_NAME = "learning-buddy-faq"
+
+
+class FaqMatch(NamedTuple):
+    id: str
+    score: float
+    metadata: Dict[str, str]
+
+
+class FaqQueryResult(NamedTuple):
+    matches: List[FaqMatch]
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class LocalFaqIndex:
+    """Flat cosine-similarity index with the same ``query`` signature and result
+    shape (``.matches`` of ``id``/``score``/``metadata``) as a Pinecone index."""
+
+    def __init__(self, vectors: np.ndarray, records: List[dict], model_name: str = EMBEDDING_MODEL_NAME):
+        if len(vectors) != len(records):
+            raise ValueError(f"FAQ index has {len(vectors)} vectors but {len(records)} records")
+        self.vectors = vectors
+        self.records = records
+        self.model_name = model_name
+
+    def __len__(self):
+        return len(self.records)
+
+    @classmethod
+    def load(cls, prefix: str) -> "LocalFaqIndex":
+        with open(f"{prefix}.json") as f:
+            snapshot = json.load(f)
+        vectors = np.load(f"{prefix}.npy", mmap_mode="r")
+        return cls(vectors, snapshot["records"], snapshot.get("model", EMBEDDING_MODEL_NAME))
+
+    @staticmethod
+    def exists(prefix: str) -> bool:
+        return os.path.exists(f"{prefix}.npy") and os.path.exists(f"{prefix}.json")
+
+    def save(self, prefix: str):
+        np.save(f"{prefix}.npy", _normalize(self.vectors))
+        with open(f"{prefix}.json", "w") as f:
+            json.dump({
+                "model": self.model_name,
+                "dimension": int(self.vectors.shape[1]) if len(self.vectors) else 0,
+                "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "records": self.records
+            }, f, indent=2)
+
+    @classmethod
+    def build(cls, faqs: List[dict], encoder, model_name: str = EMBEDDING_MODEL_NAME) -> "LocalFaqIndex":
+        """Embeds each FAQ's question with ``encoder`` (a SentenceTransformer)."""
+        records = [
+            {"id": str(faq.get("id") or i), "question": faq["question"], "answer": faq["answer"]}
+            for i, faq in enumerate(faqs)
+        ]
+        vectors = encoder.encode([record["question"] for record in records], batch_size=64)
+        return cls(_normalize(vectors), records, model_name)
+
+    def query(self, vector, top_k: int = 3, include_metadata: bool = True) -> FaqQueryResult:
+        if not len(self.records):
+            return FaqQueryResult(matches=[])
+        scores = self.vectors @ _normalize(vector)
+        top_k = min(top_k, len(scores))
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top])]
+        matches = []
+        for i in top:
+            record = self.records[i]
+            metadata = {"question": record["question"], "answer": record["answer"]} if include_metadata else {}
+            matches.append(FaqMatch(record["id"], float(scores[i]), metadata))
+        return FaqQueryResult(matches=matches)
+
+    def sync_to_pinecone(self, pinecone_index, batch_size: int = 100):
+        """Upserts the snapshot into a Pinecone index (optional sync target)."""
+        for start in range(0, len(self.records), batch_size):
+            pinecone_index.upsert(vectors=[
+                {
+                    "id": record["id"],
+                    "values": np.asarray(self.vectors[start + offset]).tolist(),
+                    "metadata": {"question": record["question"], "answer": record["answer"]}
+                }
+                for offset, record in enumerate(self.records[start:start + batch_size])
+            ])
+
+    @classmethod
+    def from_pinecone(cls, pinecone_index) -> "LocalFaqIndex":
+        """Snapshots every vector (with its metadata) of a serverless Pinecone index."""
+        records, vectors = [], []
+        for ids in pinecone_index.list():
+            fetched = pinecone_index.fetch(ids=list(ids)).vectors
+            for vector_id in ids:
+                vector = fetched[vector_id]
+                metadata = vector.metadata or {}
+                records.append({
+                    "id": vector_id,
+                    "question": metadata.get("question", "Unknown"),
+                    "answer": metadata.get("answer", "No answer")
+                })
+                vectors.append(vector.values)
+        return cls(_normalize(np.array(vectors)), records)
+
+
+def load_faq_source(path: str) -> List[dict]:
+    """Reads FAQs from a CSV (question,answer[,id] columns) or a JSON list."""
+    if path.endswith(".json"):
+        with open(path) as f:
+            return json.load(f)
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def _pinecone_index():
+    from dotenv import load_dotenv
+    from pinecone import Pinecone
+
+    load_dotenv()
+    return Pinecone(api_key=os.getenv("FAQ_API_KEY")).Index(os.getenv("FAQ_INDEX_NAME", PINECONE_INDEX_NAME))
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Build and sync the local FAQ vector index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Embed a local FAQ source into a snapshot")
+    build.add_argument("--source", required=True, help="CSV or JSON file with question/answer fields")
+    build.add_argument("--out", default="faq_index")
+    pull = sub.add_parser("pull", help="Snapshot the current Pinecone FAQ index")
+    pull.add_argument("--out", default="faq_index")
+    push = sub.add_parser("push", help="Upsert a snapshot into Pinecone")
+    push.add_argument("--snapshot", default="faq_index")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        from sentence_transformers import SentenceTransformer
+
+        index = LocalFaqIndex.build(load_faq_source(args.source), SentenceTransformer(EMBEDDING_MODEL_NAME))
+        index.save(args.out)
+        print(f"Wrote {len(index)} FAQs to {args.out}.npy / {args.out}.json")
+    elif args.command == "pull":
+        index = LocalFaqIndex.from_pinecone(_pinecone_index())
+        index.save(args.out)
+        print(f"Pulled {len(index)} FAQs from Pinecone into {args.out}.npy / {args.out}.json")
+    elif args.command == "push":
+        index = LocalFaqIndex.load(args.snapshot)
+        index.sync_to_pinecone(_pinecone_index())
+        print(f"Upserted {len(index)} FAQs into Pinecone")
+
+
+if __name__ == "__main__":
+    main()
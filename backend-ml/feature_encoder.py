@@ -0,0 +1,184 @@
+"""Pandas-free feature assembly for the fraud models.
+
+``preprocessor.pkl`` (a fitted ColumnTransformer) and ``scaler.pkl`` are
+compiled once, at load time, into plain lookup tables and arrays: one-hot
+category -> output column, per-column means and scales. A request's
+transactions are then written field by field into a zeroed NumPy matrix,
+without building a DataFrame or going through sklearn's validation, and the
+arithmetic is the same as sklearn's so the output is identical.
+
+Only the pieces the fitted preprocessor can contain are supported
+(OneHotEncoder, StandardScaler, MinMaxScaler, passthrough, drop); anything
+else raises ``UnsupportedPipelineError`` and the caller keeps using pandas.
+
+Usage:
+    python feature_encoder.py verify --data reference.csv [--rows 10000]
+"""
+import argparse
+import sys
+from types import SimpleNamespace
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class UnsupportedPipelineError(ValueError):
+    pass
+
+
+def _scaler_params(scaler, width: int) -> Tuple[str, np.ndarray, np.ndarray]:
+    """Returns (kind, a, b) such that sklearn's transform is ``(x - a) / b``
+    for StandardScaler and ``x * a + b`` for MinMaxScaler."""
+    kind = type(scaler).__name__
+    if kind == "StandardScaler":
+        mean = scaler.mean_ if scaler.mean_ is not None and scaler.with_mean else np.zeros(width)
+        scale = scaler.scale_ if scaler.scale_ is not None and scaler.with_std else np.ones(width)
+        return "standard", np.asarray(mean, dtype=np.float64), np.asarray(scale, dtype=np.float64)
+    if kind == "MinMaxScaler" and not getattr(scaler, "clip", False):
+        return "minmax", np.asarray(scaler.scale_, dtype=np.float64), np.asarray(scaler.min_, dtype=np.float64)
+    raise UnsupportedPipelineError(f"Unsupported scaler: {kind}")
+
+
+def _apply_scaler(kind: str, a: np.ndarray, b: np.ndarray, X: np.ndarray) -> np.ndarray:
+    if kind == "standard":
+        X -= a
+        X /= b
+    else:
+        X *= a
+        X += b
+    return X
+
+
+class _OneHot(NamedTuple):
+    field: str
+    lookup: Dict  # category -> output column (None for the dropped category)
+    ignore_unknown: bool
+
+
+class CompiledFeatureEncoder:
+    """Builds the preprocessor output and the scaled matrix for a list of
+    transactions (any objects with the input fields as attributes)."""
+
+    def __init__(self, width: int, numeric_blocks: list, one_hots: List[_OneHot], scaler: Tuple):
+        self.width = width
+        # (output column slice, field names, scaler kind or None, a, b)
+        self.numeric_blocks = numeric_blocks
+        self.one_hots = one_hots
+        self.scaler = scaler
+
+    @classmethod
+    def from_pipeline(cls, preprocessor, scaler, field_map: Dict[str, str]) -> "CompiledFeatureEncoder":
+        """``field_map`` maps the preprocessor's input column names to the
+        attribute names on the transaction objects."""
+        if type(preprocessor).__name__ != "ColumnTransformer":
+            raise UnsupportedPipelineError(f"Unsupported preprocessor: {type(preprocessor).__name__}")
+        input_names = list(getattr(preprocessor, "feature_names_in_", list(field_map)))
+
+        numeric_blocks, one_hots, offset = [], [], 0
+        for name, transformer, columns in preprocessor.transformers_:
+            if transformer == "drop" or len(columns) == 0:
+                continue
+            columns = [input_names[c] if isinstance(c, (int, np.integer)) else c for c in columns]
+            fields = [field_map[c] for c in columns]
+            # Newer sklearn stores passthrough columns as an identity FunctionTransformer
+            identity = type(transformer).__name__ == "FunctionTransformer" and transformer.func is None
+            if transformer == "passthrough" or identity:
+                numeric_blocks.append((slice(offset, offset + len(fields)), fields, None, None, None))
+                offset += len(fields)
+            elif type(transformer).__name__ == "OneHotEncoder":
+                if getattr(transformer, "_infrequent_enabled", False):
+                    raise UnsupportedPipelineError("OneHotEncoder with infrequent categories is not supported")
+                if transformer.handle_unknown not in ("ignore", "error"):
+                    raise UnsupportedPipelineError(f"Unsupported handle_unknown: {transformer.handle_unknown}")
+                drop_idx = getattr(transformer, "drop_idx_", None)
+                for j, (field, categories) in enumerate(zip(fields, transformer.categories_)):
+                    dropped = drop_idx[j] if drop_idx is not None else None
+                    lookup, column = {}, offset
+                    for k, category in enumerate(categories.tolist()):
+                        if dropped is not None and k == dropped:
+                            lookup[category] = None
+                        else:
+                            lookup[category] = column
+                            column += 1
+                    one_hots.append(_OneHot(field, lookup, transformer.handle_unknown == "ignore"))
+                    offset = column
+            else:
+                kind, a, b = _scaler_params(transformer, len(fields))
+                numeric_blocks.append((slice(offset, offset + len(fields)), fields, kind, a, b))
+                offset += len(fields)
+
+        expected = getattr(preprocessor, "output_indices_", None)
+        if expected is not None and offset != max(s.stop for s in expected.values()):
+            raise UnsupportedPipelineError("Compiled width does not match the preprocessor output")
+        return cls(offset, numeric_blocks, one_hots, _scaler_params(scaler, offset))
+
+    def transform(self, txns: Sequence) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns (preprocessor output, scaler output) for ``txns``."""
+        X = np.zeros((len(txns), self.width), dtype=np.float64)
+        for columns, fields, kind, a, b in self.numeric_blocks:
+            block = np.array([[getattr(txn, field) for field in fields] for txn in txns], dtype=np.float64)
+            X[:, columns] = block if kind is None else _apply_scaler(kind, a, b, block)
+        for encoder in self.one_hots:
+            for i, txn in enumerate(txns):
+                value = getattr(txn, encoder.field)
+                if value in encoder.lookup:
+                    column = encoder.lookup[value]
+                    if column is not None:
+                        X[i, column] = 1.0
+                elif not encoder.ignore_unknown:
+                    raise ValueError(f"Found unknown category {value!r} in {encoder.field}")
+        return X, _apply_scaler(*self.scaler, X.copy())
+
+    def numeric_matrix(self, txns: Sequence, fields: Sequence[str]) -> np.ndarray:
+        """Raw numeric fields in the given order (e.g. the XGBoost inputs)."""
+        return np.array([[getattr(txn, field) for field in fields] for txn in txns], dtype=np.float64)
+
+
+def pandas_transform(preprocessor, scaler, txns: Sequence, input_fields: List[str],
+                     feature_names: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """The original DataFrame path, kept as the reference and the fallback."""
+    import pandas as pd
+
+    input_old = pd.DataFrame([{field: getattr(txn, field) for field in input_fields} for txn in txns])
+    input_old.columns = feature_names
+    X_transformed = preprocessor.transform(input_old)
+    return X_transformed, scaler.transform(X_transformed)
+
+
+def verify(data_path: str, rows: int = 10000) -> bool:
+    """Encodes ``rows`` rows of a reference CSV both ways and reports the differences."""
+    import joblib
+    import pandas as pd
+
+    from model_artifacts import OLD_MODEL_FEATURES, OLD_MODEL_INPUT_FIELDS
+
+    preprocessor, scaler = joblib.load('preprocessor.pkl'), joblib.load('scaler.pkl')
+    encoder = CompiledFeatureEncoder.from_pipeline(
+        preprocessor, scaler, dict(zip(OLD_MODEL_FEATURES, OLD_MODEL_INPUT_FIELDS)))
+    txns = [SimpleNamespace(**row) for row in pd.read_csv(data_path, nrows=rows).to_dict("records")]
+
+    expected = pandas_transform(preprocessor, scaler, txns, OLD_MODEL_INPUT_FIELDS, OLD_MODEL_FEATURES)
+    actual = encoder.transform(txns)
+    ok = True
+    for stage, e, a in zip(("preprocessor", "scaler"), expected, actual):
+        e = e.toarray() if hasattr(e, "toarray") else np.asarray(e)
+        mismatches = int(np.count_nonzero(np.any(e != a, axis=1)))
+        print(f"{stage}: {mismatches}/{len(txns)} rows differ, max |diff| = {float(np.max(np.abs(e - a))):.3e}")
+        ok &= mismatches == 0
+    return ok
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Check the compiled feature encoder against the pandas pipeline")
+    sub = parser.add_subparsers(dest="command", required=True)
+    verify_cmd = sub.add_parser("verify", help="Compare compiled and pandas features on a reference CSV")
+    verify_cmd.add_argument("--data", required=True, help="CSV with the /predict input columns")
+    verify_cmd.add_argument("--rows", type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    if args.command == "verify" and not verify(args.data, args.rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
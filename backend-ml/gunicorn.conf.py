@@ -0,0 +1,46 @@
+"""Multi-worker serving with one copy of the models.
+
+    gunicorn -c gunicorn.conf.py main:app
+
+The master imports the app and loads every model before forking
+(``preload_app`` + ``when_ready``); the workers then share those pages
+copy-on-write instead of each loading its own copy. ``gc.freeze()`` moves
+the loaded objects out of the collector's reach, so collections in the
+workers do not touch (and un-share) them. With MODEL_MMAP=true the arrays
+inside the .pkl artifacts are also memory-mapped read-only from disk.
+
+Environment:
+    PORT              listen port (default 8000)
+    WEB_CONCURRENCY   number of worker processes (default 2)
+    WORKER_TIMEOUT    seconds before a silent worker is restarted (default 120)
+"""
+import gc
+import os
+
+# One BLAS/OpenMP thread per worker: the workers already use every core, and
+# the thread pools these libraries start at import would not survive the fork
+for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+    os.environ.setdefault(var, "1")
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+preload_app = True
+
+
+def when_ready(server):
+    import main
+
+    started = main.time.time()
+    main.registry.wait()
+    server.log.info(f"Models loaded in the master in {main.time.time() - started:.1f}s")
+    gc.collect()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    import main
+
+    main.after_fork()
@@ -0,0 +1,245 @@
+import json
+import math
+import os
+import re
+import logging
+from typing import Dict, Iterable, NamedTuple, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+class Place(NamedTuple):
+    name: str
+    lat: float
+    lon: float
+    # How far the real point can be from (lat, lon). Cities are tight, states
+    # and UTs are large, so a transaction "in Gujarat" may be anywhere within it.
+    radius_km: float
+
+
+# Built-in gazetteer: Indian states/UTs (at their capitals, with a radius that
+# covers the territory) and major cities. Extend or override it with a JSON
+# file at LOCATION_GAZETTEER_PATH:
+#   {"Dubai": {"lat": 25.20, "lon": 55.27, "radius_km": 30, "aliases": ["DXB"]}}
+DEFAULT_GAZETTEER: Dict[str, dict] = {
+    # States and union territories
+    "Andhra Pradesh": {"lat": 16.51, "lon": 80.52, "radius_km": 300},
+    "Arunachal Pradesh": {"lat": 27.08, "lon": 93.61, "radius_km": 250},
+    "Assam": {"lat": 26.14, "lon": 91.74, "radius_km": 250},
+    "Bihar": {"lat": 25.59, "lon": 85.14, "radius_km": 200},
+    "Chhattisgarh": {"lat": 21.25, "lon": 81.63, "radius_km": 250},
+    "Goa": {"lat": 15.49, "lon": 73.83, "radius_km": 60},
+    "Gujarat": {"lat": 23.22, "lon": 72.65, "radius_km": 300},
+    "Haryana": {"lat": 30.73, "lon": 76.78, "radius_km": 200},
+    "Himachal Pradesh": {"lat": 31.10, "lon": 77.17, "radius_km": 150},
+    "Jharkhand": {"lat": 23.34, "lon": 85.31, "radius_km": 200},
+    "Karnataka": {"lat": 12.97, "lon": 77.59, "radius_km": 350},
+    "Kerala": {"lat": 8.52, "lon": 76.94, "radius_km": 350},
+    "Madhya Pradesh": {"lat": 23.26, "lon": 77.41, "radius_km": 400},
+    "Maharashtra": {"lat": 19.08, "lon": 72.88, "radius_km": 450},
+    "Manipur": {"lat": 24.82, "lon": 93.94, "radius_km": 100},
+    "Meghalaya": {"lat": 25.58, "lon": 91.89, "radius_km": 150},
+    "Mizoram": {"lat": 23.73, "lon": 92.72, "radius_km": 150},
+    "Nagaland": {"lat": 25.67, "lon": 94.11, "radius_km": 100},
+    "Odisha": {"lat": 20.30, "lon": 85.82, "radius_km": 300, "aliases": ["Orissa"]},
+    "Punjab": {"lat": 30.73, "lon": 76.78, "radius_km": 250},
+    "Rajasthan": {"lat": 26.91, "lon": 75.79, "radius_km": 450},
+    "Sikkim": {"lat": 27.33, "lon": 88.61, "radius_km": 60},
+    "Tamil Nadu": {"lat": 13.08, "lon": 80.27, "radius_km": 450},
+    "Telangana": {"lat": 17.39, "lon": 78.49, "radius_km": 200},
+    "Tripura": {"lat": 23.83, "lon": 91.29, "radius_km": 80},
+    "Uttar Pradesh": {"lat": 26.85, "lon": 80.95, "radius_km": 450},
+    "Uttarakhand": {"lat": 30.32, "lon": 78.03, "radius_km": 200, "aliases": ["Uttaranchal"]},
+    "West Bengal": {"lat": 22.57, "lon": 88.36, "radius_km": 350},
+    "Jammu and Kashmir": {"lat": 34.08, "lon": 74.80, "radius_km": 250, "aliases": ["Jammu & Kashmir", "J&K"]},
+    "Ladakh": {"lat": 34.15, "lon": 77.58, "radius_km": 250},
+    "Puducherry": {"lat": 11.94, "lon": 79.81, "radius_km": 30, "aliases": ["Pondicherry"]},
+    "Chandigarh": {"lat": 30.73, "lon": 76.78, "radius_km": 20},
+    # Cities
+    "Delhi": {"lat": 28.61, "lon": 77.21, "radius_km": 35, "aliases": ["New Delhi", "NCT of Delhi"]},
+    "Mumbai": {"lat": 19.076, "lon": 72.878, "radius_km": 35, "aliases": ["Bombay"]},
+    "Bengaluru": {"lat": 12.972, "lon": 77.594, "radius_km": 30, "aliases": ["Bangalore"]},
+    "Hyderabad": {"lat": 17.385, "lon": 78.487, "radius_km": 30},
+    "Ahmedabad": {"lat": 23.023, "lon": 72.571, "radius_km": 25, "aliases": ["Ahemdabad", "Amdavad"]},
+    "Chennai": {"lat": 13.083, "lon": 80.271, "radius_km": 30, "aliases": ["Madras"]},
+    "Kolkata": {"lat": 22.573, "lon": 88.364, "radius_km": 30, "aliases": ["Calcutta"]},
+    "Pune": {"lat": 18.520, "lon": 73.857, "radius_km": 25, "aliases": ["Poona"]},
+    "Jaipur": {"lat": 26.912, "lon": 75.787, "radius_km": 20},
+    "Surat": {"lat": 21.170, "lon": 72.831, "radius_km": 20},
+    "Lucknow": {"lat": 26.847, "lon": 80.947, "radius_km": 20},
+    "Kanpur": {"lat": 26.449, "lon": 80.332, "radius_km": 20},
+    "Nagpur": {"lat": 21.146, "lon": 79.088, "radius_km": 20},
+    "Indore": {"lat": 22.720, "lon": 75.858, "radius_km": 20},
+    "Thane": {"lat": 19.218, "lon": 72.978, "radius_km": 15},
+    "Bhopal": {"lat": 23.260, "lon": 77.413, "radius_km": 20},
+    "Visakhapatnam": {"lat": 17.687, "lon": 83.218, "radius_km": 20, "aliases": ["Vizag"]},
+    "Patna": {"lat": 25.594, "lon": 85.138, "radius_km": 20},
+    "Vadodara": {"lat": 22.307, "lon": 73.181, "radius_km": 20, "aliases": ["Baroda"]},
+    "Ghaziabad": {"lat": 28.669, "lon": 77.454, "radius_km": 15},
+    "Ludhiana": {"lat": 30.901, "lon": 75.857, "radius_km": 15},
+    "Agra": {"lat": 27.177, "lon": 78.008, "radius_km": 15},
+    "Nashik": {"lat": 19.998, "lon": 73.790, "radius_km": 15},
+    "Faridabad": {"lat": 28.408, "lon": 77.318, "radius_km": 15},
+    "Meerut": {"lat": 28.984, "lon": 77.706, "radius_km": 15},
+    "Rajkot": {"lat": 22.303, "lon": 70.802, "radius_km": 15},
+    "Varanasi": {"lat": 25.318, "lon": 82.974, "radius_km": 15, "aliases": ["Benares", "Banaras"]},
+    "Srinagar": {"lat": 34.084, "lon": 74.797, "radius_km": 15},
+    "Amritsar": {"lat": 31.634, "lon": 74.872, "radius_km": 15},
+    "Prayagraj": {"lat": 25.436, "lon": 81.846, "radius_km": 15, "aliases": ["Allahabad"]},
+    "Ranchi": {"lat": 23.344, "lon": 85.310, "radius_km": 15},
+    "Coimbatore": {"lat": 11.017, "lon": 76.956, "radius_km": 15},
+    "Guwahati": {"lat": 26.144, "lon": 91.736, "radius_km": 15},
+    "Mysuru": {"lat": 12.296, "lon": 76.639, "radius_km": 15, "aliases": ["Mysore"]},
+    "Kochi": {"lat": 9.931, "lon": 76.267, "radius_km": 20, "aliases": ["Cochin", "Ernakulam"]},
+    "Thiruvananthapuram": {"lat": 8.524, "lon": 76.937, "radius_km": 15, "aliases": ["Trivandrum"]},
+    "Bhubaneswar": {"lat": 20.296, "lon": 85.825, "radius_km": 15},
+    "Dehradun": {"lat": 30.317, "lon": 78.032, "radius_km": 15},
+    "Noida": {"lat": 28.535, "lon": 77.391, "radius_km": 15},
+    "Gurugram": {"lat": 28.459, "lon": 77.027, "radius_km": 15, "aliases": ["Gurgaon"]},
+    "Raipur": {"lat": 21.251, "lon": 81.630, "radius_km": 15},
+    "Madurai": {"lat": 9.925, "lon": 78.120, "radius_km": 15},
+    "Jodhpur": {"lat": 26.238, "lon": 73.024, "radius_km": 15},
+    "Udaipur": {"lat": 24.586, "lon": 73.713, "radius_km": 15},
+    "Shimla": {"lat": 31.105, "lon": 77.173, "radius_km": 10},
+    "Panaji": {"lat": 15.491, "lon": 73.828, "radius_km": 10, "aliases": ["Panjim"]},
+    "Gandhinagar": {"lat": 23.216, "lon": 72.637, "radius_km": 10},
+    "Mangaluru": {"lat": 12.915, "lon": 74.856, "radius_km": 15, "aliases": ["Mangalore"]},
+    "Vijayawada": {"lat": 16.506, "lon": 80.648, "radius_km": 15},
+    "Jammu": {"lat": 32.727, "lon": 74.857, "radius_km": 15},
+    "Leh": {"lat": 34.152, "lon": 77.577, "radius_km": 10},
+    "Imphal": {"lat": 24.817, "lon": 93.937, "radius_km": 10},
+    "Shillong": {"lat": 25.578, "lon": 91.893, "radius_km": 10},
+    "Aizawl": {"lat": 23.727, "lon": 92.718, "radius_km": 10},
+    "Kohima": {"lat": 25.674, "lon": 94.110, "radius_km": 10},
+    "Agartala": {"lat": 23.831, "lon": 91.287, "radius_km": 10},
+    "Itanagar": {"lat": 27.084, "lon": 93.605, "radius_km": 10},
+    "Gangtok": {"lat": 27.339, "lon": 88.607, "radius_km": 10},
+}
+
+# Fastest plausible way to cover a distance with each mode: cruising speed plus
+# a fixed overhead (getting to the airport, boarding, ...). A pair of
+# transactions is feasible if at least one mode could have made the trip.
+# Override with a JSON object in LOCATION_TRAVEL_MODES.
+DEFAULT_TRAVEL_MODES: Dict[str, dict] = {
+    "car": {"speed_kmh": 100, "overhead_minutes": 0},
+    "train": {"speed_kmh": 160, "overhead_minutes": 30},
+    "plane": {"speed_kmh": 850, "overhead_minutes": 90},
+}
+
+
+# Country parts that keep a "City, State, India" location in the gazetteer
+INDIA_NAMES = frozenset({"india", "bharat", "republic of india"})
+
+
+def normalize_location(name: str) -> str:
+    """Lower-cases and strips punctuation/extra whitespace from a location name."""
+    name = re.sub(r"[^\w&\s]", " ", name.lower())
+    return re.sub(r"\s+", " ", name).strip()
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points, in kilometres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class LocationFeasibilityEngine:
+    """Decides locally whether a sequence of (location, timestamp) points could
+    have been travelled, replacing the Einstein round trip for known places."""
+
+    def __init__(self, gazetteer: Optional[Dict[str, dict]] = None,
+                 travel_modes: Optional[Dict[str, dict]] = None):
+        self.places: Dict[str, Place] = {}
+        for name, entry in (gazetteer if gazetteer is not None else DEFAULT_GAZETTEER).items():
+            self.add_place(name, entry["lat"], entry["lon"], entry.get("radius_km", 25.0), entry.get("aliases", ()))
+        self.travel_modes = travel_modes if travel_modes is not None else DEFAULT_TRAVEL_MODES
+
+    @classmethod
+    def from_env(cls) -> "LocationFeasibilityEngine":
+        """Builds the engine from the defaults plus LOCATION_GAZETTEER_PATH and
+        LOCATION_TRAVEL_MODES overrides."""
+        gazetteer = dict(DEFAULT_GAZETTEER)
+        gazetteer_path = os.getenv("LOCATION_GAZETTEER_PATH")
+        if gazetteer_path:
+            with open(gazetteer_path) as f:
+                gazetteer.update(json.load(f))
+        travel_modes = json.loads(os.getenv("LOCATION_TRAVEL_MODES", "null")) or DEFAULT_TRAVEL_MODES
+        return cls(gazetteer, travel_modes)
+
+    def add_place(self, name: str, lat: float, lon: float, radius_km: float = 25.0, aliases: Iterable[str] = ()):
+        place = Place(name, float(lat), float(lon), float(radius_km))
+        for key in (name, *aliases):
+            self.places[normalize_location(key)] = place
+
+    def resolve(self, location: str) -> Optional[Place]:
+        """Looks ``location`` up, also handling "City, State, Country" forms.
+
+        Parts are tried from the most specific (first) to the broadest. PIN
+        codes and a trailing "India" are dropped; any other broadest part must
+        be a known place itself, and a narrower match only counts if it lies
+        within it. So "Hyderabad, Sindh, Pakistan" stays unresolved rather than
+        matching Hyderabad, India.
+        """
+        key = normalize_location(location)
+        if key in self.places:
+            return self.places[key]
+        parts = [normalize_location(re.sub(r"\b\d{6}\b", " ", part)) for part in location.split(",")]
+        parts = [part for part in parts if part]
+        while parts and parts[-1] in INDIA_NAMES:
+            parts.pop()
+        broadest = None
+        if len(parts) > 1:
+            broadest = self.places.get(parts[-1])
+            if broadest is None:
+                return None
+        for part in parts:
+            place = self.places.get(part)
+            if place is not None and (broadest is None or self._within(place, broadest)):
+                return place
+        return None
+
+    @staticmethod
+    def _within(place: Place, area: Place) -> bool:
+        return haversine_km(place.lat, place.lon, area.lat, area.lon) <= place.radius_km + area.radius_km
+
+    def min_travel_minutes(self, distance_km: float) -> float:
+        """Shortest time any configured travel mode needs to cover ``distance_km``."""
+        if distance_km <= 0:
+            return 0.0
+        return min(
+            mode.get("overhead_minutes", 0) + 60.0 * distance_km / mode["speed_kmh"]
+            for mode in self.travel_modes.values()
+        )
+
+    def is_pair_feasible(self, a: Place, b: Place, elapsed_minutes: float) -> bool:
+        # Measure between the closest points the two places could stand for
+        distance = haversine_km(a.lat, a.lon, b.lat, b.lon) - a.radius_km - b.radius_km
+        return abs(elapsed_minutes) >= self.min_travel_minutes(distance)
+
+    def check(self, points: Sequence[Tuple[str, float]]) -> Optional[int]:
+        """Scores a sequence of ``(location, epoch_seconds)`` points.
+
+        Returns 1 if any consecutive pair at different locations is impossible
+        to travel in the time between them, 0 if every pair is feasible, and
+        None if a pair involves a location the gazetteer cannot resolve (and no
+        other pair is already infeasible), so the caller can fall back.
+        """
+        ordered = sorted(points, key=lambda point: point[1])
+        unresolved = False
+        for (loc_a, t_a), (loc_b, t_b) in zip(ordered, ordered[1:]):
+            if normalize_location(loc_a) == normalize_location(loc_b):
+                continue
+            a, b = self.resolve(loc_a), self.resolve(loc_b)
+            if a is None or b is None:
+                unresolved = True
+                continue
+            if a is b:
+                continue
+            if not self.is_pair_feasible(a, b, (t_b - t_a) / 60.0):
+                return 1
+        return None if unresolved else 0
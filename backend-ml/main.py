@@ -3,21 +3,36 @@ from pydantic import BaseModel
 import joblib
 import numpy as np
 import pandas as pd
-from tensorflow.keras.models import load_model
 from sklearn.preprocessing import StandardScaler
 import uvicorn
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from pinecone import Pinecone, ServerlessSpec
-from sentence_transformers import SentenceTransformer
-from typing import List, Dict
+from typing import List, Dict, Iterable, Optional, Tuple
 import logging
 from dotenv import load_dotenv
 import os
 import requests
 import time
 import json
-from datetime import datetime
+import asyncio
+from datetime import datetime, timezone
+from fastapi.concurrency import run_in_threadpool
+from micro_batcher import MicroBatcher
+from einstein_client import EinsteinClient, EinsteinTokenService
+from streaming import sse_event, sse_response
+from location_feasibility import LocationFeasibilityEngine, normalize_location
+from result_cache import ResultCache, backend_from_env
+import hashlib
+from faq_index import LocalFaqIndex
+from embedding_cache import CompactEmbeddingStore, EmbeddingCache
+from semantic_cache import SemanticAnswerCache
+from model_registry import ModelRegistry
+from account_state import AccountState, AccountStateStore
+from result_cache import RedisBackend
+from tree_compiler import CompiledXGBClassifier
+from anomaly_thresholds import kmeans_distances, reconstruction_mse
+from model_artifacts import OLD_MODEL_FEATURES, OLD_MODEL_INPUT_FIELDS, XGB_FEATURES, register_fraud_artifacts
 
 # Load environment variables from .env file
 load_dotenv()
@@ -29,78 +44,162 @@ logger = logging.getLogger(__name__)
 class QueryRequest(BaseModel):
     query: str
 
-# Load models
-scaler = joblib.load('scaler.pkl')
-preprocessor = joblib.load('preprocessor.pkl')
-iso_forest = joblib.load('isolation_forest_model.pkl')
-svm = joblib.load('one_class_svm_model.pkl')
-kmeans = joblib.load('kmeans_model.pkl')
-autoencoder = load_model('autoencoder_model.h5', compile=False)
-xgb_model = joblib.load('xgb_fraud_model.pkl')
-
-# Initialize Pinecone clients with API keys from .env
+# ============ Model registry ============
+# Artifacts are loaded in parallel on a thread pool instead of at import time
+# (TensorFlow and the SentenceTransformer alone take seconds). Each one is
+# also loaded on first use if startup has not got to it yet.
+#   MODEL_PRELOAD=false  load nothing at startup, everything on first use
+#   FAST_START=true      only block startup on the fraud models; the RAG stack
+#                        (embedding model + FAQ index) keeps loading behind it
+MODEL_PRELOAD = os.getenv("MODEL_PRELOAD", "true").lower() == "true"
+FAST_START = os.getenv("FAST_START", "false").lower() == "true"
+EMBEDDING_MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
+
+# A failed artifact load is retried after MODEL_LOAD_RETRY_SECONDS, doubling up
+# to MODEL_LOAD_MAX_RETRY_SECONDS while it keeps failing
+registry = ModelRegistry(
+    max_workers=int(os.getenv("MODEL_LOADER_THREADS", "4")),
+    retry_backoff=float(os.getenv("MODEL_LOAD_RETRY_SECONDS", "1")),
+    max_retry_backoff=float(os.getenv("MODEL_LOAD_MAX_RETRY_SECONDS", "60"))
+)
+
+
+def load_embedding_model():
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(EMBEDDING_MODEL_NAME)
+
+
+# API keys from .env
 faq_api_key = os.getenv("FAQ_API_KEY")
-einstein_client_id = os.getenv("EINSTEIN_CLIENT_ID")
-einstein_client_secret = os.getenv("EINSTEIN_CLIENT_SECRET")
-einstein_token_url = os.getenv("EINSTEIN_TOKEN_URL")
 einstein_api_url = os.getenv("EINSTEIN_API_URL")
 
-faq_pc = Pinecone(api_key=faq_api_key)
-
-# Connect to indexes
+# FAQ index: the in-process snapshot (see faq_index.py) when one exists, so
+# queries need no network hop. Pinecone is only used with FAQ_INDEX_BACKEND=pinecone
+# or when no local snapshot has been built yet.
 faq_index_name = "learning-buddy-faq"
-faq_index = faq_pc.Index(faq_index_name)
+faq_index_backend = os.getenv("FAQ_INDEX_BACKEND", "local").lower()
+faq_index_path = os.getenv("FAQ_INDEX_PATH", "faq_index")
+
+
+def load_faq_index():
+    if faq_index_backend == "local" and LocalFaqIndex.exists(faq_index_path):
+        faq_index = LocalFaqIndex.load(faq_index_path)
+        logger.info(f"Loaded local FAQ index with {len(faq_index)} entries from {faq_index_path}")
+        return faq_index
 
-# Load embedding model
-model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+    from pinecone import Pinecone
+
+    if faq_index_backend == "local":
+        logger.warning(f"No local FAQ index at {faq_index_path}, falling back to Pinecone")
+    faq_pc = Pinecone(api_key=faq_api_key)
+    return faq_pc.Index(faq_index_name)
+
+
+# Load models
+register_fraud_artifacts(registry)
+registry.register("embedding_model", load_embedding_model, group="rag")
+registry.register("faq_index", load_faq_index, group="rag")
+
+# Query-embedding cache: repeated phrasings skip the transformer, and concurrent
+# misses are encoded together in one batch
+embedding_cache = EmbeddingCache(
+    lambda: registry.get("embedding_model"),
+    CompactEmbeddingStore(
+        max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "4096")),
+        dtype=os.getenv("EMBEDDING_CACHE_DTYPE", "float16"),
+        disk_path=os.getenv("EMBEDDING_CACHE_PATH") or None
+    ),
+    max_batch_size=int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32")),
+    max_wait_ms=float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "2"))
+)
+
+# Semantic answer cache for /retrieve-faq-and-respond (off by default). Enable per
+# deployment with SEMANTIC_CACHE_ENABLED=true.
+semantic_cache = None
+if os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true":
+    semantic_cache = SemanticAnswerCache(
+        threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95")),
+        ttl=float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "3600")),
+        max_entries=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+    )
 
 # FastAPI setup
 app = FastAPI()
 
-# Einstein AI token management
-class EinsteinTokenManager:
-    def __init__(self):
-        self.access_token = None
-        self.token_expiry = 0
-
-    def get_access_token(self):
-        # Check if token is still valid (expires in 30 minutes = 1800 seconds)
-        if self.access_token and time.time() < self.token_expiry - 60:  # 1-minute buffer
-            return self.access_token
+@app.on_event("startup")
+def load_models():
+    if not MODEL_PRELOAD:
+        return
+    if FAST_START:
+        registry.start()
+        registry.wait(["fraud"])
+    else:
+        registry.wait()
+
+def after_fork():
+    """Called in each worker forked from a preloaded master (gunicorn.conf.py):
+    the models loaded by the master are kept, while threads, locks and
+    connections the master created are replaced with per-process ones."""
+    registry.after_fork()
+    embedding_cache.store.after_fork()
+    EinsteinTokenService.after_fork()
+    session_checkpointer.after_fork()
+
+# Liveness: the process is up and serving requests
+@app.get("/healthz")
+def liveness():
+    return {"status": "alive"}
+
+# Readiness: fraud scoring needs the fraud models; in FAST_START mode the RAG
+# stack may still be warming up
+@app.get("/readyz")
+def readiness():
+    fraud_ready = registry.is_ready("fraud")
+    rag_ready = registry.is_ready("rag")
+    ready = fraud_ready and (rag_ready or FAST_START)
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "fast_start": FAST_START,
+            "groups": {"fraud": fraud_ready, "rag": rag_ready},
+            "models": registry.status()
+        }
+    )
 
-        # Request new token
-        try:
-            response = requests.post(
-                einstein_token_url,
-                data={
-                    "grant_type": "client_credentials",
-                    "client_id": einstein_client_id,
-                    "client_secret": einstein_client_secret
-                }
-            )
-            response.raise_for_status()
-            token_data = response.json()
-            self.access_token = token_data["access_token"]
-            self.token_expiry = time.time() + 1800  # Token valid for 30 minutes
-            return self.access_token
-        except Exception as e:
-            logger.error(f"Error fetching Einstein AI token: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Error fetching Einstein AI token: {str(e)}")
+# Einstein AI token management: one shared, proactively refreshed token service
+# (also used by the LangGraph agent in einstein_graph.py)
+@app.on_event("startup")
+def start_einstein_token_service():
+    try:
+        EinsteinTokenService.instance().start()
+    except ValueError as e:
+        logger.warning(f"Einstein token service not started: {str(e)}")
+
+# Shared async Einstein client (pooled keep-alive connections)
+einstein_client = EinsteinClient(
+    einstein_api_url,
+    token_provider=lambda: EinsteinTokenService.instance().aget_access_token()
+)
 
-# Initialize token manager
-einstein_token_manager = EinsteinTokenManager()
+@app.on_event("shutdown")
+async def close_einstein_client():
+    await einstein_client.aclose()
 
 # Updated Transaction schema
 class PreviousTransaction(BaseModel):
+    # Only amount, location and updatedAt are analysed; the rest of the stored
+    # document is accepted but optional, so callers can send a slim projection
     _id: str
-    senderAccountNumber: str
-    receiverAccountNumber: str
+    senderAccountNumber: Optional[str] = None
+    receiverAccountNumber: Optional[str] = None
     amount: float
-    type: str
+    type: Optional[str] = None
     location: str
-    fraudPercentage: float
-    deviceId: str
-    createdAt: str
+    fraudPercentage: Optional[float] = None
+    deviceId: Optional[str] = None
+    createdAt: Optional[str] = None
     updatedAt: str
     __v: int
 
@@ -126,40 +225,53 @@ class Transaction(BaseModel):
     errorBalanceDest: float
     # New inputs
     location: str
-    previousTransactions: List[PreviousTransaction]
+    # With senderAccountNumber, spikes and location feasibility come from the
+    # account's server-side rolling state; previousTransactions only seeds an
+    # account seen for the first time
+    senderAccountNumber: Optional[str] = None
+    # Recorded in the account state once per id, so a retried request is not
+    # counted twice (without it, an identical payload counts as a retry)
+    transactionId: Optional[str] = None
+    previousTransactions: List[PreviousTransaction] = []
 
 # FAQ RAG with Einstein AI endpoint
-@app.post("/retrieve-faq-and-respond")
-async def retrieve_faq_and_respond(request: QueryRequest):
+def check_faq_query(request: QueryRequest) -> str:
     query = request.query.strip()
     if not query:
         raise HTTPException(status_code=400, detail="Query cannot be empty")
-
-    try:
-        # Generate embedding for the query
-        query_embedding = model.encode(query).tolist()
-
-        # Query FAQ index
-        query_results = faq_index.query(
-            vector=query_embedding,
-            top_k=3,
-            include_metadata=True
-        )
-
-        # Extract FAQs with score > 0.5
-        faqs = [
-            {
-                "question": match.metadata.get("question", "Unknown"),
-                "answer": match.metadata.get("answer", "No answer"),
-                "score": match.score
-            }
-            for match in query_results.matches
-            if match.score > 0.5
-        ]
-
-        # Construct prompt for Einstein AI
-        faq_context = "\n".join([f"Q: {faq['question']}\nA: {faq['answer']}" for faq in faqs])
-        prompt = f"""
+    if FAST_START and not registry.is_ready("rag"):
+        raise HTTPException(status_code=503, detail="FAQ assistant is still starting up, please retry shortly")
+    return query
+
+async def retrieve_faqs(query: str) -> Tuple[list, List[dict], List[str]]:
+    """Returns (query embedding, relevant FAQs, their ids)."""
+    # Generate embedding for the query (cached; misses are batched off the event loop)
+    query_embedding = (await embedding_cache.encode(query)).tolist()
+
+    # Query FAQ index
+    query_results = await run_in_threadpool(
+        registry.get("faq_index").query,
+        vector=query_embedding,
+        top_k=3,
+        include_metadata=True
+    )
+
+    # Extract FAQs with score > 0.5
+    relevant_matches = [match for match in query_results.matches if match.score > 0.5]
+    faqs = [
+        {
+            "question": match.metadata.get("question", "Unknown"),
+            "answer": match.metadata.get("answer", "No answer"),
+            "score": match.score
+        }
+        for match in relevant_matches
+    ]
+    return query_embedding, faqs, [match.id for match in relevant_matches]
+
+def faq_prompt(query: str, faqs: List[dict]) -> str:
+    # Construct prompt for Einstein AI
+    faq_context = "\n".join([f"Q: {faq['question']}\nA: {faq['answer']}" for faq in faqs])
+    return f"""
         You are a helpful assistant for a fault tolerant Secure Bank Application. Use the following FAQ context to answer the user's query. 
         Strictly refrain from using the context if it is not relevant to the user's query.
         If you are unable to answer the query then simply refuse the user by answering that you do not currently have any idea related to this query and the user may connect with an SecureBank agent, on email id customer.support@securebank.com
@@ -176,23 +288,26 @@ async def retrieve_faq_and_respond(request: QueryRequest):
         Response:
         """
 
-        # Get Einstein AI access token
-        access_token = einstein_token_manager.get_access_token()
+@app.post("/retrieve-faq-and-respond")
+async def retrieve_faq_and_respond(request: QueryRequest):
+    query = check_faq_query(request)
+
+    try:
+        query_embedding, faqs, faq_ids = await retrieve_faqs(query)
+
+        # A near-identical query with the same FAQ context was already answered
+        if semantic_cache is not None:
+            cached_response = semantic_cache.lookup(query_embedding, faq_ids)
+            if cached_response is not None:
+                return {
+                    "response": cached_response,
+                    "faqs": faqs
+                }
 
         # Call Einstein AI
-        headers = {
-            "Authorization": f"Bearer {access_token}",
-            "Content-Type": "application/json",
-            "x-sfdc-app-context": "EinsteinGPT",
-            "x-client-feature-id": "ai-platform-models-connected-app"
-        }
-        payload = {
-            "prompt": prompt
-        }
-        response = requests.post(einstein_api_url, headers=headers, json=payload)
-        response.raise_for_status()
-        response_data = response.json()
-        response_text = response_data["generation"]["generatedText"].strip()
+        response_text = await einstein_client.generate(faq_prompt(query, faqs))
+        if semantic_cache is not None:
+            semantic_cache.store(query_embedding, faq_ids, response_text)
 
         return {
             "response": response_text,
@@ -203,533 +318,648 @@ async def retrieve_faq_and_respond(request: QueryRequest):
         logger.error(f"Error in retrieve-faq-and-respond: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
 
-# Predict route with updated logic
-@app.post("/predict")
-def predict_combined(txn: Transaction):
-    try:
-        # Convert to DataFrame
-        unified_data = pd.DataFrame([txn.dict()])
+# Streaming variant (server-sent events): a "faqs" event as soon as retrieval is
+# done, "chunk" events with the answer text as Einstein generates it, then "done"
+# with the full response (or "error")
+@app.post("/retrieve-faq-and-respond/stream")
+async def retrieve_faq_and_respond_stream(request: QueryRequest):
+    query = check_faq_query(request)
+
+    async def events():
+        try:
+            query_embedding, faqs, faq_ids = await retrieve_faqs(query)
+            yield sse_event("faqs", {"faqs": faqs})
+
+            if semantic_cache is not None:
+                cached_response = semantic_cache.lookup(query_embedding, faq_ids)
+                if cached_response is not None:
+                    yield sse_event("chunk", {"text": cached_response})
+                    yield sse_event("done", {"response": cached_response, "cached": True})
+                    return
+
+            parts = []
+            async for chunk in einstein_client.generate_stream(faq_prompt(query, faqs)):
+                parts.append(chunk)
+                yield sse_event("chunk", {"text": chunk})
+            response_text = "".join(parts).strip()
+            if semantic_cache is not None:
+                semantic_cache.store(query_embedding, faq_ids, response_text)
+            yield sse_event("done", {"response": response_text, "cached": False})
+
+        except Exception as e:
+            logger.error(f"Error in retrieve-faq-and-respond/stream: {str(e)}")
+            yield sse_event("error", {"detail": f"Error processing request: {str(e)}"})
+
+    return sse_response(events())
+
+# ============ Scoring helpers ============
+# Upper bound on rows pushed through the models in one call by /predict/batch
+PREDICT_BATCH_CHUNK_SIZE = int(os.getenv("PREDICT_BATCH_CHUNK_SIZE", "4096"))
+# Upper bound on concurrent Einstein location checks made by one /predict/batch call
+PREDICT_BATCH_EINSTEIN_CONCURRENCY = int(os.getenv("PREDICT_BATCH_EINSTEIN_CONCURRENCY", "8"))
+
+# Local location-feasibility engine. Einstein is only asked about windows the
+# gazetteer cannot resolve, and not at all with LOCATION_LLM_FALLBACK=false.
+feasibility_engine = LocationFeasibilityEngine.from_env()
+LOCATION_LLM_FALLBACK = os.getenv("LOCATION_LLM_FALLBACK", "true").lower() == "true"
+
+
+# Cache for the Einstein location verdict. Bursts from one account send nearly
+# the same last-10 window, so the verdict is keyed on the locations and the
+# (rounded) time gaps between them. LOCATION_CACHE_BACKEND=redis shares it
+# between workers.
+LOCATION_CACHE_ROUND_MINUTES = float(os.getenv("LOCATION_CACHE_ROUND_MINUTES", "1"))
+location_cache = ResultCache(
+    backend_from_env("LOCATION_CACHE"),
+    ttl=float(os.getenv("LOCATION_CACHE_TTL_SECONDS", "600")),
+    name="location"
+)
+
 
+# Per-account rolling state (see account_state.py): running amount/inter-arrival
+# stats and the last LOCATION_WINDOW transactions, updated on every /predict.
+# ACCOUNT_STATE_BACKEND=redis keeps it in Redis instead (read and written
+# atomically on every /predict), so it survives restarts and is shared between
+# workers; ACCOUNT_STATE_MAX_ACCOUNTS bounds the in-memory store only.
+LOCATION_WINDOW = 10
+ACCOUNT_STATE_ENABLED = os.getenv("ACCOUNT_STATE_ENABLED", "true").lower() == "true"
+account_store = AccountStateStore(
+    max_accounts=int(os.getenv("ACCOUNT_STATE_MAX_ACCOUNTS", "100000")),
+    window=LOCATION_WINDOW,
+    persistent=RedisBackend(
+        os.getenv("ACCOUNT_STATE_REDIS_URL", os.getenv("REDIS_URL", "redis://localhost:6379/0")),
+        prefix="account_state:"
+    ) if os.getenv("ACCOUNT_STATE_BACKEND", "memory").lower() == "redis" else None,
+    ttl=float(os.getenv("ACCOUNT_STATE_TTL_SECONDS", str(30 * 24 * 3600)))
+) if ACCOUNT_STATE_ENABLED else None
+
+
+def parse_timestamp(value: str) -> float:
+    """Parses an ISO-8601 timestamp (as sent by the Node backend) to epoch seconds."""
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+
+
+def format_timestamp(ts: float) -> str:
+    """Epoch seconds to the Node backend's ISO-8601 format (``...:52.164Z``)."""
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def location_cache_key(points: List[tuple]) -> str:
+    """Canonical key for a window of ``(location, epoch_seconds)`` points:
+    oldest first, each location with the rounded gap since the previous one."""
+    parts = []
+    previous = None
+    for location, ts in sorted(points, key=lambda point: point[1]):
+        gap = 0 if previous is None else round((ts - previous) / 60 / LOCATION_CACHE_ROUND_MINUTES)
+        parts.append(f"{normalize_location(location)}@{gap}")
+        previous = ts
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()
+
+
+MODEL_NAMES = ("isolation_forest", "svm", "kmeans", "autoencoder", "xgboost")
+# Key of each model in the model_scores response dict
+MODEL_SCORE_KEYS = {name: "xgboost_prob" if name == "xgboost" else name for name in MODEL_NAMES}
+
+
+def score_models(txns: List[Transaction], models: Optional[Iterable[str]] = None) -> List[dict]:
+    """Runs the ensemble models (all of them, or just ``models``) once over the
+    stacked feature matrix of ``txns`` and returns the per-row ``model_scores``
+    dicts, in input order."""
+    models = set(MODEL_NAMES if models is None else models)
+    preprocessor, scaler = registry.get("preprocessor"), registry.get("scaler")
+    xgb_model = registry.get("xgboost")
+    encoder = registry.get("feature_encoder")
+
+    if encoder is not None:
         # ============ Old Model Features ============
-        old_model_features = [
-            'TransactionAmount', 'TransactionType', 'CustomerOccupation',
-            'AccountBalance', 'DayOfWeek', 'Hour', 'Time_Gap',
-            'Hour of Transaction', 'AgeGroup', 'Days_Since_Last_Transaction'
-        ]
-        input_old = unified_data[[
-            'TransactionAmount', 'TransactionType', 'CustomerOccupation',
-            'AccountBalance', 'DayOfWeek', 'Hour', 'Time_Gap',
-            'Hour_of_Transaction', 'AgeGroup', 'Days_Since_Last_Transaction'
-        ]]
-        input_old.columns = old_model_features  # Rename for preprocessor consistency
+        X_transformed, X_scaled = encoder.transform(txns)
+        # The compiled scorer takes a plain matrix; the pickle wants named columns
+        if isinstance(xgb_model, CompiledXGBClassifier):
+            input_xgb = encoder.numeric_matrix(txns, XGB_FEATURES)
+        else:
+            input_xgb = pd.DataFrame([{field: getattr(txn, field) for field in XGB_FEATURES} for txn in txns])
+    else:
+        # Convert to DataFrame (history is not a model input, so leave it out)
+        unified_data = pd.DataFrame([txn.dict(exclude={"previousTransactions"}) for txn in txns])
+
+        # ============ Old Model Features ============
+        input_old = unified_data[OLD_MODEL_INPUT_FIELDS]
+        input_old.columns = OLD_MODEL_FEATURES  # Rename for preprocessor consistency
 
         X_transformed = preprocessor.transform(input_old)
         X_scaled = scaler.transform(X_transformed)
+        input_xgb = unified_data[XGB_FEATURES]
+
+    flags = {}
+    # Anomaly-based models (DBSCAN removed)
+    if "isolation_forest" in models:
+        flags["isolation_forest"] = registry.get("isolation_forest").predict(X_transformed) == -1
+    if "svm" in models:
+        flags["svm"] = registry.get("svm").predict(X_scaled) == -1
+
+    # Distance/reconstruction-based models, against the calibrated thresholds.
+    # Uncalibrated, they cannot fire (a row never exceeds its own percentile),
+    # so they are not run at all.
+    thresholds = registry.get("anomaly_thresholds")
+    no_flags = np.zeros(len(txns), dtype=bool)
+    if "kmeans" in models:
+        flags["kmeans"] = no_flags if thresholds is None else (
+            kmeans_distances(registry.get("kmeans"), X_scaled) > thresholds["kmeans_distance"])
+    if "autoencoder" in models:
+        flags["autoencoder"] = no_flags if thresholds is None else (
+            reconstruction_mse(registry.get("autoencoder"), X_scaled) > thresholds["autoencoder_mse"])
+
+    # ============ XGBoost Model ============
+    if "xgboost" in models:
+        xgb_probs = xgb_model.predict_proba(input_xgb)[:, 1]
+
+    results = []
+    for i in range(len(txns)):
+        scores = {name: 1 if flags[name][i] else 0 for name in MODEL_NAMES if name in flags}
+        if "xgboost" in models:
+            scores["xgboost_prob"] = float(xgb_probs[i])
+        results.append(scores)
+    return results
+
+
+def time_deltas_minutes(timestamps: List[str]) -> np.ndarray:
+    """Minutes between consecutive ISO-8601 timestamps (``timestamps[i] - timestamps[i + 1]``).
+
+    UTC ``...Z`` timestamps (what the Node backend sends) are parsed in one
+    pass as datetime64 microseconds; anything else goes through
+    ``datetime.fromisoformat`` one by one.
+    """
+    if all(ts.endswith('Z') for ts in timestamps):
+        try:
+            micros = np.array([ts[:-1] for ts in timestamps], dtype='datetime64[us]').astype(np.int64)
+            # Same rounding as timedelta.total_seconds() / 60
+            return (micros[:-1] - micros[1:]) / 10**6 / 60
+        except ValueError:
+            pass
+    parsed = [datetime.fromisoformat(ts.replace('Z', '+00:00')) for ts in timestamps]
+    return np.array([(t1 - t2).total_seconds() / 60 for t1, t2 in zip(parsed, parsed[1:])], dtype=np.float64)
 
-        # Anomaly-based models (DBSCAN removed)
-        iso_score = 1 if iso_forest.predict(X_transformed)[0] == -1 else 0
-        svm_score = 1 if svm.predict(X_scaled)[0] == -1 else 0
-
-        kmeans_label = kmeans.predict(X_scaled)
-        distance = np.linalg.norm(X_scaled - kmeans.cluster_centers_[kmeans_label], axis=1)[0]
-        kmeans_threshold = np.percentile(distance, 95)
-        kmeans_score = 1 if distance > kmeans_threshold else 0
-
-        reconstruction = autoencoder.predict(X_scaled, verbose=0)
-        mse = np.mean(np.power(X_scaled - reconstruction, 2), axis=1)[0]
-        ae_threshold = np.percentile(mse, 95)
-        ae_score = 1 if mse > ae_threshold else 0
-
-        # ============ XGBoost Model ============
-        xgb_features = [
-            'amount', 'oldBalanceOrig', 'newBalanceOrig',
-            'oldBalanceDest', 'newBalanceDest',
-            'errorBalanceOrig', 'errorBalanceDest'
-        ]
-        input_xgb = unified_data[xgb_features]
-        xgb_prob = float(xgb_model.predict_proba(input_xgb)[0][1])
-
-        # ============ Previous Transactions Analysis ============
-        prev_txns = sorted(txn.previousTransactions, key=lambda x: x.updatedAt, reverse=True)
-        time_deltas = []
-        amounts = [txn.amount for txn in prev_txns]
-
-        # Calculate time deltas
-        for i in range(len(prev_txns) - 1):
-            t1 = datetime.fromisoformat(prev_txns[i].updatedAt.replace('Z', '+00:00'))
-            t2 = datetime.fromisoformat(prev_txns[i + 1].updatedAt.replace('Z', '+00:00'))
-            delta = (t1 - t2).total_seconds() / 60  # in minutes
-            time_deltas.append(delta)
-
-        # Detect abrupt changes using z-score
-        time_spike_score = 0
-        if time_deltas:
-            time_mean = np.mean(time_deltas)
-            time_std = np.std(time_deltas) if np.std(time_deltas) > 0 else 1
-            time_z_scores = [(t - time_mean) / time_std for t in time_deltas]
-            time_spike_score = 1 if any(abs(z) > 3 for z in time_z_scores) else 0
-
-        amount_spike_score = 0
-        if len(amounts) > 1:
-            amount_mean = np.mean(amounts)
-            amount_std = np.std(amounts) if np.std(amounts) > 0 else 1
-            amount_z_scores = [(a - amount_mean) / amount_std for a in amounts]
-            amount_spike_score = 1 if any(abs(z) > 3 for z in amount_z_scores) else 0
-
-        # Combined spike score (average of time and amount)
-        spike_score = (time_spike_score + amount_spike_score) / 2
-
-        # ============ Einstein AI Location Feasibility Check ============
-        ai_score = 0
-        if prev_txns:
-            # Take last 10 transactions
-            last_10_txns = prev_txns[:10]
-            txn_data = [
-                {
-                    "location": txn.location,
-                    "amount": txn.amount,
-                    "timestamp": txn.updatedAt
-                }
-                for txn in last_10_txns
-            ]
-            prompt = f"""
-            You are an assistant analyzing bank transactions for fraud detection. 
-            Given the following list of transactions with their locations and timestamps, check if any two consecutive transactions occur at different locations.
-            For each pair of consecutive transactions at different locations, evaluate if the time difference between them is feasible for travel between those locations,
-            Considering typical travel speeds (e.g., car, plane). If the travel time is not feasible (e.g., too short for the distance), return 1. 
-            If all pairs are feasible or no different locations are found, return 0. Output exactly one digit: 0 or 1.
-
-            Example: trasaction 
-                one is conducted at: location:Delhi timestamp: 2025-06-12T05:45:52.164Z
-                second is conducted at: location Ahemdabad timestamp: 2025-06-12T05:47:52.164Z
-                Now the time differnce is 2 minutes and we have an estimate that the time to reach from Ahemdabad to Delhi is 2 hours, but the differnce in time is 2 minutes
-                so it would be classified as a fraud transaction, and the response would be 1
-            
-            Now please review the transactions below:
-
-
-            Transactions:
-            {json.dumps(txn_data, indent=2)}
-
-            A STRICT INSTRUCTION: YOU CAN ONLY RESPOND USING 1 IT IT IS FRAUD 0 IF IT IS GENUINE, DO NOT GENERATE ANY SINGLE LETTER EXCEPT THAT
-
-            Response:
-            """
-
-            # Get Einstein AI access token
-            access_token = einstein_token_manager.get_access_token()
-
-            # Call Einstein AI
-            headers = {
-                "Authorization": f"Bearer {access_token}",
-                "Content-Type": "application/json",
-                "x-sfdc-app-context": "EinsteinGPT",
-                "x-client-feature-id": "ai-platform-models-connected-app"
-            }
-            payload = {"prompt": prompt}
-            response = requests.post(einstein_api_url, headers=headers, json=payload)
-
-            # print(payload,response)
-            response.raise_for_status()
-            response_data = response.json()
-            # print(response_data)
-            ai_response = response_data["generation"]["generatedText"].strip()
-            ai_score = int(ai_response) if ai_response in ["0", "1"] else 0
-
-        # ============ Final Fraud Percentage ============
-        model_scores = [
-            iso_score, svm_score, kmeans_score, ae_score, xgb_prob
-        ]
-        model_avg = float(np.mean(model_scores))
-        fraud_percentage = (
-            0.3 * model_avg +  # 40% from models
-            0.3 * spike_score +  # 30% from time/amount spikes
-            0.4 * ai_score  # 30% from Einstein AI
-        )
 
-        return {
-            "model_scores": {
-                "isolation_forest": iso_score,
-                "svm": svm_score,
-                "kmeans": kmeans_score,
-                "autoencoder": ae_score,
-                "xgboost_prob": xgb_prob
-            },
-            "spike_score": {
-                "time_spike": time_spike_score,
-                "amount_spike": amount_spike_score,
-                "combined_spike": spike_score
-            },
-            "ai_location_score": ai_score,
-            "fraud_percentage": fraud_percentage
-        }
+def has_z_spike(values: np.ndarray) -> int:
+    """1 if any value is more than 3 standard deviations from the mean."""
+    std = np.std(values)
+    return 1 if np.any(np.abs((values - np.mean(values)) / (std if std > 0 else 1)) > 3) else 0
 
-    except Exception as e:
-        logger.error(f"Error in predict_combined: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
 
+def score_spikes(txn: Transaction) -> dict:
+    """Z-score spike detection over the transaction's previous history."""
+    prev_txns = txn.previousTransactions
+    updated_at = np.array([prev.updatedAt for prev in prev_txns], dtype=str)
+    # Newest first; the same order (ties included) as sorted(..., reverse=True)
+    order = (len(prev_txns) - 1 - np.argsort(updated_at[::-1], kind="stable"))[::-1]
+    amounts = np.array([prev_txns[i].amount for i in order], dtype=np.float64)
 
+    # Detect abrupt changes using z-score
+    time_spike_score = 0
+    if len(prev_txns) > 1:
+        time_spike_score = has_z_spike(time_deltas_minutes(updated_at[order].tolist()))
 
+    amount_spike_score = 0
+    if len(amounts) > 1:
+        amount_spike_score = has_z_spike(amounts)
 
+    # Combined spike score (average of time and amount)
+    spike_score = (time_spike_score + amount_spike_score) / 2
 
-import os
-import requests
-import json
-import time
-import uuid
-from typing import TypedDict, Annotated, Sequence, Optional, Dict
-
-from fastapi import FastAPI, Body, HTTPException
-from pydantic import BaseModel, Field
-from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, ToolMessage, AnyMessage
-from langchain_core.tools import tool
-from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda
-from langgraph.graph import StateGraph, END, START
-from langgraph.prebuilt import ToolNode, tools_condition
-from langgraph.graph.message import add_messages
-from dotenv import load_dotenv
+    return {
+        "time_spike": time_spike_score,
+        "amount_spike": amount_spike_score,
+        "combined_spike": spike_score
+    }
 
-# --- 0. Load Environment Variables & Setup ---
 
-# For this to work, create a .env file in the same directory
-# with the following keys.
-#
-# .env.example
-# EINSTEIN_CLIENT_ID="your_client_id"
-# EINSTEIN_CLIENT_SECRET="your_client_secret"
-# EINSTEIN_TOKEN_URL="https://your.einstein.token.url/..."
-# EINSTEIN_API_URL="https://your.einstein.api.url/..."
-# BASE_URL="http://localhost:5000/api/v1/admin" # Your Node.js backend
+def payload_location_window(txn: Transaction) -> List[Tuple[str, float, float]]:
+    """The payload's last LOCATION_WINDOW previous transactions, newest first."""
+    prev_txns = sorted(txn.previousTransactions, key=lambda x: x.updatedAt, reverse=True)
+    return [(prev.location, parse_timestamp(prev.updatedAt), prev.amount) for prev in prev_txns[:LOCATION_WINDOW]]
 
-load_dotenv()
 
-# This is the base URL for your running Node.js backend.
-BASE_URL = os.getenv("BASE_URL", "http://localhost:5000/api/v1/admin")
+async def score_location(txn: Transaction) -> int:
+    """Location feasibility over the payload's previous transactions."""
+    return await score_location_window(payload_location_window(txn))
 
-# --- 1. Define Tool Schemas and Functions ---
-# This section remains unchanged. The tools define the capabilities of your agent.
 
-class GetStatsByRegionArgs(BaseModel):
-    """Input schema for the get_stats_by_region tool."""
-    region: str = Field(..., description="The region to get statistics for (e.g., 'North', 'South').")
+def local_location_verdict(window: List[Tuple[str, float, float]]) -> Optional[int]:
+    """The local feasibility engine's verdict on a ``(location, epoch_seconds,
+    amount)`` window: 1 for infeasible travel, 0 otherwise, or None when the
+    gazetteer cannot resolve its locations."""
+    if not window:
+        return 0
+    return feasibility_engine.check([(location, ts) for location, ts, _ in window])
 
-@tool(args_schema=GetStatsByRegionArgs)
-def get_stats_by_region(region: str) -> dict:
-    """
-    Fetches statistics for a specific region by hitting the /stats/region endpoint.
-    """
-    print(f"--- Calling Tool: get_stats_by_region with region: {region} ---")
-    try:
-        response = requests.get(
-            f"{BASE_URL}/stats/region",
-            json={"region": region},
-            headers={"Content-Type": "application/json"}
-        )
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        return {"error": f"API request failed: {e}", "details": str(e.response.text if e.response else "No response")}
-
-class GetStatsByUserArgs(BaseModel):
-    """Input schema for the get_stats_by_user tool."""
-    user_id: str = Field(..., description="The unique identifier of the user.")
-
-@tool(args_schema=GetStatsByUserArgs)
-def get_stats_by_user(user_id: str) -> dict:
+
+async def einstein_location_fallback(window: List[Tuple[str, float, float]]) -> int:
+    """Einstein AI's (cached) verdict on a window the local engine cannot
+    resolve, or 0 with LOCATION_LLM_FALLBACK=false."""
+    if not LOCATION_LLM_FALLBACK:
+        return 0
+    points = [(location, ts) for location, ts, _ in window]
+    return await location_cache.get_or_compute(
+        location_cache_key(points), lambda: einstein_location_score(window)
+    )
+
+
+async def score_location_window(window: List[Tuple[str, float, float]]) -> int:
+    """Checks whether the travel between consecutive transactions of a
+    ``(location, epoch_seconds, amount)`` window is feasible. Returns 1 for
+    infeasible, 0 otherwise.
+
+    The local feasibility engine answers whenever it can resolve the locations;
+    otherwise Einstein AI is asked, as an optional fallback."""
+    verdict = local_location_verdict(window)
+    if verdict is not None:
+        return verdict
+    return await einstein_location_fallback(window)
+
+
+async def einstein_location_score(window: List[Tuple[str, float, float]]) -> int:
+    """Asks Einstein AI for the feasibility verdict on a window of transactions."""
+    txn_data = [
+        {
+            "location": location,
+            "amount": amount,
+            "timestamp": format_timestamp(ts)
+        }
+        for location, ts, amount in window
+    ]
+    prompt = f"""
+    You are an assistant analyzing bank transactions for fraud detection. 
+    Given the following list of transactions with their locations and timestamps, check if any two consecutive transactions occur at different locations.
+    For each pair of consecutive transactions at different locations, evaluate if the time difference between them is feasible for travel between those locations,
+    Considering typical travel speeds (e.g., car, plane). If the travel time is not feasible (e.g., too short for the distance), return 1. 
+    If all pairs are feasible or no different locations are found, return 0. Output exactly one digit: 0 or 1.
+
+    Example: trasaction 
+        one is conducted at: location:Delhi timestamp: 2025-06-12T05:45:52.164Z
+        second is conducted at: location Ahemdabad timestamp: 2025-06-12T05:47:52.164Z
+        Now the time differnce is 2 minutes and we have an estimate that the time to reach from Ahemdabad to Delhi is 2 hours, but the differnce in time is 2 minutes
+        so it would be classified as a fraud transaction, and the response would be 1
+    
+    Now please review the transactions below:
+
+
+    Transactions:
+    {json.dumps(txn_data, indent=2)}
+
+    A STRICT INSTRUCTION: YOU CAN ONLY RESPOND USING 1 IT IT IS FRAUD 0 IF IT IS GENUINE, DO NOT GENERATE ANY SINGLE LETTER EXCEPT THAT
+
+    Response:
     """
-    Fetches statistics for a specific user by ID by hitting the /stats/user/:id endpoint.
+
+    # Call Einstein AI
+    ai_response = await einstein_client.generate(prompt)
+    ai_score = int(ai_response) if ai_response in ["0", "1"] else 0
+    return ai_score
+
+
+def account_history(txn: Transaction) -> List[Tuple[float, str, float]]:
+    return [(prev.amount, prev.location, parse_timestamp(prev.updatedAt)) for prev in txn.previousTransactions]
+
+
+def account_snapshot(txn: Transaction) -> Optional[AccountState]:
+    """A copy of the sender's rolling state to score ``txn`` against (the store
+    is not changed), or None when the request carries no account (or state is off)."""
+    if account_store is None or not txn.senderAccountNumber:
+        return None
+    return account_store.snapshot(txn.senderAccountNumber, account_history(txn))
+
+
+def transaction_key(txn: Transaction) -> str:
+    if txn.transactionId:
+        return txn.transactionId
+    return hashlib.sha256(txn.json().encode()).hexdigest()
+
+
+def record_account(txn: Transaction, now: float):
+    """Records a scored ``txn`` in its sender's rolling state, once per transaction."""
+    if account_store is None or not txn.senderAccountNumber:
+        return
+    account_store.observe(txn.senderAccountNumber, txn.amount, txn.location, now, account_history(txn),
+                          txn_id=transaction_key(txn))
+
+
+async def run_account_io(fn, *args):
+    if account_store is not None and account_store.persistent is not None:
+        # A Redis round trip must not block the event loop
+        return await run_in_threadpool(fn, *args)
+    return fn(*args)
+
+
+def score_spikes_from_state(state: AccountState, txn: Transaction, now: float) -> dict:
+    """O(1) spike check: the new amount and time since the account's previous
+    transaction against the account's running mean/std (|z| > 3 is a spike)."""
+    gap = state.gap_minutes(now)
+    time_z = state.gaps.zscore(gap) if gap is not None else None
+    amount_z = state.amounts.zscore(txn.amount)
+    time_spike_score = 1 if time_z is not None and abs(time_z) > 3 else 0
+    amount_spike_score = 1 if amount_z is not None and abs(amount_z) > 3 else 0
+    return {
+        "time_spike": time_spike_score,
+        "amount_spike": amount_spike_score,
+        "combined_spike": (time_spike_score + amount_spike_score) / 2
+    }
+
+
+def location_window_from_state(state: AccountState, txn: Transaction, now: float) -> List[Tuple[str, float, float]]:
+    """The new transaction plus the account's most recent ones, newest first."""
+    return [(txn.location, now, txn.amount)] + state.window()[:LOCATION_WINDOW - 1]
+
+
+def fraud_score(model_scores: dict, spike_scores: dict, ai_score: int) -> float:
+    # ============ Final Fraud Percentage ============
+    model_avg = float(np.mean([
+        model_scores["isolation_forest"], model_scores["svm"], model_scores["kmeans"],
+        model_scores["autoencoder"], model_scores["xgboost_prob"]
+    ]))
+    fraud_percentage = (
+        0.3 * model_avg +  # 40% from models
+        0.3 * spike_scores["combined_spike"] +  # 30% from time/amount spikes
+        0.4 * ai_score  # 30% from Einstein AI
+    )
+    return fraud_percentage
+
+
+def build_prediction(model_scores: dict, spike_scores: dict, ai_score: int,
+                     degraded_stages: Optional[List[str]] = None,
+                     skipped_stages: Optional[List[str]] = None) -> dict:
+    """Combines the individual scores into the /predict response body."""
+    return {
+        "model_scores": model_scores,
+        "spike_score": spike_scores,
+        "ai_location_score": ai_score,
+        "fraud_percentage": fraud_score(model_scores, spike_scores, ai_score),
+        "degraded_stages": degraded_stages or [],
+        "skipped_stages": skipped_stages or []
+    }
+
+
+# Micro-batching of concurrent /predict requests in front of the ensemble models.
+# A batch is dispatched after PREDICT_MICROBATCH_MAX_WAIT_MS or once it holds
+# PREDICT_MICROBATCH_MAX_SIZE transactions, whichever comes first.
+PREDICT_MICROBATCH_ENABLED = os.getenv("PREDICT_MICROBATCH_ENABLED", "true").lower() == "true"
+predict_batcher = MicroBatcher(
+    score_models,
+    max_batch_size=int(os.getenv("PREDICT_MICROBATCH_MAX_SIZE", "64")),
+    max_wait_ms=float(os.getenv("PREDICT_MICROBATCH_MAX_WAIT_MS", "2")),
+    name="predict"
+)
+
+# Opt-in cascade mode (PREDICT_CASCADE_ENABLED=true): the cheap stages (the
+# PREDICT_CASCADE_CHEAP_MODELS, the spike check and the local location
+# feasibility check) run first, and the remaining models and the Einstein
+# location fallback only run when the partial score (skipped stages counted as
+# 0) lands in [PREDICT_CASCADE_LOW, PREDICT_CASCADE_HIGH). Skipped stages can
+# only add to the score, so an exit above the band never lowers a verdict.
+# With the default cheap models the partial score is at most 0.88. The
+# default band is set around the 0.3 "suspicious" line of the admin view. At
+# or above 0.35 a transaction is already over that line. Below 0.15 only the
+# other two models (at most 0.12) are skipped when the location resolved
+# locally, so the score stays under 0.3. An unresolved location skips Einstein
+# too. See replay_benchmark.py for how far the exits move the scores.
+PREDICT_CASCADE_ENABLED = os.getenv("PREDICT_CASCADE_ENABLED", "false").lower() == "true"
+CASCADE_CHEAP_MODELS = [
+    name.strip() for name in os.getenv("PREDICT_CASCADE_CHEAP_MODELS", "xgboost,isolation_forest,kmeans").split(",")
+    if name.strip()
+]
+if set(CASCADE_CHEAP_MODELS) - set(MODEL_NAMES):
+    raise ValueError(f"Unknown models in PREDICT_CASCADE_CHEAP_MODELS: {CASCADE_CHEAP_MODELS}")
+CASCADE_EXPENSIVE_MODELS = [name for name in MODEL_NAMES if name not in CASCADE_CHEAP_MODELS]
+CASCADE_LOW = float(os.getenv("PREDICT_CASCADE_LOW", "0.15"))
+CASCADE_HIGH = float(os.getenv("PREDICT_CASCADE_HIGH", "0.35"))
+cascade_cheap_batcher = MicroBatcher(
+    lambda txns: score_models(txns, CASCADE_CHEAP_MODELS),
+    max_batch_size=predict_batcher.max_batch_size,
+    max_wait_ms=predict_batcher.max_wait * 1000.0,
+    name="predict_cascade_cheap"
+)
+cascade_expensive_batcher = MicroBatcher(
+    lambda txns: score_models(txns, CASCADE_EXPENSIVE_MODELS),
+    max_batch_size=predict_batcher.max_batch_size,
+    max_wait_ms=predict_batcher.max_wait * 1000.0,
+    name="predict_cascade_expensive"
+)
+cascade_exits = {"low": 0, "high": 0, "full": 0}
+
+# /predict runs its stages (ensemble models, spike analysis, location
+# feasibility) concurrently. Each has a time budget (0 disables it); a stage
+# that fails or runs over contributes its fallback value instead, and is listed
+# in the response's degraded_stages.
+STAGE_TIMEOUTS = {
+    "models": float(os.getenv("PREDICT_MODELS_TIMEOUT_MS", "2000")) / 1000.0,
+    "spikes": float(os.getenv("PREDICT_SPIKES_TIMEOUT_MS", "500")) / 1000.0,
+    "location": float(os.getenv("PREDICT_LOCATION_TIMEOUT_MS", "2500")) / 1000.0
+}
+STAGE_FALLBACKS = {
+    "models": {"isolation_forest": 0, "svm": 0, "kmeans": 0, "autoencoder": 0, "xgboost_prob": 0.0},
+    "spikes": {"time_spike": 0, "amount_spike": 0, "combined_spike": 0.0},
+    "location": 0
+}
+
+
+def _discard_result(task: asyncio.Future):
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Detached stage failed: {str(task.exception())}")
+
+
+async def run_stage(name: str, awaitable, degraded: List[str], detach: bool = False):
+    """Awaits one scoring stage within its time budget, falling back on error.
+
+    With ``detach`` the stage keeps running after a timeout instead of being
+    cancelled, so e.g. a slow Einstein verdict still lands in the location
+    cache for the next request.
     """
-    print(f"--- Calling Tool: get_stats_by_user with user_id: {user_id} ---")
+    timeout = STAGE_TIMEOUTS[name] or None
     try:
-        response = requests.get(f"{BASE_URL}/stats/user/{user_id}")
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        return {"error": f"API request failed: {e}", "details": str(e.response.text if e.response else "No response")}
-
-class RegisterEmployeeArgs(BaseModel):
-    """Input schema for the register_employee tool."""
-    name: str = Field(..., description="The full name of the employee.")
-    email: str = Field(..., description="The email address of the employee.")
-    contact: str = Field(..., description="The contact number of the employee.")
-    pin: str = Field(..., description="A numeric PIN for the employee.")
-
-@tool(args_schema=RegisterEmployeeArgs)
-def register_employee(name: str, email: str, contact: str, pin: str) -> dict:
-    """
-    Registers a new employee by hitting the /register-employee endpoint.
-    """
-    print(f"--- Calling Tool: register_employee with data: name={name}, email={email} ---")
+        if detach:
+            task = asyncio.ensure_future(awaitable)
+            task.add_done_callback(_discard_result)
+            awaitable = asyncio.shield(task)
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"{name} stage timed out after {timeout * 1000:.0f}ms, using its fallback")
+    except Exception as e:
+        logger.error(f"{name} stage failed, using its fallback: {str(e)}")
+    degraded.append(name)
+    fallback = STAGE_FALLBACKS[name]
+    return dict(fallback) if isinstance(fallback, dict) else fallback
+
+
+async def model_stage(txn: Transaction, batcher: MicroBatcher, models: Optional[List[str]] = None) -> dict:
+    if PREDICT_MICROBATCH_ENABLED:
+        return await batcher.submit(txn)
+    return (await run_in_threadpool(score_models, [txn], models))[0]
+
+
+async def spike_stage(txn: Transaction, account_state: Optional[AccountState], now: float) -> dict:
+    if account_state is not None:
+        return score_spikes_from_state(account_state, txn, now)
+    return await run_in_threadpool(score_spikes, txn)
+
+
+def location_window(txn: Transaction, account_state: Optional[AccountState], now: float) -> List[Tuple[str, float, float]]:
+    if account_state is not None:
+        return location_window_from_state(account_state, txn, now)
+    return payload_location_window(txn)
+
+
+def location_stage(txn: Transaction, account_state: Optional[AccountState], now: float):
+    return score_location_window(location_window(txn, account_state, now))
+
+
+async def local_location_stage(window: List[Tuple[str, float, float]]) -> Optional[int]:
+    return local_location_verdict(window)
+
+
+async def predict_full(txn: Transaction, account_state: Optional[AccountState], now: float) -> dict:
+    degraded = []
+    model_scores, spike_scores, ai_score = await asyncio.gather(
+        run_stage("models", model_stage(txn, predict_batcher), degraded),
+        run_stage("spikes", spike_stage(txn, account_state, now), degraded),
+        run_stage("location", location_stage(txn, account_state, now), degraded, detach=True)
+    )
+    return build_prediction(model_scores, spike_scores, ai_score, degraded)
+
+
+async def predict_cascade(txn: Transaction, account_state: Optional[AccountState], now: float) -> dict:
+    degraded = []
+    window = location_window(txn, account_state, now)
+    model_scores, spike_scores, local_verdict = await asyncio.gather(
+        run_stage("models", model_stage(txn, cascade_cheap_batcher, CASCADE_CHEAP_MODELS), degraded),
+        run_stage("spikes", spike_stage(txn, account_state, now), degraded),
+        run_stage("location", local_location_stage(window), degraded)
+    )
+    model_scores = {**STAGE_FALLBACKS["models"], **model_scores}
+    ai_score = local_verdict if local_verdict is not None else 0
+    # Only the Einstein fallback is left of the location check, and only when
+    # the gazetteer could not resolve the window
+    pending = CASCADE_EXPENSIVE_MODELS + (["location"] if local_verdict is None and LOCATION_LLM_FALLBACK else [])
+    partial = fraud_score(model_scores, spike_scores, ai_score)
+    if pending and not CASCADE_LOW <= partial < CASCADE_HIGH:
+        cascade_exits["low" if partial < CASCADE_LOW else "high"] += 1
+        return build_prediction(model_scores, spike_scores, ai_score, degraded, pending)
+
+    cascade_exits["full"] += 1
+    stages = []
+    if "location" in pending:
+        stages.append(run_stage("location", einstein_location_fallback(window), degraded, detach=True))
+    if CASCADE_EXPENSIVE_MODELS:
+        stages.append(run_stage(
+            "models", model_stage(txn, cascade_expensive_batcher, CASCADE_EXPENSIVE_MODELS), degraded))
+    results = await asyncio.gather(*stages)
+    if "location" in pending:
+        ai_score, *results = results
+    for scores in results:
+        for name in CASCADE_EXPENSIVE_MODELS:
+            model_scores[MODEL_SCORE_KEYS[name]] = scores[MODEL_SCORE_KEYS[name]]
+    return build_prediction(model_scores, spike_scores, ai_score, degraded)
+
+
+# Predict route with updated logic
+@app.post("/predict")
+async def predict_combined(txn: Transaction):
     try:
-        payload = {"name": name, "email": email, "contact": contact, "pin": pin}
-        response = requests.post(
-            f"{BASE_URL}/register-employee",
-            json=payload,
-            headers={"Content-Type": "application/json"}
-        )
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        return {"error": f"API request failed: {e}", "details": str(e.response.text if e.response else "No response")}
-
-# List of tools available to the agent
-tools = [get_stats_by_region, get_stats_by_user, register_employee]
-
-# --- 2. Define Graph State ---
-# The state manages the flow of messages and errors within the graph.
-class State(TypedDict):
-    messages: Annotated[list[AnyMessage], add_messages]
-    error: Optional[str]
-
-# --- 3. Define Einstein AI LLM Integration as a Runnable ---
-# This section manages authentication and interaction with the Einstein AI model.
-
-class EinsteinTokenManager:
-    """Manages fetching and caching of the Einstein AI access token using a Singleton pattern."""
-    _instance = None
-
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super(EinsteinTokenManager, cls).__new__(cls)
-            cls._instance.access_token: Optional[str] = None
-            cls._instance.token_expiry: float = 0.0
-            cls._instance.client_id = os.getenv("EINSTEIN_CLIENT_ID")
-            cls._instance.client_secret = os.getenv("EINSTEIN_CLIENT_SECRET")
-            cls._instance.token_url = os.getenv("EINSTEIN_TOKEN_URL")
-            if not all([cls._instance.client_id, cls._instance.client_secret, cls._instance.token_url]):
-                raise ValueError("EINSTEIN_CLIENT_ID, EINSTEIN_CLIENT_SECRET, and EINSTEIN_TOKEN_URL must be set in the .env file")
-        return cls._instance
-
-    def get_access_token(self) -> str:
-        """Fetches a new token if the current one is expired or non-existent."""
-        if self.access_token and time.time() < self.token_expiry - 60:  # 60-second buffer
-            return self.access_token
-
-        print("--- Fetching new Einstein AI access token ---")
-        try:
-            response = requests.post(
-                self.token_url,
-                data={
-                    "grant_type": "client_credentials",
-                    "client_id": self.client_id,
-                    "client_secret": self.client_secret
-                }
-            )
-            response.raise_for_status()
-            token_data = response.json()
-            self.access_token = token_data["access_token"]
-            self.token_expiry = time.time() + 1800  # Token is valid for 30 minutes
-            print("--- Successfully fetched new token ---")
-            return self.access_token
-        except Exception as e:
-            print(f"Error fetching Einstein AI token: {str(e)}")
-            raise
+        now = time.time()
+        account_state = await run_account_io(account_snapshot, txn)
 
-class EinsteinRunnable(Runnable):
-    """A custom runnable that invokes the Einstein AI model and parses its response."""
+        if PREDICT_CASCADE_ENABLED:
+            result = await predict_cascade(txn, account_state, now)
+        else:
+            result = await predict_full(txn, account_state, now)
+        # Only a transaction that was scored is recorded
+        await run_account_io(record_account, txn, now)
+        return result
 
-    def invoke(self, state: State, config: Optional[RunnableConfig] = None) -> BaseMessage:
-        print("--- Calling Custom Einstein AI Runnable ---")
-        
-        api_url = os.getenv("EINSTEIN_API_URL")
-        if not api_url:
-            raise ValueError("EINSTEIN_API_URL must be set in the .env file")
-            
-        token_manager = EinsteinTokenManager()
-        
-        prompt_text = self._create_einstein_prompt(state['messages'], tools)
-        
-        try:
-            access_token = token_manager.get_access_token()
-            headers = {
-                "Authorization": f"Bearer {access_token}",
-                "Content-Type": "application/json",
-                # *** ADDED: Required headers for the Einstein API call ***
-                "x-sfdc-app-context": "EinsteinGPT",
-                "x-client-feature-id": "ai-platform-models-connected-app"
-            }
-            payload = {"prompt": prompt_text}
-
-            print("--- Sending prompt to Einstein AI ---")
-            response = requests.post(api_url, headers=headers, json=payload)
-            response.raise_for_status()
-            response_data = response.json()
-            
-            response_text = response_data.get("generation", {}).get("generatedText", "").strip()
-
-            return self._parse_einstein_response(response_text)
+    except Exception as e:
+        logger.error(f"Error in predict_combined: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
 
-        except Exception as e:
-            print(f"Error calling Einstein AI model: {e}")
-            # Pass the actual error message for better debugging
-            return AIMessage(content=f"Sorry, I encountered an error: {e}")
 
-    def _create_einstein_prompt(self, messages: Sequence[BaseMessage], tools_list: list) -> str:
-        """Creates a comprehensive prompt for the Einstein AI model, including tool definitions."""
-        tool_defs_str = "\n".join([json.dumps(t.get_input_schema().model_json_schema()) for t in tools_list])
-        
-        system_prompt = f"""You are a helpful assistant. Your goal is to assist users by calling tools on their behalf.
-Based on the user's query and the conversation history, decide if a tool is needed.
-- If a tool is appropriate, you MUST respond with ONLY a single JSON object with two keys: 'name' and 'args'.
-  'name' must be one of the available tool names.
-  'args' must be an object containing the required parameters for that tool.
-- If the last message was a ToolMessage containing data, your job is to summarize the result for the user in a clear and helpful way.
-- If no tool is needed and you are not summarizing a tool result, respond in natural language.
-
-Available Tools:
-{tool_defs_str}
-
-Conversation History:"""
-        history = "\n".join([f"{msg.__class__.__name__}: {msg.content}" for msg in messages])
-        return f"{system_prompt}\n{history}\n\nUser Query: {messages[-1].content}\nResponse:"
-
-    def _parse_einstein_response(self, response_text: str) -> AIMessage:
-        """Parses the model's response to be either a tool call or a text message."""
-        try:
-            tool_call_data = json.loads(response_text)
-            tool_name = tool_call_data.get("name")
-            tool_args = tool_call_data.get("args")
-
-            if tool_name and isinstance(tool_args, dict):
-                print(f"--- Einstein AI requested tool: {tool_name} with args: {tool_args} ---")
-                return AIMessage(
-                    content="",
-                    tool_calls=[{
-                        "id": f"tool_{uuid.uuid4()}",
-                        "name": tool_name,
-                        "args": tool_args,
-                    }]
-                )
-            else:
-                return AIMessage(content=response_text)
-        except json.JSONDecodeError:
-            print("--- Einstein AI responded with text ---")
-            return AIMessage(content=response_text)
-
-
-# --- 4. Define Graph Nodes ---
-# These nodes form the structure of our agent's logic.
-
-class Assistant:
-    """The assistant node, which invokes the Einstein AI model."""
-    def __init__(self, runnable: Runnable):
-        self.runnable = runnable
-
-    def __call__(self, state: State, config: RunnableConfig):
-        result = self.runnable.invoke(state)
-        return {"messages": [result]}
-
-def handle_tool_error(state: State) -> dict:
-    """A fallback node for handling tool execution errors gracefully."""
-    error = state.get("error")
-    print(f"--- Tool Execution Error: {error} ---")
-    last_message = state["messages"][-1]
-    
-    tool_call_id = ""
-    if hasattr(last_message, 'tool_calls') and last_message.tool_calls:
-        tool_call_id = last_message.tool_calls[0]['id']
+@app.get("/metrics/batcher")
+def batcher_metrics():
+    stats = predict_batcher.stats()
+    if PREDICT_CASCADE_ENABLED:
+        stats["cascade"] = {"cheap": cascade_cheap_batcher.stats(), "expensive": cascade_expensive_batcher.stats()}
+    return stats
+
 
+@app.get("/metrics/cascade")
+def cascade_metrics():
+    total = sum(cascade_exits.values())
     return {
-        "messages": [
-            ToolMessage(
-                content=f"Error: {repr(error)}\n. Please review your input and try again.",
-                tool_call_id=tool_call_id,
-            )
-        ]
+        "enabled": PREDICT_CASCADE_ENABLED,
+        "band": [CASCADE_LOW, CASCADE_HIGH],
+        "cheap_models": CASCADE_CHEAP_MODELS,
+        "exits": cascade_exits,
+        "early_exit_rate": (cascade_exits["low"] + cascade_exits["high"]) / total if total else 0.0
     }
 
-# Instantiate the primary nodes for the graph
-assistant_runnable = EinsteinRunnable()
-tool_node = ToolNode(tools).with_fallbacks(
-    [RunnableLambda(handle_tool_error)], exception_key="error"
-)
 
-# --- 5. Construct the Graph ---
-# This defines the control flow of the agent.
+@app.get("/metrics/accounts")
+def account_metrics():
+    return account_store.stats() if account_store is not None else {"enabled": False}
 
-graph_builder = StateGraph(State)
 
-graph_builder.add_node("assistant", Assistant(assistant_runnable))
-graph_builder.add_node("tools", tool_node)
+@app.get("/metrics/cache")
+def cache_metrics():
+    return {
+        "location": location_cache.stats(),
+        "embedding": embedding_cache.stats(),
+        "semantic_answer": semantic_cache.stats() if semantic_cache is not None else {"enabled": False}
+    }
 
-graph_builder.add_edge(START, "assistant")
-graph_builder.add_conditional_edges(
-    "assistant",
-    tools_condition,
-    {
-        "tools": "tools",
-        END: END
-    },
-)
-graph_builder.add_edge("tools", "assistant")
 
-# Compile the graph into a runnable application
-langgraph_app = graph_builder.compile()
+class BatchPredictRequest(BaseModel):
+    transactions: List[Transaction]
 
 
-# --- 6. FastAPI Application Setup ---
-# This section exposes the LangGraph agent via an API.
+async def score_transactions(txns: List[Transaction], now: float) -> List[dict]:
+    """Scores ``txns`` as /predict would (full path, same account state), in
+    chunks, without recording them in the account state: re-scoring must not
+    count a transaction again."""
+    # Bound the number of concurrent Einstein calls a single batch can make
+    einstein_slots = asyncio.Semaphore(PREDICT_BATCH_EINSTEIN_CONCURRENCY)
 
-api = FastAPI(
-    title="LangGraph Agent with Einstein AI",
-    description="An API to interact with a conversational agent that can use tools.",
-    version="1.0.0"
-)
+    async def location_score(txn, account_state):
+        async with einstein_slots:
+            return await location_stage(txn, account_state, now)
 
-# In-memory store for conversation histories.
-# For production, consider a more persistent store like Redis.
-conversation_histories: Dict[str, list[AnyMessage]] = {}
+    results = []
+    for start in range(0, len(txns), PREDICT_BATCH_CHUNK_SIZE):
+        chunk = txns[start:start + PREDICT_BATCH_CHUNK_SIZE]
+        states = await run_account_io(lambda: [account_snapshot(txn) for txn in chunk])
+        model_scores = await run_in_threadpool(score_models, chunk)
+        spike_scores = await run_in_threadpool(lambda: [
+            score_spikes_from_state(state, txn, now) if state is not None else score_spikes(txn)
+            for txn, state in zip(chunk, states)
+        ])
+        ai_scores = await asyncio.gather(*(location_score(txn, state) for txn, state in zip(chunk, states)))
+        results.extend(map(build_prediction, model_scores, spike_scores, ai_scores))
+    return results
 
-class QueryRequest(BaseModel):
-    """The request body for the /invoke endpoint."""
-    query: str = Field(..., description="The user's query to the agent.")
-    session_id: Optional[str] = Field(None, description="A unique ID to maintain conversation state.")
 
-class QueryResponse(BaseModel):
-    """The response body for the /invoke endpoint."""
-    response: str
-    session_id: str
+# Batch scoring for nightly re-scoring and backlog replays
+@app.post("/predict/batch")
+async def predict_batch(request: BatchPredictRequest):
+    try:
+        return {"results": await score_transactions(request.transactions, time.time())}
 
-@api.post("/invoke", response_model=QueryResponse)
-async def invoke_agent(request: QueryRequest = Body(...)):
-    """
-    Receives a user query, processes it through the LangGraph agent, and returns the final response.
-    """
-    print(f"\n{'='*50}")
-    print(f"🚀 Received query: '{request.query}' for session: {request.session_id}")
-    print(f"{'='*50}")
+    except Exception as e:
+        logger.error(f"Error in predict_batch: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
 
-    session_id = request.session_id or str(uuid.uuid4())
-    
-    # Retrieve existing history or start a new one
-    messages = conversation_histories.get(session_id, [])
-    
-    # Add the new user query to the history
-    messages.append(HumanMessage(content=request.query))
-    
-    config = {"recursion_limit": 10}
-    initial_state = {"messages": messages}
-    
-    try:
-        # Invoke the graph to get the final state
-        final_state = langgraph_app.invoke(initial_state, config=config)
-        
-        # The final response is the last message in the state
-        final_response_message = final_state["messages"][-1]
-        response_content = final_response_message.content if final_response_message.content else "Conversation ended with a tool call."
 
-        # Save the updated history
-        conversation_histories[session_id] = final_state["messages"]
 
-        print(f"\n✅ Final Response for session {session_id}:")
-        print(response_content)
-        print(f"{'='*50}\n")
-        
-        return QueryResponse(response=response_content, session_id=session_id)
 
-    except Exception as e:
-        print(f"--- An unexpected error occurred: {e} ---")
-        raise HTTPException(status_code=500, detail=str(e))
+
+# ============ Admin LangGraph agent ============
+# The agent is defined in einstein_graph.py; it is re-exported here so `main:api`
+# keeps serving /invoke, with the same Einstein token service as the fraud app.
+from einstein_graph import api, langgraph_app, session_checkpointer
 
 
 # curl -X POST "https://984d-14-99-203-243.ngrok-free.app" ^
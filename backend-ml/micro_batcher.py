@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """Coalesces concurrent ``submit`` calls into a single call of ``batch_fn``.
+
+    ``batch_fn`` takes a list of items and returns a list of results in the same
+    order. It runs in the default thread pool, so the event loop keeps queueing
+    new requests while a batch is being processed.
+
+    The wait window only applies when there is already a backlog. A request that
+    reaches an idle batcher is dispatched straight away, so light traffic pays
+    no extra latency; under load, requests pile up while the previous batch runs
+    and are picked up together (up to ``max_batch_size`` items).
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Any]], List[Any]], max_batch_size: int = 64,
+                 max_wait_ms: float = 2.0, name: str = "batcher"):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.name = name
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.batches = 0
+        self.items = 0
+        self.errors = 0
+        self.last_batch_size = 0
+        self.max_batch_size_seen = 0
+        self.batch_seconds = 0.0
+        self.batch_size_histogram: Dict[str, int] = {}
+
+    async def submit(self, item: Any) -> Any:
+        """Queues ``item`` for the next batch and waits for its result."""
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    def _ensure_worker(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            backlog = not self._queue.empty()
+            self._drain(batch)
+
+            if backlog:
+                deadline = loop.time() + self.max_wait
+                while len(batch) < self.max_batch_size:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+                    self._drain(batch)
+
+            await self._dispatch(batch)
+
+    def _drain(self, batch: List[Tuple[Any, asyncio.Future]]):
+        """Moves already-queued items into ``batch`` without waiting."""
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+
+    async def _dispatch(self, batch: List[Tuple[Any, asyncio.Future]], record: bool = True):
+        # Requests that were cancelled while queued (client went away) are dropped
+        batch = [(item, future) for item, future in batch if not future.done()]
+        if not batch:
+            return
+
+        started = time.perf_counter()
+        try:
+            results = await self._call(batch)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Error in {self.name} batch of {len(batch)}: {str(e)}")
+            if len(batch) == 1:
+                if not batch[0][1].done():
+                    batch[0][1].set_exception(e)
+            else:
+                # One bad row must not fail everyone else's request: retry one by one
+                for entry in batch:
+                    await self._dispatch([entry], record=False)
+        else:
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            if record:
+                self._record(len(batch), time.perf_counter() - started)
+
+    async def _call(self, batch: List[Tuple[Any, asyncio.Future]]) -> List[Any]:
+        results = await asyncio.get_running_loop().run_in_executor(
+            None, self.batch_fn, [item for item, _ in batch]
+        )
+        if len(results) != len(batch):
+            raise RuntimeError(f"{self.name}: batch_fn returned {len(results)} results for {len(batch)} items")
+        return results
+
+    def _record(self, size: int, seconds: float):
+        self.batches += 1
+        self.items += size
+        self.last_batch_size = size
+        self.max_batch_size_seen = max(self.max_batch_size_seen, size)
+        self.batch_seconds += seconds
+        # Power-of-two buckets: "1", "2", "4", "8", ... hold sizes up to that bound
+        bucket = str(1 << (size - 1).bit_length())
+        self.batch_size_histogram[bucket] = self.batch_size_histogram.get(bucket, 0) + 1
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": self.batches,
+            "items": self.items,
+            "errors": self.errors,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+            "last_batch_size": self.last_batch_size,
+            "max_batch_size_seen": self.max_batch_size_seen,
+            "avg_batch_ms": 1000.0 * self.batch_seconds / self.batches if self.batches else 0.0,
+            "batch_size_histogram": dict(sorted(self.batch_size_histogram.items(), key=lambda kv: int(kv[0]))),
+        }
@@ -0,0 +1,138 @@
+"""Feature names and loaders for the fraud-scoring artifacts.
+
+Importing this module loads nothing and opens no connections, so offline tools
+(threshold calibration, the parity checks) can use the same features and
+loaders as the app without importing it:
+
+    registry = ModelRegistry()
+    register_fraud_artifacts(registry)
+    scaler = registry.get("scaler")
+"""
+import logging
+import os
+
+import joblib
+
+from anomaly_thresholds import DEFAULT_THRESHOLDS_PATH, load_thresholds
+from feature_encoder import CompiledFeatureEncoder, UnsupportedPipelineError
+from model_registry import ModelRegistry
+from numpy_autoencoder import NumpyAutoencoder
+from svm_approx import ApproximateOneClassSVM
+from tree_compiler import CompiledIsolationForest, CompiledXGBClassifier
+
+logger = logging.getLogger(__name__)
+
+# Column names as they arrive on the Transaction payload, and the names the
+# preprocessor was fitted with.
+OLD_MODEL_INPUT_FIELDS = [
+    'TransactionAmount', 'TransactionType', 'CustomerOccupation',
+    'AccountBalance', 'DayOfWeek', 'Hour', 'Time_Gap',
+    'Hour_of_Transaction', 'AgeGroup', 'Days_Since_Last_Transaction'
+]
+OLD_MODEL_FEATURES = [
+    'TransactionAmount', 'TransactionType', 'CustomerOccupation',
+    'AccountBalance', 'DayOfWeek', 'Hour', 'Time_Gap',
+    'Hour of Transaction', 'AgeGroup', 'Days_Since_Last_Transaction'
+]
+XGB_FEATURES = [
+    'amount', 'oldBalanceOrig', 'newBalanceOrig',
+    'oldBalanceDest', 'newBalanceDest',
+    'errorBalanceOrig', 'errorBalanceDest'
+]
+
+# MODEL_MMAP=true memory-maps the NumPy arrays inside the .pkl artifacts
+# read-only instead of copying them onto the heap, so processes serving the
+# same files share those pages through the OS page cache (see gunicorn.conf.py)
+MODEL_MMAP = os.getenv("MODEL_MMAP", "false").lower() == "true"
+
+
+def load_artifact(path: str):
+    return joblib.load(path, mmap_mode="r" if MODEL_MMAP else None)
+
+
+# Autoencoder: served by the NumPy forward pass from an exported weights file
+# (python numpy_autoencoder.py export) so TensorFlow is never imported.
+# AUTOENCODER_RUNTIME=keras forces the original Keras model.
+AUTOENCODER_RUNTIME = os.getenv("AUTOENCODER_RUNTIME", "numpy").lower()
+AUTOENCODER_WEIGHTS_PATH = os.getenv("AUTOENCODER_WEIGHTS_PATH", "autoencoder_weights.npz")
+
+
+def load_autoencoder():
+    if AUTOENCODER_RUNTIME == "numpy":
+        if os.path.exists(AUTOENCODER_WEIGHTS_PATH):
+            return NumpyAutoencoder.load(AUTOENCODER_WEIGHTS_PATH)
+        logger.warning(f"No autoencoder weights at {AUTOENCODER_WEIGHTS_PATH}, falling back to Keras")
+
+    from tensorflow.keras.models import load_model
+
+    return load_model('autoencoder_model.h5', compile=False)
+
+
+# Tree ensembles: scored from flat node tables (see tree_compiler.py) rather than
+# through the XGBoost/sklearn wrappers. TREE_SCORER=native keeps the pickles.
+TREE_SCORER = os.getenv("TREE_SCORER", "compiled").lower()
+
+
+def compile_trees(model, compiled_cls):
+    if TREE_SCORER != "compiled":
+        return model
+    try:
+        return compiled_cls.from_model(model)
+    except Exception as e:
+        logger.warning(f"Could not compile {type(model).__name__}, using the pickled model: {str(e)}")
+        return model
+
+
+# OneClassSVM: SVM_SCORING=nystroem|pruned|rff replaces the exact RBF kernel sum
+# over every support vector with an approximation of SVM_COMPONENTS terms (see
+# svm_approx.py; check agreement with `python svm_approx.py evaluate` first).
+SVM_SCORING = os.getenv("SVM_SCORING", "exact").lower()
+SVM_COMPONENTS = int(os.getenv("SVM_COMPONENTS", "200"))
+
+
+def load_svm():
+    svm = load_artifact('one_class_svm_model.pkl')
+    if SVM_SCORING == "exact":
+        return svm
+    try:
+        return ApproximateOneClassSVM.from_model(svm, SVM_SCORING, SVM_COMPONENTS)
+    except ValueError as e:
+        logger.warning(f"Could not approximate the OneClassSVM, using the exact model: {str(e)}")
+        return svm
+
+
+# Feature assembly: the preprocessor and scaler compiled into lookup tables (see
+# feature_encoder.py) so requests skip pandas. FEATURE_ENCODER=pandas, or a
+# preprocessor the compiler does not support, keeps the DataFrame path.
+FEATURE_ENCODER = os.getenv("FEATURE_ENCODER", "compiled").lower()
+
+
+def load_feature_encoder(registry: ModelRegistry):
+    if FEATURE_ENCODER != "compiled":
+        return None
+    try:
+        return CompiledFeatureEncoder.from_pipeline(
+            registry.get("preprocessor"), registry.get("scaler"),
+            dict(zip(OLD_MODEL_FEATURES, OLD_MODEL_INPUT_FIELDS))
+        )
+    except UnsupportedPipelineError as e:
+        logger.warning(f"Could not compile the feature encoder, using pandas: {str(e)}")
+        return None
+
+
+def register_fraud_artifacts(registry: ModelRegistry):
+    """Registers every fraud-scoring artifact in ``registry`` (group "fraud")."""
+    registry.register("scaler", lambda: load_artifact('scaler.pkl'), group="fraud")
+    registry.register("preprocessor", lambda: load_artifact('preprocessor.pkl'), group="fraud")
+    registry.register("feature_encoder", lambda: load_feature_encoder(registry), group="fraud")
+    registry.register("isolation_forest", lambda: compile_trees(
+        load_artifact('isolation_forest_model.pkl'), CompiledIsolationForest), group="fraud")
+    registry.register("svm", load_svm, group="fraud")
+    registry.register("kmeans", lambda: load_artifact('kmeans_model.pkl'), group="fraud")
+    registry.register("autoencoder", load_autoencoder, group="fraud")
+    registry.register("xgboost", lambda: compile_trees(
+        load_artifact('xgb_fraud_model.pkl'), CompiledXGBClassifier), group="fraud")
+    # Calibrated KMeans/autoencoder thresholds (python anomaly_thresholds.py calibrate);
+    # None when the file is missing, in which case both detectors score 0 as before
+    registry.register("anomaly_thresholds", lambda: load_thresholds(
+        os.getenv("ANOMALY_THRESHOLDS_PATH", DEFAULT_THRESHOLDS_PATH)), group="fraud")
@@ -0,0 +1,155 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    def __init__(self, name: str, loader: Callable[[], Any], group: str):
+        self.name = name
+        self.loader = loader
+        self.group = group
+        self.future: Optional[Future] = None
+        self.started_at: Optional[float] = None
+        self.seconds: Optional[float] = None
+        # Consecutive failed loads, and when (time.monotonic) the next may start
+        self.failures = 0
+        self.retry_at = 0.0
+
+
+class ModelRegistry:
+    """Loads model artifacts in parallel, in the background, on demand.
+
+    Each artifact is registered with a loader and a group ("fraud", "rag", ...).
+    ``start`` kicks off loading for whole groups on a thread pool; ``get``
+    returns an artifact, loading it first (or waiting for the in-progress load)
+    if needed. Importing the app therefore costs nothing, and readiness can be
+    reported per group.
+
+    A failed load is not permanent: after ``retry_backoff`` seconds (doubling
+    with each consecutive failure, up to ``max_retry_backoff``) the next
+    ``get``, ``start`` or status check loads it again. Until then ``get``
+    raises the last error without retrying.
+    """
+
+    def __init__(self, max_workers: int = 4, retry_backoff: float = 1.0, max_retry_backoff: float = 60.0):
+        self._entries: Dict[str, _Entry] = {}
+        self.max_workers = max_workers
+        self.retry_backoff = retry_backoff
+        self.max_retry_backoff = max_retry_backoff
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="model-loader")
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def after_fork(self):
+        """Makes the registry usable in a forked child (e.g. a gunicorn worker).
+
+        Loaded artifacts are kept, and shared with the parent copy-on-write.
+        The loader threads do not survive a fork, so the pool is replaced, and
+        loads that were still in flight are forgotten and start again on
+        demand.
+        """
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="model-loader")
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        for entry in self._entries.values():
+            if entry.future is not None and not entry.future.done():
+                entry.future = None
+
+    def register(self, name: str, loader: Callable[[], Any], group: str = "default"):
+        self._entries[name] = _Entry(name, loader, group)
+
+    def _load(self, entry: _Entry) -> Any:
+        entry.started_at = time.time()
+        nested = getattr(self._local, "loading", False)
+        self._local.loading = True
+        try:
+            value = entry.loader()
+        except Exception as e:
+            entry.failures += 1
+            backoff = min(self.max_retry_backoff, self.retry_backoff * 2 ** (entry.failures - 1))
+            entry.retry_at = time.monotonic() + backoff
+            logger.error(f"Failed to load {entry.name} (attempt {entry.failures}, retrying in {backoff:.0f}s): {str(e)}")
+            raise
+        finally:
+            entry.seconds = time.time() - entry.started_at
+            self._local.loading = nested
+        entry.failures = 0
+        logger.info(f"Loaded {entry.name} in {entry.seconds:.2f}s")
+        return value
+
+    @staticmethod
+    def _retry_due(entry: _Entry) -> bool:
+        future = entry.future
+        return (future is not None and future.done() and future.exception() is not None
+                and time.monotonic() >= entry.retry_at)
+
+    def _submit(self, entry: _Entry) -> Future:
+        with self._lock:
+            if entry.future is None or self._retry_due(entry):
+                entry.future = self._executor.submit(self._load, entry)
+            return entry.future
+
+    def start(self, groups: Optional[Iterable[str]] = None):
+        """Starts loading every artifact in ``groups`` (all groups if None)."""
+        groups = set(groups) if groups is not None else None
+        for entry in self._entries.values():
+            if groups is None or entry.group in groups:
+                self._submit(entry)
+
+    def wait(self, groups: Optional[Iterable[str]] = None, timeout: Optional[float] = None):
+        """Starts ``groups`` and blocks until they are loaded (raises on failure)."""
+        self.start(groups)
+        groups = set(groups) if groups is not None else None
+        for entry in self._entries.values():
+            if groups is None or entry.group in groups:
+                entry.future.result(timeout=timeout)
+
+    def get(self, name: str, timeout: Optional[float] = None) -> Any:
+        """Returns the artifact, loading it now if nothing has started it yet.
+
+        A loader may ``get`` the artifacts it is built from; those are loaded
+        inline on the loader's thread instead of waiting for a free worker.
+        """
+        entry = self._entries[name]
+        if getattr(self._local, "loading", False):
+            with self._lock:
+                inline = entry.future is None or self._retry_due(entry)
+                if inline:
+                    entry.future = Future()
+            if inline:
+                try:
+                    entry.future.set_result(self._load(entry))
+                except Exception as e:
+                    entry.future.set_exception(e)
+        return self._submit(entry).result(timeout=timeout)
+
+    def state(self, name: str) -> str:
+        entry = self._entries[name]
+        if self._retry_due(entry):
+            self._submit(entry)
+        future = entry.future
+        if future is None:
+            return "not_loaded"
+        if not future.done():
+            return "loading"
+        return "failed" if future.exception() is not None else "ready"
+
+    def is_ready(self, group: str) -> bool:
+        return all(self.state(entry.name) == "ready" for entry in self._entries.values() if entry.group == group)
+
+    def status(self) -> Dict[str, dict]:
+        status = {}
+        for entry in self._entries.values():
+            state = self.state(entry.name)
+            status[entry.name] = {"group": entry.group, "state": state}
+            if entry.seconds is not None:
+                status[entry.name]["load_seconds"] = round(entry.seconds, 3)
+            if state == "failed":
+                status[entry.name]["error"] = str(entry.future.exception())
+                status[entry.name]["failures"] = entry.failures
+                status[entry.name]["retry_in_seconds"] = round(max(0.0, entry.retry_at - time.monotonic()), 1)
+        return status
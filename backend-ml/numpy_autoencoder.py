@@ -0,0 +1,184 @@
+"""TensorFlow-free inference for the Keras autoencoder.
+
+The autoencoder is a small stack of Dense layers, so its forward pass is a few
+float32 matrix products. ``export`` dumps the weights of autoencoder_model.h5
+into a compact .npz once (this is the only step that needs TensorFlow);
+``NumpyAutoencoder`` then serves ``predict`` from NumPy alone.
+
+Usage:
+    python numpy_autoencoder.py export [--model autoencoder_model.h5] [--out autoencoder_weights.npz]
+    python numpy_autoencoder.py verify [--model autoencoder_model.h5] [--weights autoencoder_weights.npz]
+"""
+import argparse
+import json
+import sys
+from typing import List, Optional
+
+import numpy as np
+
+DEFAULT_MODEL_PATH = 'autoencoder_model.h5'
+DEFAULT_WEIGHTS_PATH = 'autoencoder_weights.npz'
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def _softmax(x):
+    e = np.exp(x - np.max(x, axis=-1, keepdims=True))
+    return e / np.sum(e, axis=-1, keepdims=True)
+
+
+def _elu(x, alpha=1.0):
+    return np.where(x > 0, x, alpha * (np.exp(np.minimum(x, 0)) - 1.0))
+
+
+_SELU_ALPHA = 1.6732632423543772
+_SELU_SCALE = 1.0507009873554805
+
+ACTIVATIONS = {
+    "linear": lambda x, alpha: x,
+    "relu": lambda x, alpha: np.maximum(x, 0),
+    "sigmoid": lambda x, alpha: _sigmoid(x),
+    "tanh": lambda x, alpha: np.tanh(x),
+    "softmax": lambda x, alpha: _softmax(x),
+    "softplus": lambda x, alpha: np.logaddexp(x, 0),
+    "elu": lambda x, alpha: _elu(x, alpha if alpha is not None else 1.0),
+    "selu": lambda x, alpha: _SELU_SCALE * _elu(x, _SELU_ALPHA),
+    "swish": lambda x, alpha: x * _sigmoid(x),
+    "silu": lambda x, alpha: x * _sigmoid(x),
+    "leaky_relu": lambda x, alpha: np.where(x > 0, x, (alpha if alpha is not None else 0.3) * x),
+}
+
+
+class NumpyAutoencoder:
+    """Dense forward pass with the same ``predict`` signature as the Keras model."""
+
+    def __init__(self, layers: List[dict]):
+        for layer in layers:
+            if layer.get("activation", "linear") not in ACTIVATIONS:
+                raise ValueError(f"Unsupported activation: {layer['activation']}")
+        self.layers = layers
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_WEIGHTS_PATH) -> "NumpyAutoencoder":
+        with np.load(path) as weights:
+            spec = json.loads(str(weights["spec"]))
+            layers = []
+            for i, layer in enumerate(spec):
+                layer = dict(layer)
+                for key in ("kernel", "bias", "scale", "shift"):
+                    if f"{i}_{key}" in weights:
+                        layer[key] = weights[f"{i}_{key}"].astype(np.float32)
+                layers.append(layer)
+        return cls(layers)
+
+    def predict(self, X, batch_size: Optional[int] = None, verbose: int = 0) -> np.ndarray:
+        x = np.asarray(X, dtype=np.float32)
+        for layer in self.layers:
+            if layer["type"] == "dense":
+                x = x @ layer["kernel"]
+                if "bias" in layer:
+                    x = x + layer["bias"]
+            elif layer["type"] == "affine":
+                x = x * layer["scale"] + layer["shift"]
+            x = ACTIVATIONS[layer.get("activation", "linear")](x, layer.get("alpha"))
+        return x
+
+
+def _activation_name(fn) -> str:
+    return getattr(fn, "__name__", str(fn))
+
+
+def export(model_path: str = DEFAULT_MODEL_PATH, out_path: str = DEFAULT_WEIGHTS_PATH) -> List[dict]:
+    """Converts the Keras model to the .npz layout read by ``NumpyAutoencoder.load``."""
+    from tensorflow.keras.models import load_model
+
+    keras_model = load_model(model_path, compile=False)
+    spec, arrays = [], {}
+    for layer in keras_model.layers:
+        kind = layer.__class__.__name__
+        i = len(spec)
+        if kind in ("InputLayer", "Dropout", "GaussianNoise", "GaussianDropout", "ActivityRegularization"):
+            continue  # no-ops at inference time
+        if kind == "Dense":
+            weights = layer.get_weights()
+            arrays[f"{i}_kernel"] = weights[0]
+            if len(weights) > 1:
+                arrays[f"{i}_bias"] = weights[1]
+            spec.append({"type": "dense", "activation": _activation_name(layer.activation)})
+        elif kind == "BatchNormalization":
+            # Fold the moving statistics into one scale/shift per feature
+            gamma, beta, mean, variance = _batch_norm_weights(layer)
+            scale = gamma / np.sqrt(variance + layer.epsilon)
+            arrays[f"{i}_scale"] = scale
+            arrays[f"{i}_shift"] = beta - mean * scale
+            spec.append({"type": "affine"})
+        elif kind == "Activation":
+            spec.append({"type": "activation", "activation": _activation_name(layer.activation)})
+        elif kind == "LeakyReLU":
+            alpha = float(getattr(layer, "negative_slope", getattr(layer, "alpha", 0.3)))
+            spec.append({"type": "activation", "activation": "leaky_relu", "alpha": alpha})
+        elif kind == "ReLU":
+            spec.append({"type": "activation", "activation": "relu"})
+        else:
+            raise ValueError(f"Cannot export layer {layer.name} of type {kind}")
+    np.savez(out_path, spec=np.array(json.dumps(spec)), **arrays)
+    return spec
+
+
+def _batch_norm_weights(layer):
+    weights = layer.get_weights()
+    dim = weights[-1].shape[0]
+    gamma = weights.pop(0) if layer.scale else np.ones(dim, dtype=np.float32)
+    beta = weights.pop(0) if layer.center else np.zeros(dim, dtype=np.float32)
+    mean, variance = weights
+    return gamma, beta, mean, variance
+
+
+def verify(model_path: str = DEFAULT_MODEL_PATH, weights_path: str = DEFAULT_WEIGHTS_PATH,
+           samples: int = 2000, tolerance: float = 1e-4) -> float:
+    """Compares NumPy and Keras reconstructions on standard-normal inputs (the
+    autoencoder sees StandardScaler output) and returns the max abs difference."""
+    from tensorflow.keras.models import load_model
+
+    keras_model = load_model(model_path, compile=False)
+    numpy_model = NumpyAutoencoder.load(weights_path)
+    X = np.random.default_rng(0).standard_normal((samples, keras_model.input_shape[-1])).astype(np.float32)
+    expected = keras_model.predict(X, verbose=0)
+    actual = numpy_model.predict(X)
+    max_diff = float(np.max(np.abs(expected - actual)))
+    mse_diff = float(np.max(np.abs(np.mean((X - expected) ** 2, axis=1) - np.mean((X - actual) ** 2, axis=1))))
+    print(f"max |keras - numpy| = {max_diff:.3e}, max reconstruction-MSE difference = {mse_diff:.3e}")
+    if max_diff > tolerance:
+        raise AssertionError(f"NumPy autoencoder differs from Keras by {max_diff:.3e} (> {tolerance:.0e})")
+    return max_diff
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Export and verify the NumPy autoencoder")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export_cmd = sub.add_parser("export", help="Convert the Keras .h5 model to a .npz weights file")
+    export_cmd.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    export_cmd.add_argument("--out", default=DEFAULT_WEIGHTS_PATH)
+    verify_cmd = sub.add_parser("verify", help="Check the NumPy forward pass against Keras")
+    verify_cmd.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    verify_cmd.add_argument("--weights", default=DEFAULT_WEIGHTS_PATH)
+    verify_cmd.add_argument("--samples", type=int, default=2000)
+    verify_cmd.add_argument("--tolerance", type=float, default=1e-4)
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        spec = export(args.model, args.out)
+        print(f"Exported {len(spec)} layers to {args.out}: " + ", ".join(
+            f"{layer['type']}({layer.get('activation', 'linear')})" for layer in spec))
+    else:
+        try:
+            verify(args.model, args.weights, args.samples, args.tolerance)
+        except AssertionError as e:
+            print(str(e))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
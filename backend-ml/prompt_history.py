@@ -0,0 +1,120 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English text);
+    the Einstein endpoint does not expose its tokenizer."""
+    return len(text) // 4 + 1
+
+
+def _first_sentence(text: str, max_chars: int) -> str:
+    text = re.sub(r"\s+", " ", text).strip()
+    match = re.match(r"(.+?[.!?])(\s|$)", text)
+    sentence = match.group(1) if match else text
+    return sentence if len(sentence) <= max_chars else sentence[:max_chars].rstrip() + "..."
+
+
+class HistoryRenderer:
+    """Renders conversation history for the Einstein prompt within a token budget.
+
+    Each message is rendered once (its full line, and a one-line summary) and
+    cached by message id and content, so a growing session only renders its
+    new messages, and a message whose stored content changed (tool output the
+    checkpointer truncated) is rendered again. Tool output is cut to
+    ``max_tool_chars`` in the prompt. The newest messages that fit in
+    ``history_tokens`` are included in full; the ones before them are
+    condensed into an extractive summary (what the user asked, the
+    assistant's first sentence, which tools ran), itself capped at
+    ``summary_tokens`` by keeping its most recent lines. The cache holds at
+    most ``max_cached_tokens`` of rendered text.
+    """
+
+    def __init__(self, history_tokens: int = 3000, summary_tokens: int = 400, summary_chars: int = 160,
+                 max_tool_chars: int = 4000, max_cached_tokens: int = 500000):
+        self.history_tokens = history_tokens
+        self.summary_tokens = summary_tokens
+        self.summary_chars = summary_chars
+        self.max_tool_chars = max_tool_chars
+        self.max_cached_tokens = max_cached_tokens
+        # (message id, content hash) -> (full line, its token estimate, summary line or None)
+        self._cache: "OrderedDict[tuple, Tuple[str, int, Optional[str]]]" = OrderedDict()
+        self._cached_tokens = 0
+        self._lock = threading.Lock()
+
+    def _summary_line(self, message: BaseMessage) -> Optional[str]:
+        content = message.content if isinstance(message.content, str) else str(message.content)
+        if isinstance(message, HumanMessage):
+            return f"- User asked: {_first_sentence(content, self.summary_chars)}"
+        if isinstance(message, AIMessage):
+            if message.tool_calls:
+                calls = ", ".join(f"{call['name']}({call['args']})" for call in message.tool_calls)
+                return f"- Assistant called {calls}"
+            return f"- Assistant answered: {_first_sentence(content, self.summary_chars)}" if content else None
+        # Raw tool output is not summarized; the answer that followed it is
+        return None
+
+    def _line(self, message: BaseMessage) -> str:
+        content = message.content if isinstance(message.content, str) else str(message.content)
+        if isinstance(message, ToolMessage) and len(content) > self.max_tool_chars:
+            dropped = len(content) - self.max_tool_chars
+            content = f"{content[:self.max_tool_chars]}... [{dropped} characters truncated]"
+        return f"{message.__class__.__name__}: {content}"
+
+    def _render(self, message: BaseMessage) -> Tuple[str, int, Optional[str]]:
+        key = None
+        if message.id is not None:
+            content = message.content if isinstance(message.content, str) else str(message.content)
+            key = (message.id, hash(content))
+            with self._lock:
+                rendered = self._cache.get(key)
+                if rendered is not None:
+                    self._cache.move_to_end(key)
+                    return rendered
+        line = self._line(message)
+        rendered = (line, estimate_tokens(line), self._summary_line(message))
+        if key is not None:
+            with self._lock:
+                if key not in self._cache:
+                    self._cached_tokens += rendered[1]
+                self._cache[key] = rendered
+                while self._cached_tokens > self.max_cached_tokens and self._cache:
+                    self._cached_tokens -= self._cache.popitem(last=False)[1][1]
+        return rendered
+
+    def render(self, messages: Sequence[BaseMessage]) -> str:
+        rendered = [self._render(message) for message in messages]
+
+        # Newest first until the budget is spent; the latest message is always kept
+        start, used = len(rendered), 0
+        while start > 0 and (start == len(rendered) or used + rendered[start - 1][1] <= self.history_tokens):
+            start -= 1
+            used += rendered[start][1]
+        # A tool result is meaningless without the call that produced it
+        while start < len(messages) - 1 and isinstance(messages[start], ToolMessage):
+            start += 1
+
+        summary: List[str] = []
+        budget = self.summary_tokens
+        for _, _, line in reversed(rendered[:start]):
+            if line is None:
+                continue
+            budget -= estimate_tokens(line)
+            if budget < 0:
+                break
+            summary.append(line)
+
+        history = "\n".join(line for line, _, _ in rendered[start:])
+        if not summary:
+            return history
+        omitted = start - len(summary)
+        header = "Summary of earlier conversation" + (f" ({omitted} older messages omitted)" if omitted > 0 else "")
+        return f"{header}:\n" + "\n".join(reversed(summary)) + f"\n\nRecent messages:\n{history}"
+
+    def stats(self) -> dict:
+        return {"cached_messages": len(self._cache), "cached_tokens": self._cached_tokens,
+                "history_tokens": self.history_tokens, "summary_tokens": self.summary_tokens}
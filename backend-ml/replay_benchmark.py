@@ -0,0 +1,99 @@
+"""Replays recorded /predict payloads through the full and the cascade scoring
+paths and reports how often the cascade exits early and how far its scores
+drift from the full ones.
+
+Payloads are Transaction bodies, as a JSON list or one JSON object per line.
+Scoring runs in-process through the same functions as /predict, on the
+payload history (per-account state is not touched). The Einstein location
+fallback is off unless --llm is given; with it on, the location cache is
+shared by both passes, so compare latencies with care.
+
+Usage:
+    python replay_benchmark.py payloads.jsonl [--low 0.15] [--high 0.35] [--llm] [--limit N]
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import List, Optional
+
+import numpy as np
+
+# Verdict thresholds used by the admin dashboard and the Node backend
+DECISION_THRESHOLDS = [0.3, 0.4, 0.8]
+
+
+def load_payloads(path: str, limit: Optional[int] = None) -> List[dict]:
+    with open(path) as f:
+        text = f.read().strip()
+    payloads = json.loads(text) if text.startswith("[") else [json.loads(line) for line in text.splitlines() if line]
+    return payloads[:limit] if limit else payloads
+
+
+async def replay(payloads: List[dict]) -> dict:
+    import main
+
+    main.registry.wait(["fraud"])
+    full_scores, cascade_scores, full_ms, cascade_ms, exits = [], [], [], [], []
+    for payload in payloads:
+        txn = main.Transaction(**payload)
+        now = time.time()
+
+        started = time.perf_counter()
+        full = await main.predict_full(txn, None, now)
+        full_ms.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        cascade = await main.predict_cascade(txn, None, now)
+        cascade_ms.append((time.perf_counter() - started) * 1000)
+
+        full_scores.append(full["fraud_percentage"])
+        cascade_scores.append(cascade["fraud_percentage"])
+        exits.append(bool(cascade["skipped_stages"]))
+
+    full_scores, cascade_scores = np.array(full_scores), np.array(cascade_scores)
+    drift = np.abs(full_scores - cascade_scores)
+    return {
+        "requests": len(payloads),
+        "band": [main.CASCADE_LOW, main.CASCADE_HIGH],
+        "cheap_models": main.CASCADE_CHEAP_MODELS,
+        "early_exit_rate": float(np.mean(exits)) if exits else 0.0,
+        "score_drift": {
+            "mean": float(drift.mean()) if len(drift) else 0.0,
+            "p95": float(np.percentile(drift, 95)) if len(drift) else 0.0,
+            "max": float(drift.max()) if len(drift) else 0.0
+        },
+        "decision_flips": {
+            str(threshold): int(np.count_nonzero((full_scores > threshold) != (cascade_scores > threshold)))
+            for threshold in DECISION_THRESHOLDS
+        },
+        "latency_ms": {
+            mode: {"mean": float(np.mean(ms)), "p95": float(np.percentile(ms, 95))}
+            for mode, ms in (("full", full_ms), ("cascade", cascade_ms)) if ms
+        }
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Compare cascade and full /predict scoring on recorded payloads")
+    parser.add_argument("payloads", help="JSON list or JSONL file of /predict request bodies")
+    parser.add_argument("--low", type=float, help="Lower edge of the uncertainty band")
+    parser.add_argument("--high", type=float, help="Upper edge of the uncertainty band")
+    parser.add_argument("--llm", action="store_true", help="Allow the Einstein location fallback")
+    parser.add_argument("--limit", type=int)
+    args = parser.parse_args(argv)
+
+    import main as app_main
+
+    app_main.LOCATION_LLM_FALLBACK = args.llm
+    if args.low is not None:
+        app_main.CASCADE_LOW = args.low
+    if args.high is not None:
+        app_main.CASCADE_HIGH = args.high
+
+    report = asyncio.run(replay(load_payloads(args.payloads, args.limit)))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
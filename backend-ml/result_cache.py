@@ -0,0 +1,217 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend:
+    """Storage interface for ``ResultCache``. Values must be JSON-serialisable
+    so that backends shared between workers can store them."""
+
+    # get/set do network or disk I/O, so ResultCache runs them in a thread
+    blocking = True
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: float):
+        raise NotImplementedError
+
+    def update(self, key: str, fn: Callable[[Optional[Any]], Any], ttl: float) -> Any:
+        """Stores ``fn(current value or None)`` and returns it. Backends shared
+        between workers apply this atomically and may call ``fn`` more than
+        once (on a conflicting write), so it must not have side effects
+        beyond its return value."""
+        value = fn(self.get(key))
+        self.set(key, value, ttl)
+        return value
+
+
+class InProcessBackend(CacheBackend):
+    """Bounded LRU with per-entry TTL, local to one worker process."""
+
+    blocking = False
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def update(self, key: str, fn: Callable[[Optional[Any]], Any], ttl: float) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            current = entry[0] if entry is not None and entry[1] >= time.monotonic() else None
+            value = fn(current)
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return value
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisBackend(CacheBackend):
+    """Shares entries across workers/pods through Redis (TTL handled by Redis,
+    eviction by its maxmemory policy)."""
+
+    def __init__(self, url: str, prefix: str = "ffcache:"):
+        import redis  # optional dependency, only needed for this backend
+
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self._redis.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any, ttl: float):
+        self._redis.set(self.prefix + key, json.dumps(value), ex=max(1, int(ttl)))
+
+    def update(self, key: str, fn: Callable[[Optional[Any]], Any], ttl: float) -> Any:
+        import redis
+
+        # Optimistic transaction: if another client writes the key between the
+        # GET and the EXEC, the EXEC fails and the update is redone on its value
+        name = self.prefix + key
+        with self._redis.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(name)
+                    raw = pipe.get(name)
+                    value = fn(json.loads(raw) if raw is not None else None)
+                    pipe.multi()
+                    pipe.set(name, json.dumps(value), ex=max(1, int(ttl)))
+                    pipe.execute()
+                    return value
+                except redis.WatchError:
+                    continue
+
+
+class _ComputeAbandoned(Exception):
+    """The caller computing a value was cancelled before it finished."""
+
+
+class ResultCache:
+    """Caches the result of an expensive async call by key.
+
+    Concurrent misses for the same key are de-duplicated: only the first caller
+    runs ``compute`` and the others await its result (single flight). If that
+    caller is cancelled, one of the waiters takes the computation over. Calls
+    to a blocking backend (Redis, disk) run in a thread, off the event loop.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float = 300.0, name: str = "cache"):
+        self.backend = backend
+        self.ttl = ttl
+        self.name = name
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.takeovers = 0
+        self.backend_errors = 0
+
+    async def _backend_call(self, method: Callable, *args) -> Any:
+        try:
+            if self.backend.blocking:
+                return await asyncio.to_thread(method, *args)
+            return method(*args)
+        except Exception as e:
+            # A broken shared backend must not take scoring down with it
+            self.backend_errors += 1
+            logger.warning(f"{self.name}: cache backend {method.__name__} failed: {str(e)}")
+            return None
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        value = await self._backend_call(self.backend.get, key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        abandoned = False
+        while key in self._in_flight:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(self._in_flight[key])
+            except _ComputeAbandoned:
+                # The first waiter to resume computes it; the rest wait for that one
+                self.coalesced -= 1
+                abandoned = True
+
+        if abandoned:
+            self.takeovers += 1
+        else:
+            self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            # Cancelling the waiters too would fail requests that were not cancelled
+            future.set_exception(_ComputeAbandoned())
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            await self._backend_call(self.backend.set, key, value, self.ttl)
+            return value
+        finally:
+            del self._in_flight[key]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced + self.takeovers
+        stats = {
+            "name": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "takeovers": self.takeovers,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            "in_flight": len(self._in_flight),
+            "backend_errors": self.backend_errors,
+            "ttl_seconds": self.ttl,
+        }
+        if isinstance(self.backend, InProcessBackend):
+            stats["entries"] = len(self.backend)
+        return stats
+
+
+def backend_from_env(prefix: str, default_max_entries: int = 10000) -> CacheBackend:
+    """Picks the backend from ``<prefix>_BACKEND`` ("memory" or "redis")."""
+    kind = os.getenv(f"{prefix}_BACKEND", "memory").lower()
+    if kind == "redis":
+        return RedisBackend(os.getenv(f"{prefix}_REDIS_URL", os.getenv("REDIS_URL", "redis://localhost:6379/0")),
+                            prefix=f"{prefix.lower()}:")
+    return InProcessBackend(int(os.getenv(f"{prefix}_MAX_ENTRIES", str(default_max_entries))))
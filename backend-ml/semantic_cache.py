@@ -0,0 +1,101 @@
+import threading
+import time
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """Re-uses generated FAQ answers for near-duplicate queries.
+
+    An entry is (query embedding, FAQ ids used as context) -> response. A new
+    query hits when it retrieved exactly the same FAQ ids and its embedding has
+    cosine similarity >= ``threshold`` with a cached query. Entries expire after
+    ``ttl`` seconds; when the cache is full the least recently used entry is
+    replaced. The embeddings live in one preallocated matrix (sized on the first
+    ``store`` unless ``dimension`` is given), so a lookup is a single
+    matrix-vector product.
+    """
+
+    def __init__(self, dimension: Optional[int] = None, threshold: float = 0.95, ttl: float = 3600.0,
+                 max_entries: int = 1000):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._vectors = np.zeros((max_entries, dimension), dtype=np.float32) if dimension else None
+        self._expires_at = np.zeros(max_entries, dtype=np.float64)  # 0 = empty slot
+        self._last_used = np.zeros(max_entries, dtype=np.float64)
+        self._faq_keys: List[Optional[tuple]] = [None] * max_entries
+        self._responses: List[Optional[str]] = [None] * max_entries
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.lookups = 0
+        self.hits = 0
+        self.expired = 0
+        self.evicted = 0
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def lookup(self, embedding, faq_ids: Sequence[str]) -> Optional[str]:
+        """Returns the cached response for a similar query with the same FAQ context."""
+        query = self._normalize(embedding)
+        faq_key = tuple(sorted(faq_ids))
+        now = time.time()
+        with self._lock:
+            self.lookups += 1
+            if self._vectors is None:
+                return None
+            live = np.flatnonzero(self._expires_at > now)
+            candidates = [i for i in live if self._faq_keys[i] == faq_key]
+            if not candidates:
+                return None
+            scores = self._vectors[candidates] @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            slot = candidates[best]
+            self._last_used[slot] = now
+            self.hits += 1
+            return self._responses[slot]
+
+    def store(self, embedding, faq_ids: Sequence[str], response: str):
+        now = time.time()
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, len(embedding)), dtype=np.float32)
+            slot = self._free_slot(now)
+            self._vectors[slot] = self._normalize(embedding)
+            self._faq_keys[slot] = tuple(sorted(faq_ids))
+            self._responses[slot] = response
+            self._expires_at[slot] = now + self.ttl
+            self._last_used[slot] = now
+
+    def _free_slot(self, now: float) -> int:
+        empty = np.flatnonzero(self._expires_at == 0)
+        if len(empty):
+            return int(empty[0])
+        expired = np.flatnonzero(self._expires_at <= now)
+        if len(expired):
+            self.expired += 1
+            return int(expired[0])
+        self.evicted += 1
+        return int(np.argmin(self._last_used))
+
+    def stats(self) -> dict:
+        return {
+            "enabled": True,
+            "entries": int(np.count_nonzero(self._expires_at > time.time())),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "ttl_seconds": self.ttl,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+            "llm_calls_saved": self.hits,
+            "expired_replaced": self.expired,
+            "evicted": self.evicted
+        }
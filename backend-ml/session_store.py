@@ -0,0 +1,336 @@
+import asyncio
+import logging
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import AnyMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import WRITES_IDX_MAP, BaseCheckpointSaver, CheckpointTuple, get_checkpoint_id
+from langgraph.graph.message import add_messages
+
+logger = logging.getLogger(__name__)
+
+
+def capped_messages(max_messages: int):
+    """``add_messages`` reducer that keeps only the last ``max_messages``.
+
+    The cut never leaves a tool result at the start of the history without the
+    AI message that called the tool.
+    """
+
+    def reducer(left: List[AnyMessage], right) -> List[AnyMessage]:
+        merged = add_messages(left, right)
+        if len(merged) <= max_messages:
+            return merged
+        kept = merged[-max_messages:]
+        while kept and isinstance(kept[0], ToolMessage):
+            kept = kept[1:]
+        return kept
+
+    return reducer
+
+
+def truncate_tool_content(messages: List[AnyMessage], max_chars: int) -> List[AnyMessage]:
+    """Shortens raw tool output kept for later turns; the turn that called the
+    tool has already seen it in full."""
+    truncated = []
+    for message in messages:
+        if isinstance(message, ToolMessage) and isinstance(message.content, str) and len(message.content) > max_chars:
+            dropped = len(message.content) - max_chars
+            message = message.model_copy(
+                update={"content": f"{message.content[:max_chars]}... [{dropped} characters truncated]"})
+        truncated.append(message)
+    return truncated
+
+
+class _Session:
+    """Serialized state of one thread: per checkpoint namespace, the latest
+    checkpoint, its metadata, parent id, pending writes and channel blobs."""
+
+    __slots__ = ("namespaces", "last_access", "nbytes")
+
+    def __init__(self):
+        self.namespaces: Dict[str, dict] = {}
+        self.last_access = time.time()
+        self.nbytes = 0
+
+    def measure(self) -> int:
+        self.nbytes = sum(
+            len(ns["checkpoint"][1]) + len(ns["metadata"][1])
+            + sum(len(blob[1]) for _, blob in ns["blobs"].values())
+            + sum(len(write[2][1]) for write in ns["writes"].values())
+            for ns in self.namespaces.values()
+        )
+        return self.nbytes
+
+
+class SessionCheckpointer(BaseCheckpointSaver):
+    """LangGraph checkpointer for chat sessions that stays within a memory budget.
+
+    Only the latest checkpoint of each thread is kept (a conversation resumes
+    from its last state; there is no time travel). Sessions idle for longer
+    than ``idle_ttl`` seconds are dropped. When the serialized sessions exceed
+    ``max_bytes``, the least recently used ones are evicted, to the SQLite file
+    at ``spill_path`` if one is given (and loaded back on their next turn),
+    otherwise for good. Tool messages longer than ``max_tool_chars`` are
+    truncated in the stored history. With a spill file, the async methods
+    run in a thread, so its I/O (and waiting for the lock around it) stays
+    off the event loop.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, idle_ttl: float = 6 * 3600.0,
+                 spill_path: Optional[str] = None, max_tool_chars: int = 4000, messages_key: str = "messages"):
+        super().__init__()
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.spill_path = spill_path
+        self.max_tool_chars = max_tool_chars
+        self.messages_key = messages_key
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._last_sweep = time.time()
+        self._db = self._connect() if spill_path else None
+
+        # Metrics
+        self.evicted = 0
+        self.expired = 0
+        self.spilled = 0
+        self.restored = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.spill_path, check_same_thread=False)
+        db.execute("CREATE TABLE IF NOT EXISTS sessions (thread_id TEXT PRIMARY KEY, last_access REAL, data BLOB)")
+        db.commit()
+        return db
+
+    def after_fork(self):
+        """A SQLite connection must not be shared across a fork: reopen it."""
+        self._lock = threading.RLock()
+        if self.spill_path:
+            self._db = self._connect()
+
+    # --- session bookkeeping (callers hold the lock) ---
+
+    def _session(self, thread_id: str, create: bool = False) -> Optional[_Session]:
+        now = time.time()
+        session = self._sessions.get(thread_id)
+        if session is None and self._db is not None:
+            row = self._db.execute(
+                "SELECT last_access, data FROM sessions WHERE thread_id = ?", (thread_id,)).fetchone()
+            if row is not None:
+                self._db.execute("DELETE FROM sessions WHERE thread_id = ?", (thread_id,))
+                self._db.commit()
+                if now - row[0] <= self.idle_ttl:
+                    session = _Session()
+                    session.namespaces = pickle.loads(row[1])
+                    self._bytes += session.measure()
+                    self._sessions[thread_id] = session
+                    self.restored += 1
+        if session is not None and now - session.last_access > self.idle_ttl:
+            self._drop(thread_id)
+            self.expired += 1
+            session = None
+        if session is None and create:
+            session = self._sessions[thread_id] = _Session()
+        if session is not None:
+            session.last_access = now
+            self._sessions.move_to_end(thread_id)
+        return session
+
+    def _drop(self, thread_id: str):
+        session = self._sessions.pop(thread_id, None)
+        if session is not None:
+            self._bytes -= session.nbytes
+
+    def _remeasure(self, session: _Session):
+        self._bytes -= session.nbytes
+        self._bytes += session.measure()
+
+    def _enforce_limits(self, keep: str):
+        now = time.time()
+        # Sessions are in access order, so the idle ones are at the front
+        while self._sessions:
+            thread_id, session = next(iter(self._sessions.items()))
+            if now - session.last_access <= self.idle_ttl:
+                break
+            self._drop(thread_id)
+            self.expired += 1
+        while self._bytes > self.max_bytes and len(self._sessions) > 1:
+            thread_id = next(iter(self._sessions))
+            if thread_id == keep:
+                break
+            if self._db is not None:
+                session = self._sessions[thread_id]
+                self._db.execute(
+                    "INSERT OR REPLACE INTO sessions (thread_id, last_access, data) VALUES (?, ?, ?)",
+                    (thread_id, session.last_access, pickle.dumps(session.namespaces))
+                )
+                self.spilled += 1
+            self._drop(thread_id)
+            self.evicted += 1
+        if self._db is not None:
+            if now - self._last_sweep > 60:
+                self._db.execute("DELETE FROM sessions WHERE last_access < ?", (now - self.idle_ttl,))
+                self._last_sweep = now
+            self._db.commit()
+
+    def _tuple(self, thread_id: str, checkpoint_ns: str, ns: dict) -> CheckpointTuple:
+        checkpoint = self.serde.loads_typed(ns["checkpoint"])
+        channel_values = {}
+        for channel, version in checkpoint["channel_versions"].items():
+            stored = ns["blobs"].get(channel)
+            if stored is not None and stored[0] == version and stored[1][0] != "empty":
+                channel_values[channel] = self.serde.loads_typed(stored[1])
+        writes = sorted(ns["writes"].items(), key=lambda item: (item[1][3], item[0][0], item[0][1]))
+        parent_id = ns["parent_id"]
+        return CheckpointTuple(
+            config={"configurable": {
+                "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": ns["checkpoint_id"]}},
+            checkpoint={**checkpoint, "channel_values": channel_values},
+            metadata=self.serde.loads_typed(ns["metadata"]),
+            parent_config={"configurable": {
+                "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id}
+            } if parent_id else None,
+            pending_writes=[(task_id, channel, self.serde.loads_typed(value))
+                            for _, (task_id, channel, value, _) in writes]
+        )
+
+    # --- BaseCheckpointSaver ---
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        with self._lock:
+            session = self._session(thread_id)
+            ns = session.namespaces.get(checkpoint_ns) if session is not None else None
+            if ns is None:
+                return None
+            checkpoint_id = get_checkpoint_id(config)
+            if checkpoint_id and checkpoint_id != ns["checkpoint_id"]:
+                return None
+            return self._tuple(thread_id, checkpoint_ns, ns)
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        with self._lock:
+            if config is not None:
+                thread_id = config["configurable"]["thread_id"]
+                sessions = [(thread_id, self._session(thread_id))]
+            else:
+                sessions = list(self._sessions.items())
+            checkpoint_ns = config["configurable"].get("checkpoint_ns") if config is not None else None
+            before_id = get_checkpoint_id(before) if before is not None else None
+            results = []
+            for thread_id, session in sessions:
+                if session is None:
+                    continue
+                for ns_name, ns in session.namespaces.items():
+                    if checkpoint_ns is not None and ns_name != checkpoint_ns:
+                        continue
+                    if before_id and ns["checkpoint_id"] >= before_id:
+                        continue
+                    checkpoint = self._tuple(thread_id, ns_name, ns)
+                    if filter and any(checkpoint.metadata.get(k) != v for k, v in filter.items()):
+                        continue
+                    results.append(checkpoint)
+        yield from results[:limit] if limit else results
+
+    def put(self, config: RunnableConfig, checkpoint, metadata, new_versions) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint = checkpoint.copy()
+        # A copy of its own: truncation must not touch the caller's channel values
+        values = dict(checkpoint.pop("channel_values"))
+        if self.max_tool_chars and self.messages_key in values and self.messages_key in new_versions:
+            values[self.messages_key] = truncate_tool_content(values[self.messages_key], self.max_tool_chars)
+        with self._lock:
+            session = self._session(thread_id, create=True)
+            previous = session.namespaces.get(checkpoint_ns)
+            blobs = dict(previous["blobs"]) if previous is not None else {}
+            for channel, version in new_versions.items():
+                blobs[channel] = (
+                    version, self.serde.dumps_typed(values[channel]) if channel in values else ("empty", b""))
+            # Channels the checkpoint no longer references are not needed again
+            versions = checkpoint["channel_versions"]
+            blobs = {channel: blob for channel, blob in blobs.items() if channel in versions}
+            session.namespaces[checkpoint_ns] = {
+                "checkpoint_id": checkpoint["id"],
+                "parent_id": config["configurable"].get("checkpoint_id"),
+                "checkpoint": self.serde.dumps_typed(checkpoint),
+                "metadata": self.serde.dumps_typed(metadata),
+                "blobs": blobs,
+                "writes": {}
+            }
+            self._remeasure(session)
+            self._enforce_limits(keep=thread_id)
+        return {"configurable": {
+            "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                   task_path: str = "") -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        with self._lock:
+            session = self._session(thread_id)
+            ns = session.namespaces.get(checkpoint_ns) if session is not None else None
+            # Writes only matter for the checkpoint they belong to, the latest one
+            if ns is None or ns["checkpoint_id"] != config["configurable"]["checkpoint_id"]:
+                return
+            for idx, (channel, value) in enumerate(writes):
+                key = (task_id, WRITES_IDX_MAP.get(channel, idx))
+                if key[1] >= 0 and key in ns["writes"]:
+                    continue
+                ns["writes"][key] = (task_id, channel, self.serde.dumps_typed(value), task_path)
+            self._remeasure(session)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._drop(thread_id)
+            if self._db is not None:
+                self._db.execute("DELETE FROM sessions WHERE thread_id = ?", (thread_id,))
+                self._db.commit()
+
+    async def _run(self, fn, *args, **kwargs):
+        if self._db is None:
+            return fn(*args, **kwargs)
+        return await asyncio.to_thread(fn, *args, **kwargs)
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await self._run(self.get_tuple, config)
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+                    before: Optional[RunnableConfig] = None, limit: Optional[int] = None):
+        checkpoints = await self._run(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for checkpoint in checkpoints:
+            yield checkpoint
+
+    async def aput(self, config: RunnableConfig, checkpoint, metadata, new_versions) -> RunnableConfig:
+        return await self._run(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                          task_path: str = "") -> None:
+        await self._run(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await self._run(self.delete_thread, thread_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            spilled_sessions = self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] if self._db else 0
+        return {
+            "sessions": len(self._sessions),
+            "memory_bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "idle_ttl": self.idle_ttl,
+            "spill_path": self.spill_path,
+            "spilled_sessions": spilled_sessions,
+            "evicted": self.evicted,
+            "expired": self.expired,
+            "spilled": self.spilled,
+            "restored": self.restored
+        }
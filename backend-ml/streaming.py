@@ -0,0 +1,57 @@
+import json
+import re
+from typing import Any, AsyncIterator, Iterator, Tuple
+
+from fastapi.responses import StreamingResponse
+
+
+def sse_event(event: str, data: Any) -> str:
+    """One Server-Sent Events message with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        # Proxies (nginx) must not buffer the stream, or nothing arrives until the end
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def text_chunks(text: str, size: int = 32) -> Iterator[str]:
+    """Splits finished text into chunks of about ``size`` characters on word
+    boundaries, for streaming when the generator cannot stream itself."""
+    chunk = ""
+    for word in re.findall(r"\s*\S+", text):
+        chunk += word
+        if len(chunk) >= size:
+            yield chunk
+            chunk = ""
+    if chunk:
+        yield chunk
+
+
+async def parse_sse(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[str, str]]:
+    """Parses a Server-Sent Events stream into ``(event, data)`` pairs.
+
+    Follows the SSE format: ``data:`` lines accumulate (joined with newlines)
+    until a blank line ends the event, ``event:`` names it ("message" when
+    absent), and comment lines (``:``) and other fields are ignored.
+    """
+    event, data = "message", []
+    async for line in lines:
+        if not line:
+            if data:
+                yield event, "\n".join(data)
+            event, data = "message", []
+            continue
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+        if field == "event":
+            event = value
+        elif field == "data":
+            data.append(value)
+    if data:
+        yield event, "\n".join(data)
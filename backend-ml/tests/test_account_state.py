@@ -0,0 +1,90 @@
+import threading
+
+import pytest
+
+from account_state import AccountStateStore
+from result_cache import InProcessBackend, RedisBackend
+
+HISTORY = [(120.0, "Delhi", 1000.0), (80.0, "Delhi", 400.0)]
+
+
+@pytest.fixture
+def redis_backend(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    import redis
+
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(redis.Redis, "from_url", lambda url: fakeredis.FakeRedis(server=server))
+    # Each call is a separate client (another worker) on the same server
+    return lambda: RedisBackend("redis://test", prefix="account_state:")
+
+
+def test_in_memory_store_seeds_from_history_and_returns_state_before():
+    store = AccountStateStore(window=3)
+    before = store.observe("acc", 100.0, "Delhi", 2000.0, HISTORY)
+    assert before.amounts.n == 2 and before.last_ts == 1000.0
+    before = store.observe("acc", 50.0, "Mumbai", 2600.0, HISTORY)
+    assert before.amounts.n == 3 and before.window()[0] == ("Delhi", 2000.0, 100.0)
+    assert store.stats()["seeded"] == 1 and store.stats()["hits"] == 1
+
+
+def test_workers_sharing_redis_see_each_others_transactions(redis_backend):
+    first = AccountStateStore(persistent=redis_backend())
+    second = AccountStateStore(persistent=redis_backend())
+    first.observe("acc", 100.0, "Delhi", 2000.0, HISTORY)
+    before = second.observe("acc", 50.0, "Mumbai", 2600.0, HISTORY)
+    assert before.amounts.n == 3 and before.last_ts == 2000.0
+    before = first.observe("acc", 70.0, "Pune", 3000.0)
+    assert before.amounts.n == 4 and before.window()[0] == ("Mumbai", 2600.0, 50.0)
+    assert first.stats()["seeded"] == 1 and second.stats()["persistent_hits"] == 1
+
+
+@pytest.mark.parametrize("shared", [True, False])
+def test_concurrent_observes_are_not_lost(redis_backend, shared):
+    backend = redis_backend() if shared else InProcessBackend()
+    stores = [AccountStateStore(persistent=redis_backend() if shared else backend) for _ in range(2)]
+    per_thread = 50
+
+    def worker(store, offset):
+        for i in range(per_thread):
+            store.observe("acc", float(i), "Delhi", offset + i)
+
+    threads = [threading.Thread(target=worker, args=(store, 10000.0 * t)) for t, store in
+               enumerate(stores * 3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    final = stores[0].observe("acc", 0.0, "Delhi", 10 ** 6)
+    assert final.amounts.n == per_thread * len(threads)
+
+
+def test_backend_failure_falls_back_to_payload_history():
+    class Broken(InProcessBackend):
+        def update(self, key, fn, ttl):
+            raise ConnectionError("down")
+
+    store = AccountStateStore(persistent=Broken())
+    before = store.observe("acc", 100.0, "Delhi", 2000.0, HISTORY)
+    assert before.amounts.n == 2 and store.stats()["backend_errors"] == 1
+
+
+def test_snapshot_does_not_change_the_store():
+    store = AccountStateStore()
+    snapshot = store.snapshot("acc", HISTORY)
+    assert snapshot.amounts.n == 2 and len(store) == 0
+    store.observe("acc", 100.0, "Delhi", 2000.0, HISTORY)
+    snapshot = store.snapshot("acc")
+    snapshot.observe(1.0, "Pune", 3000.0)
+    assert store.snapshot("acc").amounts.n == 3
+
+
+@pytest.mark.parametrize("shared", [True, False])
+def test_retried_transaction_is_recorded_once(redis_backend, shared):
+    store = AccountStateStore(persistent=redis_backend() if shared else None)
+    store.observe("acc", 100.0, "Delhi", 2000.0, HISTORY, txn_id="t1")
+    store.observe("acc", 100.0, "Delhi", 2005.0, HISTORY, txn_id="t1")
+    store.observe("acc", 50.0, "Delhi", 2600.0, txn_id="t2")
+    state = store.snapshot("acc")
+    assert state.amounts.n == 4 and [entry[1] for entry in state.window()[:2]] == [2600.0, 2000.0]
+    assert store.stats()["duplicates"] == 1 and store.stats()["observed"] == 2
@@ -0,0 +1,114 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+pytest.importorskip("fastapi")
+main = pytest.importorskip("main")
+
+from result_cache import InProcessBackend, ResultCache  # noqa: E402
+
+SUSPICIOUS = 0.3
+BASE_TS = 1_750_000_000.0
+
+
+def iso(ts):
+    return main.format_timestamp(ts)
+
+
+def make_sample(n=400, seed=0):
+    """Fixed synthetic traffic: mostly benign scores and histories, with a few
+    flagged models, amount spikes, impossible travel and unknown places."""
+    rng = np.random.default_rng(seed)
+    txns, scores = [], {}
+    for i in range(n):
+        account = f"acc{i}"
+        scores[account] = {
+            "xgboost_prob": float(rng.beta(0.5, 6)),
+            "isolation_forest": int(rng.random() < 0.08),
+            "kmeans": int(rng.random() < 0.08),
+            "svm": int(rng.random() < 0.08),
+            "autoencoder": int(rng.random() < 0.08),
+        }
+        kind = rng.choice(["same", "travel", "unknown"], p=[0.75, 0.1, 0.15])
+        amounts = [500.0] * 12
+        if rng.random() < 0.1:
+            amounts[0] = 50000.0
+        history = []
+        for j, amount in enumerate(amounts):
+            location = "Delhi"
+            if kind == "travel" and j == 0:
+                location = "Mumbai"
+            elif kind == "unknown" and j == 1:
+                location = "Xyzpur"
+            # Newest first, 10 minutes apart except the impossible hop
+            ts = BASE_TS - (300 if kind == "travel" and j == 1 else 600 * j)
+            history.append({"_id": str(j), "amount": amount, "location": location, "updatedAt": iso(ts), "__v": 0})
+        txns.append(main.Transaction(
+            TransactionAmount=500.0, TransactionType="Debit", CustomerOccupation="Engineer", AccountBalance=1e4,
+            DayOfWeek="Monday", Hour=12, Time_Gap=1.0, Hour_of_Transaction=12, AgeGroup="Adult",
+            Days_Since_Last_Transaction=1, amount=500.0, oldBalanceOrig=1e4, newBalanceOrig=9.5e3,
+            oldBalanceDest=0.0, newBalanceDest=500.0, errorBalanceOrig=0.0, errorBalanceDest=0.0,
+            location="Delhi", senderAccountNumber=account, previousTransactions=history
+        ))
+    return txns, scores
+
+
+@pytest.fixture
+def sample(monkeypatch):
+    txns, scores = make_sample()
+    einstein_calls = []
+
+    def fake_score_models(batch, models=None):
+        keys = [main.MODEL_SCORE_KEYS[name] for name in (models or main.MODEL_NAMES)]
+        return [{key: scores[txn.senderAccountNumber][key] for key in keys} for txn in batch]
+
+    async def fake_einstein(window):
+        einstein_calls.append(window)
+        return 1
+
+    monkeypatch.setattr(main, "score_models", fake_score_models)
+    monkeypatch.setattr(main, "einstein_location_score", fake_einstein)
+    monkeypatch.setattr(main, "location_cache", ResultCache(InProcessBackend(), name="location"))
+    monkeypatch.setattr(main, "PREDICT_MICROBATCH_ENABLED", False)
+    monkeypatch.setattr(main, "LOCATION_LLM_FALLBACK", True)
+    monkeypatch.setattr(main, "cascade_exits", {"low": 0, "high": 0, "full": 0})
+    return txns, einstein_calls
+
+
+def run_both(txns):
+    async def scenario():
+        results = []
+        for txn in txns:
+            full = await main.predict_full(txn, None, BASE_TS + 60)
+            cascade = await main.predict_cascade(txn, None, BASE_TS + 60)
+            results.append((full, cascade))
+        return results
+
+    return asyncio.run(scenario())
+
+
+def test_default_band_reaches_both_exits(sample):
+    txns, _ = sample
+    run_both(txns)
+    exits = main.cascade_exits
+    rates = {kind: count / len(txns) for kind, count in exits.items()}
+    # Pinned to the fixed sample; both exits must fire, and most traffic exits low
+    assert exits == {"low": 317, "high": 48, "full": 35}
+    assert rates["low"] > 0.5 and rates["high"] > 0.1 and rates["full"] < 0.2
+
+
+def test_location_check_is_only_skipped_when_unresolved(sample):
+    txns, einstein_calls = sample
+    for full, cascade in run_both(txns):
+        skipped = cascade["skipped_stages"]
+        if "location" not in skipped:
+            # Resolved locally (or asked of Einstein): the verdict is the full path's
+            assert cascade["ai_location_score"] == full["ai_location_score"]
+        if skipped:
+            assert cascade["fraud_percentage"] <= full["fraud_percentage"]
+        if skipped and "location" not in skipped:
+            # The skipped models cannot move a resolved transaction across the line
+            assert (cascade["fraud_percentage"] > SUSPICIOUS) == (full["fraud_percentage"] > SUSPICIOUS)
+    # Only windows with the unknown place ever reach Einstein
+    assert einstein_calls and all(any(loc == "Xyzpur" for loc, _, _ in window) for window in einstein_calls)
@@ -0,0 +1,128 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+import requests
+
+from einstein_client import EinsteinClient
+
+API_URL = "https://einstein.test/generations"
+STREAM_URL = "https://einstein.test/generations-stream"
+
+
+async def token():
+    return "token"
+
+
+def make_client(handler, stream_url=STREAM_URL):
+    client = EinsteinClient(API_URL, token_provider=token)
+    client.stream_url = stream_url
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client
+
+
+def sse_body(events):
+    return "".join(f"event: {event}\ndata: {json.dumps(data) if not isinstance(data, str) else data}\n\n"
+                   for event, data in events).encode()
+
+
+def generation(text):
+    return {"generation": {"generatedText": text}}
+
+
+def collect(client, prompt="Hi"):
+    async def scenario():
+        try:
+            return [chunk async for chunk in client.generate_stream(prompt)]
+        finally:
+            await client.aclose()
+
+    return asyncio.run(scenario())
+
+
+def streaming_handler(events, seen=None):
+    def handler(request):
+        if seen is not None:
+            seen.append(request)
+        assert request.url == STREAM_URL and request.headers["Authorization"] == "Bearer token"
+        assert json.loads(request.content) == {"prompt": "Hi"}
+        return httpx.Response(200, headers={"Content-Type": "text/event-stream"}, content=sse_body(events))
+
+    return handler
+
+
+def test_incremental_stream_yields_each_piece():
+    events = [("generation", generation("Your card ")), ("generation", generation("is blocked")),
+              ("generation", generation(".")), ("message", "[DONE]")]
+    assert collect(make_client(streaming_handler(events))) == ["Your card ", "is blocked", "."]
+
+
+def test_cumulative_stream_yields_only_new_text():
+    events = [("generation", generation("Your")), ("generation", generation("Your card")),
+              ("generation", generation("Your card is blocked.")), ("message", "[DONE]")]
+    assert collect(make_client(streaming_handler(events))) == ["Your", " card", " is blocked."]
+
+
+def test_stream_parsing_follows_the_sse_format():
+    body = (b": keep-alive\n\n"
+            b"data: {\"generation\":\n"
+            b"data:  {\"generatedText\": \"Hello\"}}\n\n"
+            b"event: generation\ndata:{\"generation\": {\"generatedText\": \" there\"}}\n\n"
+            b"data: [DONE]\n\n"
+            b"data: {\"generation\": {\"generatedText\": \"ignored\"}}\n\n")
+    client = make_client(lambda request: httpx.Response(200, content=body))
+    assert collect(client) == ["Hello", " there"]
+
+
+def test_error_event_raises():
+    events = [("generation", generation("Partial")), ("error", {"message": "model overloaded"})]
+    with pytest.raises(RuntimeError, match="model overloaded"):
+        collect(make_client(streaming_handler(events)))
+
+
+def test_without_stream_url_the_finished_generation_is_chunked():
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        assert request.url == API_URL
+        return httpx.Response(200, json=generation("  " + "word " * 20 + " "))
+
+    chunks = collect(make_client(handler, stream_url=None))
+    assert len(seen) == 1 and len(chunks) > 1
+    assert "".join(chunks) == ("word " * 20).strip()
+
+
+def test_without_stream_url_the_fallback_is_logged_once(caplog):
+    def handler(request):
+        return httpx.Response(200, json=generation("Hello there"))
+
+    async def twice(client):
+        for _ in range(2):
+            assert [chunk async for chunk in client.generate_stream("Hi")] == ["Hello there"]
+
+    with caplog.at_level("WARNING", logger="einstein_client"):
+        asyncio.run(twice(make_client(handler, stream_url=None)))
+    assert [record.message for record in caplog.records].count(
+        "EINSTEIN_STREAM_API_URL is not set; streaming chunks the finished generation") == 1
+
+
+def test_sync_generation_uses_the_pooled_session_and_timeouts():
+    calls = []
+
+    class Session:
+        def post(self, url, **kwargs):
+            calls.append((url, kwargs))
+            response = requests.Response()
+            response.status_code = 200
+            response._content = json.dumps(generation("Hello")).encode()
+            return response
+
+    client = EinsteinClient(API_URL, token_provider=token, timeout=12, connect_timeout=3,
+                            sync_token_provider=lambda: "sync-token")
+    client._session = Session()
+    assert client.generate_raw_sync("Hi") == generation("Hello")
+    url, kwargs = calls[0]
+    assert url == API_URL and kwargs["timeout"] == (3, 12)
+    assert kwargs["headers"]["Authorization"] == "Bearer sync-token" and kwargs["json"] == {"prompt": "Hi"}
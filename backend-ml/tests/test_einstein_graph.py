@@ -0,0 +1,169 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+pytest.importorskip("langgraph")
+
+import einstein_graph  # noqa: E402
+from einstein_client import EinsteinClient  # noqa: E402
+from streaming import parse_sse  # noqa: E402
+
+
+async def token():
+    return "token"
+
+
+@pytest.fixture
+def mocked_backends(monkeypatch):
+    """Einstein first asks for register_employee, then answers; the Node backend
+    returns a large employee record."""
+    replies = iter([
+        json.dumps({"name": "register_employee",
+                    "args": {"name": "Asha", "email": "asha@example.com", "contact": "98765", "pin": "4321"}}),
+        "Asha is registered."
+    ])
+    node_requests = []
+
+    def einstein(request):
+        return httpx.Response(200, json={"generation": {"generatedText": next(replies)}})
+
+    def node(request):
+        node_requests.append(json.loads(request.content))
+        return httpx.Response(200, json={"employee": {"name": "Asha", "history": "x" * 10000}})
+
+    client = EinsteinClient("https://einstein.test/generations", token_provider=token)
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(einstein))
+    monkeypatch.setattr(einstein_graph, "einstein_client", client)
+    monkeypatch.setattr(einstein_graph, "_node_client", httpx.AsyncClient(transport=httpx.MockTransport(node)))
+    return node_requests
+
+
+def stream_events(query):
+    async def scenario():
+        transport = httpx.ASGITransport(app=einstein_graph.api)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            async with client.stream("POST", "/invoke/stream", json={"query": query}) as response:
+                return [(event, json.loads(data)) async for event, data in parse_sse(response.aiter_lines())]
+
+    return asyncio.run(scenario())
+
+
+def test_stream_redacts_secret_args_and_caps_tool_output(mocked_backends):
+    events = stream_events("Register Asha with PIN 4321")
+    by_kind = {}
+    for event, data in events:
+        by_kind.setdefault(event, []).append(data)
+
+    # The tool itself still got the PIN; the stream never shows it
+    assert mocked_backends[0]["pin"] == "4321"
+    tool_start = by_kind["tool_start"][0]
+    assert tool_start["tool"] == "register_employee"
+    assert tool_start["args"]["pin"] == "[redacted]" and tool_start["args"]["name"] == "Asha"
+    assert "4321" not in json.dumps(by_kind["tool_start"])
+
+    output = by_kind["tool_end"][0]["output"]
+    assert len(output) < einstein_graph.STREAM_TOOL_OUTPUT_CHARS + 50 and "characters truncated" in output
+    assert by_kind["done"][0]["response"] == "Asha is registered."
+
+
+def test_stream_without_stream_url_chunks_the_finished_answer(mocked_backends):
+    events = stream_events("Register Asha with PIN 4321")
+    chunks = [data["text"] for event, data in events if event == "chunk"]
+    assert "".join(chunks) == "Asha is registered."
+
+
+def test_stream_forwards_einstein_tokens_as_they_arrive(monkeypatch):
+    """With a stream endpoint the answer's chunks are Einstein's own pieces; a
+    tool call reply is buffered, never sent as chunks."""
+    replies = iter([
+        ['{"name": "get_stats_by_user", ', '"args": {"user_id": "u1"}}'],
+        ["  The user ", "made 3 ", "transactions."],
+    ])
+
+    def einstein(request):
+        assert request.url == "https://einstein.test/stream"
+        body = "".join(f"data: {json.dumps({'generation': {'generatedText': piece}})}\n\n"
+                       for piece in next(replies))
+        return httpx.Response(200, content=(body + "data: [DONE]\n\n").encode())
+
+    def node(request):
+        return httpx.Response(200, json={"transactions": 3})
+
+    client = EinsteinClient("https://einstein.test/generations", token_provider=token)
+    client.stream_url = "https://einstein.test/stream"
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(einstein))
+    monkeypatch.setattr(einstein_graph, "einstein_client", client)
+    monkeypatch.setattr(einstein_graph, "_node_client", httpx.AsyncClient(transport=httpx.MockTransport(node)))
+
+    events = stream_events("How many transactions did u1 make?")
+    kinds = [event for event, _ in events]
+    chunks = [data["text"] for event, data in events if event == "chunk"]
+    assert chunks == ["The user ", "made 3 ", "transactions."]
+    assert kinds.index("tool_end") < kinds.index("chunk")
+    assert events[-1] == ("done", {"response": "The user made 3 transactions.",
+                                   "session_id": events[0][1]["session_id"]})
+
+
+def test_sync_invoke_goes_through_the_einstein_client(monkeypatch):
+    prompts = []
+
+    class Client:
+        def generate_raw_sync(self, prompt):
+            prompts.append(prompt)
+            return {"generation": {"generatedText": " Hello! "}}
+
+    monkeypatch.setattr(einstein_graph, "einstein_client", Client())
+    message = einstein_graph.EinsteinRunnable().invoke({"messages": [einstein_graph.HumanMessage(content="Hi")]})
+    assert message.content == "Hello!" and prompts[0].endswith("User Query: Hi\nResponse:")
+
+
+def test_concurrent_tool_calls_map_errors_per_call(monkeypatch):
+    """Three calls in one turn run together; the one that raises gets its own
+    error ToolMessage and the others their results, in call order."""
+    in_flight, peak = 0, 0
+
+    async def node(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        user_id = request.url.path.rsplit("/", 1)[-1]
+        if user_id == "broken":
+            raise RuntimeError("connection pool exhausted")
+        return httpx.Response(200, json={"user": user_id})
+
+    replies = iter([
+        json.dumps([{"name": "get_stats_by_user", "args": {"user_id": user_id}} for user_id in ("u1", "broken", "u2")]),
+        "Here are the stats."
+    ])
+
+    def einstein(request):
+        return httpx.Response(200, json={"generation": {"generatedText": next(replies)}})
+
+    client = EinsteinClient("https://einstein.test/generations", token_provider=token)
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(einstein))
+    monkeypatch.setattr(einstein_graph, "einstein_client", client)
+    monkeypatch.setattr(einstein_graph, "_node_client", httpx.AsyncClient(transport=httpx.MockTransport(node)))
+
+    config = {"configurable": {"thread_id": "tool-errors"}}
+    state = asyncio.run(einstein_graph.langgraph_app.ainvoke(
+        {"messages": [einstein_graph.HumanMessage(content="Stats for u1, broken and u2")]}, config=config))
+    calls = state["messages"][1].tool_calls
+    messages = state["messages"][2:5]
+    assert state["messages"][-1].content == "Here are the stats."
+    assert [message.tool_call_id for message in messages] == [call["id"] for call in calls]
+    assert json.loads(messages[0].content) == {"user": "u1"} and json.loads(messages[2].content) == {"user": "u2"}
+    assert messages[1].status == "error"
+    assert messages[1].content == einstein_graph.tool_error_message(RuntimeError("connection pool exhausted"))
+    assert peak == 3
+
+
+def test_node_failure_answers_every_pending_call():
+    calls = [{"id": f"call-{i}", "name": "get_stats_by_region", "args": {"region": "North"}} for i in range(2)]
+    state = {"messages": [einstein_graph.AIMessage(content="", tool_calls=calls)], "error": ValueError("boom")}
+    messages = einstein_graph.handle_tool_error(state)["messages"]
+    assert [message.tool_call_id for message in messages] == ["call-0", "call-1"]
+    assert all("ValueError('boom')" in message.content for message in messages)
@@ -0,0 +1,112 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from einstein_client import EinsteinClient, EinsteinTokenService
+
+
+class TokenSession:
+    """Stands in for the requests session the service posts to."""
+
+    def __init__(self, expires_in=3600, delay=0.0, fail=False):
+        self.expires_in = expires_in
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self.called = threading.Event()
+
+    def post(self, url, data=None, timeout=None):
+        self.calls += 1
+        self.called.set()
+        time.sleep(self.delay)
+        if self.fail:
+            raise requests.ConnectionError("token endpoint down")
+        payload = {"access_token": f"token-{self.calls}"}
+        if self.expires_in is not None:
+            payload["expires_in"] = self.expires_in
+        response = requests.Response()
+        response.status_code = 200
+        response.json = lambda: payload
+        return response
+
+
+def make_service(session, **kwargs):
+    service = EinsteinTokenService("https://login.test/token", "id", "secret", **kwargs)
+    service._session = session
+    return service
+
+
+def test_refresh_times_follow_expires_in():
+    service = make_service(TokenSession(expires_in=3600), refresh_margin=120)
+    before = time.time()
+    assert service.get_access_token() == "token-1"
+    assert service.token_expiry == pytest.approx(before + 3600, abs=1)
+    assert service.valid_until == pytest.approx(service.token_expiry - 60)
+    assert service.refresh_at == pytest.approx(before + 3480, abs=1)
+
+    # Short-lived tokens: hand out until 10% of the TTL is left, refresh at half of it
+    service = make_service(TokenSession(expires_in=100), refresh_margin=120)
+    before = time.time()
+    service.get_access_token()
+    assert service.valid_until == pytest.approx(before + 90, abs=1)
+    assert service.refresh_at == pytest.approx(before + 50, abs=1)
+
+
+def test_missing_expires_in_uses_the_default_ttl():
+    service = make_service(TokenSession(expires_in=None), refresh_margin=0, default_ttl=600)
+    before = time.time()
+    service.get_access_token()
+    assert service.token_expiry == pytest.approx(before + 600, abs=1)
+    # An explicit zero margin is kept, not replaced by the default
+    assert service.refresh_margin == 0
+    assert service.refresh_at == pytest.approx(before + 600, abs=1)
+
+
+def test_explicit_zero_client_settings_are_kept():
+    client = EinsteinClient("https://einstein.test", token_provider=None, timeout=0, connect_timeout=0,
+                            max_connections=0)
+    assert (client.timeout, client.connect_timeout, client.max_connections) == (0, 0, 0)
+
+
+def test_concurrent_callers_share_one_refresh():
+    session = TokenSession(delay=0.2)
+    service = make_service(session)
+    tokens = []
+    threads = [threading.Thread(target=lambda: tokens.append(service.get_access_token())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert session.calls == 1 and service.refreshes == 1
+    assert tokens == ["token-1"] * 8
+    # Cached from now on
+    assert service.get_access_token() == "token-1" and session.calls == 1
+
+
+def test_failed_refresh_raises_and_the_next_call_retries():
+    session = TokenSession(fail=True)
+    service = make_service(session)
+    with pytest.raises(requests.ConnectionError):
+        service.get_access_token()
+    assert service.access_token is None and service.refreshes == 0
+
+    session.fail = False
+    assert service.get_access_token() == "token-2" and service.refreshes == 1
+
+
+def test_background_refresh_failure_keeps_the_current_token():
+    session = TokenSession()
+    service = make_service(session)
+    service.get_access_token()
+    session.fail, session.called = True, threading.Event()
+    service.refresh_at = time.time()
+    service.start()
+    try:
+        assert session.called.wait(2)
+        time.sleep(0.05)
+        assert service._refresher.is_alive()
+        assert service.get_access_token() == "token-1" and service.refreshes == 1
+    finally:
+        service.stop()
@@ -0,0 +1,65 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from embedding_cache import CompactEmbeddingStore, EmbeddingCache
+
+
+class FakeEncoder:
+    """Deterministic 384-d vectors per text, counting encode calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, texts, batch_size=32):
+        self.calls += 1
+        return np.stack([np.random.default_rng(sum(map(ord, text))).normal(size=384) for text in texts])
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_hits_and_misses_return_the_same_vector(dtype):
+    async def scenario():
+        encoder = FakeEncoder()
+        cache = EmbeddingCache(lambda: encoder, CompactEmbeddingStore(dtype=dtype), max_wait_ms=0)
+        miss = await cache.encode("How do I  reset my PIN?")
+        hit = await cache.encode("how do i reset my pin?")
+        return encoder, miss, hit
+
+    encoder, miss, hit = asyncio.run(scenario())
+    assert encoder.calls == 1
+    assert miss.dtype == hit.dtype == np.float32
+    np.testing.assert_array_equal(miss, hit)
+
+
+def test_disk_writes_happen_off_the_caller_and_survive_a_restart(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    store = CompactEmbeddingStore(max_entries=2, disk_path=path)
+    assert store.blocking
+    threads = set()
+    original = store._write_behind
+
+    def recording_writer():
+        threads.add(threading.get_ident())
+        original()
+
+    store._write_behind = recording_writer
+    vectors = {f"q{i}": np.random.default_rng(i).normal(size=8).astype(np.float32) for i in range(5)}
+    for key, vector in vectors.items():
+        store.set(key, vector)
+    store.flush()
+    assert threads and threading.get_ident() not in threads
+    assert store.pending_writes() == 0
+
+    reopened = CompactEmbeddingStore(max_entries=2, disk_path=path)
+    for key, vector in vectors.items():
+        np.testing.assert_array_equal(reopened.get(key), store.compact(vector))
+    assert reopened.disk_hits == 5
+
+
+def test_memory_only_store_is_not_blocking():
+    store = CompactEmbeddingStore()
+    assert not store.blocking
+    store.set("q", np.ones(4, dtype=np.float32))
+    assert store.get("q").dtype == np.float32 and store.pending_writes() == 0
@@ -0,0 +1,85 @@
+import zlib
+
+import numpy as np
+import pytest
+
+from faq_index import LocalFaqIndex, load_faq_source
+
+
+class HashEncoder:
+    """Deterministic stand-in for the SentenceTransformer: one random vector per text."""
+
+    def __init__(self, dimension=32):
+        self.dimension = dimension
+
+    def encode(self, texts, batch_size=64):
+        return np.stack([np.random.default_rng(zlib.crc32(text.encode())).normal(size=self.dimension)
+                         for text in texts]).astype(np.float32)
+
+
+def faqs(n=200):
+    return [{"id": f"faq-{i}", "question": f"Question {i}?", "answer": f"Answer {i}."} for i in range(n)]
+
+
+def brute_force(vectors, query, top_k):
+    vectors = np.asarray(vectors, dtype=np.float64)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = vectors @ (query / np.linalg.norm(query))
+    order = np.argsort(-scores, kind="stable")[:top_k]
+    return order, scores[order]
+
+
+def test_query_matches_brute_force_cosine_search():
+    encoder = HashEncoder()
+    index = LocalFaqIndex.build(faqs(), encoder)
+    raw = encoder.encode([faq["question"] for faq in faqs()])
+    rng = np.random.default_rng(7)
+    for _ in range(50):
+        query = rng.normal(size=encoder.dimension).astype(np.float32)
+        expected_rows, expected_scores = brute_force(raw, query, top_k=5)
+        matches = index.query(query.tolist(), top_k=5).matches
+        assert [match.id for match in matches] == [f"faq-{row}" for row in expected_rows]
+        np.testing.assert_allclose([match.score for match in matches], expected_scores, atol=1e-5)
+        assert matches[0].metadata == {"question": f"Question {expected_rows[0]}?",
+                                       "answer": f"Answer {expected_rows[0]}."}
+
+
+def test_a_question_finds_itself_first():
+    encoder = HashEncoder()
+    index = LocalFaqIndex.build(faqs(), encoder)
+    match = index.query(encoder.encode(["Question 42?"])[0], top_k=1).matches[0]
+    assert match.id == "faq-42" and match.score == pytest.approx(1.0, abs=1e-5)
+
+
+def test_snapshot_round_trip_is_memory_mapped(tmp_path):
+    encoder = HashEncoder()
+    index = LocalFaqIndex.build(faqs(), encoder)
+    prefix = str(tmp_path / "faq_index")
+    assert not LocalFaqIndex.exists(prefix)
+    index.save(prefix)
+    assert LocalFaqIndex.exists(prefix)
+
+    loaded = LocalFaqIndex.load(prefix)
+    assert isinstance(loaded.vectors, np.memmap) and len(loaded) == len(index)
+    query = encoder.encode(["Question 3?"])[0]
+    expected, actual = index.query(query, top_k=4).matches, loaded.query(query, top_k=4).matches
+    assert [match.id for match in actual] == [match.id for match in expected]
+    np.testing.assert_allclose([match.score for match in actual], [match.score for match in expected], atol=1e-6)
+
+
+def test_edge_cases():
+    encoder = HashEncoder()
+    small = LocalFaqIndex.build(faqs(2), encoder)
+    query = encoder.encode(["anything"])[0]
+    assert len(small.query(query, top_k=10).matches) == 2
+    assert all(match.metadata == {} for match in small.query(query, include_metadata=False).matches)
+    assert LocalFaqIndex(np.zeros((0, 4), dtype=np.float32), []).query([1, 0, 0, 0]).matches == []
+    with pytest.raises(ValueError, match="2 vectors but 1 records"):
+        LocalFaqIndex(np.ones((2, 4), dtype=np.float32), faqs(1))
+
+
+def test_faq_source_csv_without_ids(tmp_path):
+    path = tmp_path / "faqs.csv"
+    path.write_text("question,answer\nHow do I block my card?,Use the app.\n", encoding="utf-8")
+    index = LocalFaqIndex.build(load_faq_source(str(path)), HashEncoder())
+    assert index.records == [{"id": "0", "question": "How do I block my card?", "answer": "Use the app."}]
@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from feature_encoder import CompiledFeatureEncoder, UnsupportedPipelineError, pandas_transform
+
+pd = pytest.importorskip("pandas")
+compose = pytest.importorskip("sklearn.compose")
+preprocessing = pytest.importorskip("sklearn.preprocessing")
+
+FEATURES = ["Amount", "Type", "Occupation", "Age", "Balance"]
+FIELDS = ["amount", "type", "occupation", "age", "balance"]
+
+
+def _frame(rows, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Amount": rng.gamma(2.0, 300.0, rows),
+        "Type": rng.choice(["Debit", "Credit"], rows),
+        "Occupation": rng.choice(["Doctor", "Student", "Engineer", "Retired"], rows),
+        "Age": rng.integers(18, 80, rows).astype(float),
+        "Balance": rng.normal(5000, 2000, rows)
+    })
+
+
+def _txns(frame):
+    return [SimpleNamespace(**dict(zip(FIELDS, row))) for row in frame[FEATURES].itertuples(index=False)]
+
+
+def _fit(one_hot, scaler, remainder="passthrough"):
+    train = _frame(2000, seed=0)
+    preprocessor = compose.ColumnTransformer(
+        [("num", preprocessing.StandardScaler(), ["Amount", "Age"]),
+         ("cat", one_hot, ["Type", "Occupation"])],
+        remainder=remainder
+    ).fit(train)
+    return preprocessor, scaler.fit(preprocessor.transform(train))
+
+
+@pytest.mark.parametrize("one_hot_kwargs", [
+    {"handle_unknown": "ignore"},
+    {"drop": "first"},
+    {"drop": "if_binary", "sparse_output": True},
+])
+@pytest.mark.parametrize("scaler", [preprocessing.StandardScaler, preprocessing.MinMaxScaler])
+def test_compiled_features_match_pandas_pipeline(one_hot_kwargs, scaler):
+    one_hot_kwargs = {"sparse_output": False, **one_hot_kwargs}
+    preprocessor, fitted_scaler = _fit(preprocessing.OneHotEncoder(**one_hot_kwargs), scaler())
+    encoder = CompiledFeatureEncoder.from_pipeline(preprocessor, fitted_scaler, dict(zip(FEATURES, FIELDS)))
+    txns = _txns(_frame(500, seed=1))
+
+    expected = pandas_transform(preprocessor, fitted_scaler, txns, FIELDS, FEATURES)
+    actual = encoder.transform(txns)
+    for e, a in zip(expected, actual):
+        e = e.toarray() if hasattr(e, "toarray") else np.asarray(e)
+        np.testing.assert_array_equal(a, e)
+
+
+def test_unknown_category_is_ignored_like_sklearn():
+    preprocessor, scaler = _fit(preprocessing.OneHotEncoder(handle_unknown="ignore", sparse_output=False),
+                                preprocessing.StandardScaler())
+    encoder = CompiledFeatureEncoder.from_pipeline(preprocessor, scaler, dict(zip(FEATURES, FIELDS)))
+    frame = _frame(5, seed=2)
+    frame.loc[0, "Occupation"] = "Astronaut"
+    txns = _txns(frame)
+
+    expected = pandas_transform(preprocessor, scaler, txns, FIELDS, FEATURES)
+    np.testing.assert_array_equal(encoder.transform(txns)[0], expected[0])
+
+
+def test_unsupported_transformer_is_rejected():
+    preprocessor, scaler = _fit(preprocessing.OneHotEncoder(sparse_output=False), preprocessing.StandardScaler(),
+                                remainder=preprocessing.PolynomialFeatures())
+    with pytest.raises(UnsupportedPipelineError):
+        CompiledFeatureEncoder.from_pipeline(preprocessor, scaler, dict(zip(FEATURES, FIELDS)))
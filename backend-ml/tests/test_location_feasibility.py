@@ -0,0 +1,82 @@
+import pytest
+
+from location_feasibility import LocationFeasibilityEngine, haversine_km
+
+HOUR = 3600.0
+
+
+@pytest.fixture
+def engine():
+    return LocationFeasibilityEngine()
+
+
+def test_resolves_names_aliases_and_qualified_forms(engine):
+    assert engine.resolve("Bombay").name == "Mumbai"
+    assert engine.resolve("  new   DELHI ").name == "Delhi"
+    assert engine.resolve("Hyderabad, Telangana, India").name == "Hyderabad"
+    assert engine.resolve("Andheri, Mumbai").name == "Mumbai"
+    assert engine.resolve("Pune, Maharashtra 411001, India").name == "Pune"
+    assert engine.resolve("Mumbai, 400001").name == "Mumbai"
+
+
+def test_foreign_and_unknown_locations_are_unresolved(engine):
+    assert engine.resolve("Hyderabad, Sindh, Pakistan") is None
+    assert engine.resolve("Hyderabad, Pakistan") is None
+    assert engine.resolve("Xyzpur") is None
+    assert engine.resolve("India") is None
+    assert engine.check([("Delhi", 0), ("Hyderabad, Sindh, Pakistan", HOUR)]) is None
+
+
+def test_extended_gazetteer_resolves_foreign_places():
+    engine = LocationFeasibilityEngine({
+        "Hyderabad": {"lat": 17.385, "lon": 78.487, "radius_km": 30},
+        "Pakistan": {"lat": 30.0, "lon": 70.0, "radius_km": 800},
+    })
+    assert engine.resolve("Hyderabad, Sindh, Pakistan").name == "Pakistan"
+
+
+def test_feasible_and_infeasible_pairs(engine):
+    # ~1150 km apart: a flight needs close to three hours door to door
+    assert engine.check([("Delhi", 0), ("Mumbai", HOUR)]) == 1
+    assert engine.check([("Delhi", 0), ("Mumbai", 4 * HOUR)]) == 0
+    # Order of the points does not matter, only the gap between them
+    assert engine.check([("Mumbai", 4 * HOUR), ("Delhi", 0)]) == 0
+    # The same place under different names is never a trip
+    assert engine.check([("Bombay", 0), ("Mumbai, Maharashtra", 1)]) == 0
+
+
+def test_radius_is_subtracted_from_the_distance(engine):
+    gujarat, maharashtra = engine.resolve("Gujarat"), engine.resolve("Maharashtra")
+    centre_distance = haversine_km(gujarat.lat, gujarat.lon, maharashtra.lat, maharashtra.lon)
+    # Capitals are hundreds of km apart, but the states share a border
+    assert centre_distance > 300
+    assert centre_distance < gujarat.radius_km + maharashtra.radius_km
+    assert engine.is_pair_feasible(gujarat, maharashtra, elapsed_minutes=1)
+    assert engine.check([("Gujarat", 0), ("Maharashtra", 60)]) == 0
+
+    ahmedabad, mumbai = engine.resolve("Ahmedabad"), engine.resolve("Mumbai")
+    assert not engine.is_pair_feasible(ahmedabad, mumbai, elapsed_minutes=60)
+
+
+def test_fastest_mode_is_chosen_per_distance(engine):
+    assert engine.min_travel_minutes(0) == 0.0
+    # Short hops go by car, medium ones by train, long ones by plane
+    assert engine.min_travel_minutes(50) == pytest.approx(30.0)
+    assert engine.min_travel_minutes(1700) == pytest.approx(90 + 120.0)
+    assert engine.min_travel_minutes(150) == pytest.approx(30 + 150 / 160 * 60)
+
+
+def test_travel_modes_can_be_restricted():
+    car_only = LocationFeasibilityEngine(travel_modes={"car": {"speed_kmh": 100}})
+    assert car_only.check([("Delhi", 0), ("Mumbai", 4 * HOUR)]) == 1
+    assert car_only.check([("Delhi", 0), ("Mumbai", 12 * HOUR)]) == 0
+
+
+def test_unresolved_pair_returns_none_unless_another_pair_is_infeasible(engine):
+    assert engine.check([("Delhi", 0), ("Xyzpur", 60)]) is None
+    assert engine.check([("Xyzpur", 0), ("Delhi", 60), ("Mumbai", 120)]) == 1
+
+
+def test_narrower_part_must_lie_within_the_broadest(engine):
+    assert engine.resolve("Hyderabad, Gujarat").name == "Gujarat"
+    assert engine.resolve("Surat, Gujarat").name == "Surat"
@@ -0,0 +1,140 @@
+import asyncio
+import threading
+
+import pytest
+
+from micro_batcher import MicroBatcher
+
+
+class GatedBatchFn:
+    """Records every batch; the first call blocks until ``release`` so a
+    backlog can build up behind it."""
+
+    def __init__(self, fn=lambda item: item * 10):
+        self.fn = fn
+        self.batches = []
+        self.started = threading.Event()
+        self.gate = threading.Event()
+
+    def __call__(self, items):
+        self.batches.append(list(items))
+        self.started.set()
+        self.gate.wait(5)
+        return [self.fn(item) for item in items]
+
+
+async def wait_started(batch_fn):
+    assert await asyncio.to_thread(batch_fn.started.wait, 5)
+
+
+def test_idle_request_is_dispatched_alone_without_waiting():
+    batch_fn = GatedBatchFn()
+    batch_fn.gate.set()
+    batcher = MicroBatcher(batch_fn, max_batch_size=8, max_wait_ms=10000)
+
+    async def scenario():
+        return await asyncio.wait_for(batcher.submit(3), 1)
+
+    assert asyncio.run(scenario()) == 30
+    assert batch_fn.batches == [[3]]
+
+
+def test_backlog_is_batched_up_to_max_size_in_order():
+    batch_fn = GatedBatchFn()
+    batcher = MicroBatcher(batch_fn, max_batch_size=4, max_wait_ms=0)
+
+    async def scenario():
+        first = asyncio.create_task(batcher.submit(0))
+        await wait_started(batch_fn)
+        rest = [asyncio.create_task(batcher.submit(i)) for i in range(1, 11)]
+        await asyncio.sleep(0.01)
+        batch_fn.gate.set()
+        return await asyncio.gather(first, *rest)
+
+    # Every caller gets the result for its own item
+    assert asyncio.run(scenario()) == [i * 10 for i in range(11)]
+    assert batch_fn.batches == [[0], [1, 2, 3, 4], [5, 6, 7, 8], [9, 10]]
+    stats = batcher.stats()
+    assert stats["batches"] == 4 and stats["items"] == 11 and stats["max_batch_size_seen"] == 4
+    assert stats["batch_size_histogram"] == {"1": 1, "2": 1, "4": 2}
+
+
+def test_backlog_waits_up_to_max_wait_for_more_items():
+    batch_fn = GatedBatchFn()
+    batcher = MicroBatcher(batch_fn, max_batch_size=8, max_wait_ms=300)
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        first = asyncio.create_task(batcher.submit(0))
+        await wait_started(batch_fn)
+        queued = [asyncio.create_task(batcher.submit(i)) for i in (1, 2)]
+        await asyncio.sleep(0.01)
+        batch_fn.gate.set()
+        await first
+        # Arrives inside the window opened by the backlog of two
+        late = asyncio.create_task(batcher.submit(3))
+        started = loop.time()
+        await asyncio.gather(*queued, late)
+        return loop.time() - started
+
+    elapsed = asyncio.run(scenario())
+    assert batch_fn.batches == [[0], [1, 2, 3]]
+    # The window closes after max_wait even though the batch is not full
+    assert 0.2 < elapsed < 2
+
+
+def test_failed_batch_is_retried_row_by_row():
+    def fn(item):
+        if item == "bad":
+            raise ValueError("bad row")
+        return item.upper()
+
+    batch_fn = GatedBatchFn(fn)
+    batcher = MicroBatcher(batch_fn, max_batch_size=8, max_wait_ms=0)
+
+    async def scenario():
+        first = asyncio.create_task(batcher.submit("a"))
+        await wait_started(batch_fn)
+        rest = [asyncio.create_task(batcher.submit(item)) for item in ("b", "bad", "c")]
+        await asyncio.sleep(0.01)
+        batch_fn.gate.set()
+        return await asyncio.gather(first, *rest, return_exceptions=True)
+
+    first, b, bad, c = asyncio.run(scenario())
+    assert (first, b, c) == ("A", "B", "C")
+    assert isinstance(bad, ValueError)
+    assert batch_fn.batches == [["a"], ["b", "bad", "c"], ["b"], ["bad"], ["c"]]
+    # The batch and the bad row's retry failed; the retries are not counted as batches
+    stats = batcher.stats()
+    assert stats["errors"] == 2 and stats["batches"] == 2
+
+
+def test_wrong_result_count_fails_each_request():
+    batcher = MicroBatcher(lambda items: [], max_batch_size=4, max_wait_ms=0)
+
+    async def scenario():
+        return await batcher.submit(1)
+
+    with pytest.raises(RuntimeError, match="returned 0 results for 1 items"):
+        asyncio.run(scenario())
+
+
+def test_cancelled_request_is_dropped_from_its_batch():
+    batch_fn = GatedBatchFn()
+    batcher = MicroBatcher(batch_fn, max_batch_size=8, max_wait_ms=0)
+
+    async def scenario():
+        first = asyncio.create_task(batcher.submit(0))
+        await wait_started(batch_fn)
+        kept = asyncio.create_task(batcher.submit(1))
+        cancelled = asyncio.create_task(batcher.submit(2))
+        await asyncio.sleep(0.01)
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        batch_fn.gate.set()
+        results = await asyncio.gather(first, kept)
+        assert cancelled.cancelled()
+        return results
+
+    assert asyncio.run(scenario()) == [0, 10]
+    assert batch_fn.batches == [[0], [1]]
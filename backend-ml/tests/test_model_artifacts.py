@@ -0,0 +1,22 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+
+@pytest.mark.parametrize("module", ["model_artifacts", "anomaly_thresholds", "tree_compiler", "feature_encoder",
+                                    "svm_approx"])
+def test_offline_tools_do_not_import_the_app(module):
+    # A fresh interpreter, so modules other tests imported do not count
+    code = (f"import sys, {module}, model_artifacts\n"
+            "from model_registry import ModelRegistry\n"
+            "registry = ModelRegistry()\n"
+            "model_artifacts.register_fraud_artifacts(registry)\n"
+            "assert registry.state('xgboost') == 'not_loaded'\n"
+            "loaded = {'main', 'einstein_graph', 'fastapi', 'langgraph', 'redis'} & set(sys.modules)\n"
+            "assert not loaded, loaded")
+    result = subprocess.run([sys.executable, "-c", code], cwd=BACKEND, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,74 @@
+import threading
+import time
+
+import pytest
+
+from model_registry import ModelRegistry
+
+
+class FlakyLoader:
+    """Fails ``failures`` times, then returns ``value``."""
+
+    def __init__(self, failures, value="model"):
+        self.failures = failures
+        self.value = value
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise OSError(f"disk unavailable ({self.calls})")
+        return self.value
+
+
+def test_failed_load_is_retried_after_backoff():
+    registry = ModelRegistry(retry_backoff=0.05, max_retry_backoff=0.1)
+    loader = FlakyLoader(failures=2)
+    registry.register("model", loader, group="fraud")
+
+    with pytest.raises(OSError, match="1"):
+        registry.get("model")
+    # Within the backoff the cached error is raised without another attempt
+    with pytest.raises(OSError, match="1"):
+        registry.get("model")
+    assert loader.calls == 1 and registry.state("model") == "failed"
+    assert registry.status()["model"]["failures"] == 1
+
+    time.sleep(0.06)
+    with pytest.raises(OSError, match="2"):
+        registry.get("model")
+    time.sleep(0.11)
+    assert registry.get("model") == "model" and loader.calls == 3
+    assert registry.state("model") == "ready" and "failures" not in registry.status()["model"]
+
+
+def test_readiness_checks_retry_failed_groups():
+    registry = ModelRegistry(retry_backoff=0.02)
+    registry.register("index", FlakyLoader(failures=1), group="rag")
+    registry.start(["rag"])
+    with pytest.raises(OSError):
+        registry.wait(["rag"])
+    assert not registry.is_ready("rag")
+    time.sleep(0.03)
+    deadline = time.time() + 2
+    while not registry.is_ready("rag") and time.time() < deadline:
+        time.sleep(0.01)
+    assert registry.is_ready("rag")
+
+
+def test_loads_run_in_parallel_and_nested_gets_load_inline():
+    registry = ModelRegistry(max_workers=2)
+    started = threading.Barrier(2, timeout=2)
+
+    def slow(name):
+        def load():
+            started.wait()
+            return name
+        return load
+
+    registry.register("a", slow("a"), group="fraud")
+    registry.register("b", slow("b"), group="fraud")
+    # A loader built from other artifacts gets them on its own thread
+    registry.register("pair", lambda: (registry.get("a"), registry.get("b")), group="combo")
+    registry.wait(["fraud"], timeout=5)
+    assert registry.get("pair") == ("a", "b") and registry.is_ready("fraud")
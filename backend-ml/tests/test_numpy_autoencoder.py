@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from numpy_autoencoder import NumpyAutoencoder, export
+
+keras = pytest.importorskip("tensorflow.keras")
+
+
+def _autoencoder(n_features=24):
+    layers = keras.layers
+    model = keras.Sequential([
+        keras.Input(shape=(n_features,)),
+        layers.Dense(16, activation="relu"),
+        layers.BatchNormalization(),
+        layers.Dropout(0.2),
+        layers.Dense(8),
+        layers.LeakyReLU(negative_slope=0.1),
+        layers.Dense(16, activation="elu"),
+        layers.Dense(n_features, activation="linear"),
+    ])
+    # Non-trivial BatchNorm statistics, as after training
+    rng = np.random.default_rng(0)
+    batch_norm = model.layers[1]
+    gamma, beta, _, _ = batch_norm.get_weights()
+    batch_norm.set_weights([gamma * 1.5, beta + 0.1, rng.normal(size=16).astype(np.float32),
+                            rng.uniform(0.5, 2.0, 16).astype(np.float32)])
+    return model
+
+
+def test_numpy_forward_pass_matches_keras(tmp_path):
+    model = _autoencoder()
+    model_path, weights_path = str(tmp_path / "autoencoder_model.h5"), str(tmp_path / "autoencoder_weights.npz")
+    model.save(model_path)
+    spec = export(model_path, weights_path)
+    assert [layer["type"] for layer in spec] == ["dense", "affine", "dense", "activation", "dense", "dense"]
+
+    X = np.random.default_rng(1).standard_normal((2000, 24)).astype(np.float32)
+    expected = model.predict(X, verbose=0)
+    actual = NumpyAutoencoder.load(weights_path).predict(X)
+    np.testing.assert_allclose(actual, expected, rtol=1e-5, atol=1e-5)
+    # The reconstruction MSE is what the fraud score thresholds
+    np.testing.assert_allclose(np.mean((X - actual) ** 2, axis=1), np.mean((X - expected) ** 2, axis=1),
+                               rtol=1e-5, atol=1e-6)
+
+
+def test_unsupported_layer_is_rejected(tmp_path):
+    model = keras.Sequential([keras.Input(shape=(4,)), keras.layers.Dense(4), keras.layers.LayerNormalization()])
+    model_path = str(tmp_path / "model.h5")
+    model.save(model_path)
+    with pytest.raises(ValueError):
+        export(model_path, str(tmp_path / "weights.npz"))
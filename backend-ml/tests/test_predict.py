@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")
+main = pytest.importorskip("main")
+
+from fastapi import HTTPException  # noqa: E402
+
+from account_state import AccountStateStore  # noqa: E402
+
+BASE_TS = 1_750_000_000.0
+
+
+def transaction(account, amount=500.0, location="Delhi", txn_id=None, history=12):
+    previous = [{"_id": str(j), "amount": 500.0 + j, "location": "Delhi",
+                 "updatedAt": main.format_timestamp(BASE_TS - 600 * (j + 1)), "__v": 0} for j in range(history)]
+    return main.Transaction(
+        TransactionAmount=amount, TransactionType="Debit", CustomerOccupation="Engineer", AccountBalance=1e4,
+        DayOfWeek="Monday", Hour=12, Time_Gap=1.0, Hour_of_Transaction=12, AgeGroup="Adult",
+        Days_Since_Last_Transaction=1, amount=amount, oldBalanceOrig=1e4, newBalanceOrig=1e4 - amount,
+        oldBalanceDest=0.0, newBalanceDest=amount, errorBalanceOrig=0.0, errorBalanceDest=0.0,
+        location=location, senderAccountNumber=account, transactionId=txn_id, previousTransactions=previous
+    )
+
+
+@pytest.fixture
+def store(monkeypatch):
+    def fake_score_models(batch, models=None):
+        return [{"isolation_forest": 0, "svm": 0, "kmeans": 0, "autoencoder": 0,
+                 "xgboost_prob": min(txn.amount / 1e5, 1.0)} for txn in batch]
+
+    store = AccountStateStore(window=main.LOCATION_WINDOW)
+    monkeypatch.setattr(main, "score_models", fake_score_models)
+    monkeypatch.setattr(main, "account_store", store)
+    monkeypatch.setattr(main, "PREDICT_MICROBATCH_ENABLED", False)
+    monkeypatch.setattr(main, "PREDICT_CASCADE_ENABLED", False)
+    monkeypatch.setattr(main, "LOCATION_LLM_FALLBACK", False)
+    return store
+
+
+def test_retried_request_is_recorded_once(store):
+    txn = transaction("acc", txn_id="t1")
+    first = asyncio.run(main.predict_combined(txn))
+    second = asyncio.run(main.predict_combined(txn))
+    assert store.snapshot("acc").amounts.n == 13 and store.stats()["duplicates"] == 1
+    # Without an id, the identical payload is taken for a retry too
+    asyncio.run(main.predict_combined(transaction("acc")))
+    asyncio.run(main.predict_combined(transaction("acc")))
+    assert store.snapshot("acc").amounts.n == 14
+    assert first["model_scores"] == second["model_scores"]
+
+
+def test_failed_request_is_not_recorded(store, monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError("scoring failed")
+
+    monkeypatch.setattr(main, "build_prediction", broken)
+    with pytest.raises(HTTPException):
+        asyncio.run(main.predict_combined(transaction("acc", txn_id="t1")))
+    assert len(store) == 0
+
+
+def test_batch_matches_predict_on_the_same_state(store):
+    # Rolling state for two accounts, one with a spike and an impossible trip ahead
+    for i in range(15):
+        main.record_account(transaction("a", amount=500.0 + i, txn_id=f"a{i}"), BASE_TS + 60 * i)
+        main.record_account(transaction("b", amount=500.0 + i, txn_id=f"b{i}"), BASE_TS + 60 * i)
+    txns = [transaction("a", amount=501.0), transaction("b", amount=90000.0, location="Mumbai"),
+            transaction(None, amount=700.0)]
+    now = BASE_TS + 1000
+
+    async def scenario():
+        expected = [await main.predict_full(txn, main.account_snapshot(txn), now) for txn in txns]
+        return expected, await main.score_transactions(txns, now)
+
+    expected, batch = asyncio.run(scenario())
+    assert batch == expected
+    assert batch[1]["spike_score"]["amount_spike"] == 1 and batch[1]["ai_location_score"] == 1
+    # Re-scoring does not count the transactions again
+    assert store.snapshot("a").amounts.n == 12 + 15
@@ -0,0 +1,48 @@
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from prompt_history import HistoryRenderer, estimate_tokens
+
+
+def _turn(i, tool_chars=10000):
+    return [
+        HumanMessage(content=f"Question {i}?", id=f"h{i}"),
+        AIMessage(content="", tool_calls=[{"id": f"c{i}", "name": "get_stats_by_region", "args": {"region": "N"}}],
+                  id=f"a{i}"),
+        ToolMessage(content="x" * tool_chars, tool_call_id=f"c{i}", id=f"t{i}"),
+        AIMessage(content=f"Answer {i}.", id=f"r{i}"),
+    ]
+
+
+def test_changed_content_is_rendered_again():
+    renderer = HistoryRenderer(history_tokens=10 ** 6, max_tool_chars=8000)
+    messages = _turn(0)
+    renderer.render(messages)
+    # The checkpointer stores the tool output truncated; the same message id comes back shorter
+    stored = [m.model_copy(update={"content": m.content[:4000]}) if isinstance(m, ToolMessage) else m
+              for m in messages]
+    assert renderer.render(stored) == HistoryRenderer(history_tokens=10 ** 6, max_tool_chars=8000).render(stored)
+
+
+def test_tool_output_is_capped_in_the_prompt():
+    rendered = HistoryRenderer(history_tokens=10 ** 6, max_tool_chars=500).render(_turn(0))
+    tool_line = next(line for line in rendered.splitlines() if line.startswith("ToolMessage"))
+    assert len(tool_line) < 600 and "characters truncated" in tool_line
+
+
+def test_cache_is_bounded_by_tokens():
+    renderer = HistoryRenderer(max_tool_chars=4000, max_cached_tokens=5000)
+    for i in range(50):
+        renderer.render(_turn(i))
+        assert renderer.stats()["cached_tokens"] <= 5000
+
+
+def test_history_stays_within_budget():
+    renderer = HistoryRenderer(history_tokens=300, summary_tokens=100, max_tool_chars=200)
+    messages = [m for i in range(100) for m in _turn(i)]
+    rendered = renderer.render(messages)
+    assert estimate_tokens(rendered) < 300 + 100 + 50
+    assert rendered.rstrip().endswith("Answer 99.")
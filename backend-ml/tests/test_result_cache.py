@@ -0,0 +1,109 @@
+import asyncio
+import threading
+
+import pytest
+
+from result_cache import CacheBackend, InProcessBackend, ResultCache
+
+
+class RecordingBackend(InProcessBackend):
+    """An in-process store that declares itself blocking and records the threads it was called on."""
+
+    blocking = True
+
+    def __init__(self):
+        super().__init__()
+        self.threads = set()
+
+    def get(self, key):
+        self.threads.add(threading.get_ident())
+        return super().get(key)
+
+    def set(self, key, value, ttl):
+        self.threads.add(threading.get_ident())
+        super().set(key, value, ttl)
+
+
+def counting_compute(delay=0.05):
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return {"score": len(calls)}
+
+    return compute, calls
+
+
+def test_concurrent_misses_compute_once():
+    async def scenario():
+        cache = ResultCache(InProcessBackend())
+        compute, calls = counting_compute()
+        results = await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(5)))
+        assert results == [{"score": 1}] * 5 and len(calls) == 1
+        assert await cache.get_or_compute("k", compute) == {"score": 1}
+        assert cache.stats()["coalesced"] == 4 and cache.stats()["hits"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_leader_hands_over_to_a_waiter():
+    async def scenario():
+        cache = ResultCache(InProcessBackend())
+        compute, calls = counting_compute()
+        leader = asyncio.create_task(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(cache.get_or_compute("k", compute)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        assert await asyncio.gather(*waiters) == [{"score": 2}] * 3
+        assert len(calls) == 2 and cache.stats()["takeovers"] == 1 and not cache._in_flight
+
+    asyncio.run(scenario())
+
+
+def test_compute_errors_reach_every_waiter():
+    async def scenario():
+        cache = ResultCache(InProcessBackend())
+
+        async def compute():
+            await asyncio.sleep(0.01)
+            raise ValueError("model failed")
+
+        results = await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(3)),
+                                       return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+
+    asyncio.run(scenario())
+
+
+def test_blocking_backend_runs_off_the_event_loop():
+    async def scenario():
+        backend = RecordingBackend()
+        cache = ResultCache(backend)
+        compute, _ = counting_compute(0)
+        await cache.get_or_compute("k", compute)
+        await cache.get_or_compute("k", compute)
+        return backend.threads
+
+    threads = asyncio.run(scenario())
+    assert threads and threading.get_ident() not in threads
+
+
+def test_backend_failure_falls_back_to_compute():
+    class Broken(CacheBackend):
+        def get(self, key):
+            raise ConnectionError("down")
+
+        def set(self, key, value, ttl):
+            raise ConnectionError("down")
+
+    async def scenario():
+        cache = ResultCache(Broken())
+        compute, calls = counting_compute(0)
+        assert await cache.get_or_compute("k", compute) == {"score": 1}
+        assert cache.stats()["backend_errors"] == 2
+
+    asyncio.run(scenario())
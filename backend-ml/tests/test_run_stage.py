@@ -0,0 +1,89 @@
+import asyncio
+import logging
+
+import pytest
+
+pytest.importorskip("fastapi")
+main = pytest.importorskip("main")
+
+
+class SlowStage:
+    """A stage that takes ``seconds`` and records whether it finished or was cancelled."""
+
+    def __init__(self, seconds, result=1, error=None):
+        self.seconds = seconds
+        self.result = result
+        self.error = error
+        self.finished = False
+        self.cancelled = False
+
+    async def __call__(self):
+        try:
+            await asyncio.sleep(self.seconds)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        self.finished = True
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+@pytest.fixture(autouse=True)
+def short_budgets(monkeypatch):
+    monkeypatch.setitem(main.STAGE_TIMEOUTS, "location", 0.05)
+    monkeypatch.setitem(main.STAGE_TIMEOUTS, "models", 0.05)
+
+
+def test_stage_within_budget_returns_its_result():
+    stage, degraded = SlowStage(0, result=1), []
+    assert asyncio.run(main.run_stage("location", stage(), degraded)) == 1
+    assert degraded == []
+
+
+def test_timed_out_stage_is_cancelled_and_falls_back():
+    stage, degraded = SlowStage(1), []
+    assert asyncio.run(main.run_stage("location", stage(), degraded)) == main.STAGE_FALLBACKS["location"]
+    assert degraded == ["location"] and stage.cancelled and not stage.finished
+
+
+def test_failed_stage_falls_back_to_a_fresh_copy():
+    degraded = []
+    result = asyncio.run(main.run_stage("models", SlowStage(0, error=ValueError("boom"))(), degraded))
+    assert result == main.STAGE_FALLBACKS["models"] and degraded == ["models"]
+    result["xgboost_prob"] = 1.0
+    assert main.STAGE_FALLBACKS["models"]["xgboost_prob"] == 0.0
+
+
+def test_zero_budget_means_no_timeout(monkeypatch):
+    monkeypatch.setitem(main.STAGE_TIMEOUTS, "location", 0.0)
+    stage, degraded = SlowStage(0.1, result=1), []
+    assert asyncio.run(main.run_stage("location", stage(), degraded)) == 1
+    assert degraded == [] and stage.finished
+
+
+def test_detached_stage_keeps_running_after_its_timeout():
+    stage, degraded = SlowStage(0.15, result=1), []
+
+    async def scenario():
+        result = await main.run_stage("location", stage(), degraded, detach=True)
+        assert not stage.finished
+        await asyncio.sleep(0.3)
+        return result
+
+    assert asyncio.run(scenario()) == 0
+    assert degraded == ["location"] and stage.finished and not stage.cancelled
+
+
+def test_detached_stage_failure_is_logged_not_raised(caplog):
+    stage, degraded = SlowStage(0.15, error=RuntimeError("einstein down")), []
+
+    async def scenario():
+        result = await main.run_stage("location", stage(), degraded, detach=True)
+        await asyncio.sleep(0.3)
+        return result
+
+    with caplog.at_level(logging.WARNING, logger=main.logger.name):
+        assert asyncio.run(scenario()) == 0
+    assert stage.finished
+    assert any("Detached stage failed: einstein down" in record.message for record in caplog.records)
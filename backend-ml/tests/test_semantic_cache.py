@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+import semantic_cache
+from semantic_cache import SemanticAnswerCache
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(semantic_cache.time, "time", clock)
+    return clock
+
+
+def rotated(vector, cosine):
+    """A vector at exactly ``cosine`` similarity to the unit vector ``vector``."""
+    other = np.zeros_like(vector)
+    other[np.argmin(np.abs(vector))] = 1.0
+    other -= (other @ vector) * vector
+    other /= np.linalg.norm(other)
+    return cosine * vector + np.sqrt(1 - cosine ** 2) * other
+
+
+def unit(i, dimension=8):
+    vector = np.zeros(dimension)
+    vector[i] = 1.0
+    return vector
+
+
+def test_hit_needs_similarity_at_threshold_and_the_same_faqs(clock):
+    cache = SemanticAnswerCache(threshold=0.95)
+    query = unit(0)
+    cache.store(query * 3, ["b", "a"], "Block it in the app.")
+
+    # Norm and FAQ order do not matter
+    assert cache.lookup(query, ["a", "b"]) == "Block it in the app."
+    assert cache.lookup(rotated(query, 0.96), ["a", "b"]) == "Block it in the app."
+    assert cache.lookup(rotated(query, 0.94), ["a", "b"]) is None
+    # Similar query, different retrieved context
+    assert cache.lookup(query, ["a", "c"]) is None
+    stats = cache.stats()
+    assert (stats["lookups"], stats["hits"]) == (4, 2) and stats["hit_rate"] == 0.5
+
+
+def test_best_match_wins(clock):
+    cache = SemanticAnswerCache(threshold=0.9)
+    query = unit(0)
+    cache.store(rotated(query, 0.92), ["a"], "close")
+    cache.store(rotated(query, 0.99), ["a"], "closer")
+    assert cache.lookup(query, ["a"]) == "closer"
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = SemanticAnswerCache(ttl=60)
+    cache.store(unit(0), ["a"], "answer")
+    clock.now += 59
+    assert cache.lookup(unit(0), ["a"]) == "answer"
+    clock.now += 2
+    assert cache.lookup(unit(0), ["a"]) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_full_cache_reuses_expired_slots_then_evicts_least_recently_used(clock):
+    cache = SemanticAnswerCache(ttl=100, max_entries=3)
+    for i in range(3):
+        cache.store(unit(i), ["a"], f"answer {i}")
+        clock.now += 1
+    # Touch entry 0, so entry 1 is now the least recently used
+    assert cache.lookup(unit(0), ["a"]) == "answer 0"
+
+    cache.store(unit(3), ["a"], "answer 3")
+    assert cache.lookup(unit(1), ["a"]) is None
+    assert [cache.lookup(unit(i), ["a"]) for i in (0, 2, 3)] == ["answer 0", "answer 2", "answer 3"]
+    assert cache.stats()["evicted"] == 1
+
+    # Entry 0 has expired, 2 and 3 have not: the expired slot is reused before
+    # anything live is evicted
+    clock.now += 98.5
+    cache.store(unit(4), ["a"], "answer 4")
+    stats = cache.stats()
+    assert stats["expired_replaced"] == 1 and stats["evicted"] == 1 and stats["entries"] == 3
+    assert [cache.lookup(unit(i), ["a"]) for i in (2, 3, 4)] == ["answer 2", "answer 3", "answer 4"]
+
+
+def test_empty_cache_misses(clock):
+    cache = SemanticAnswerCache()
+    assert cache.lookup(unit(0), ["a"]) is None
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,99 @@
+import asyncio
+import threading
+from typing import Annotated, List, TypedDict
+
+import pytest
+
+pytest.importorskip("langgraph")
+
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage, ToolMessage  # noqa: E402
+from langgraph.graph import END, START, StateGraph  # noqa: E402
+
+from session_store import SessionCheckpointer, capped_messages  # noqa: E402
+
+
+class State(TypedDict):
+    messages: Annotated[List[AnyMessage], capped_messages(6)]
+
+
+def build_graph(checkpointer):
+    def reply(state):
+        question = state["messages"][-1].content
+        return {"messages": [ToolMessage(content="x" * 5000, tool_call_id=question),
+                             AIMessage(content=f"Answer to {question}")]}
+
+    graph = StateGraph(State)
+    graph.add_node("reply", reply)
+    graph.add_edge(START, "reply")
+    graph.add_edge("reply", END)
+    return graph.compile(checkpointer=checkpointer)
+
+
+class RecordingCheckpointer(SessionCheckpointer):
+    """Records the threads the sync methods run on."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.threads = set()
+
+    def get_tuple(self, config):
+        self.threads.add(threading.get_ident())
+        return super().get_tuple(config)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        self.threads.add(threading.get_ident())
+        return super().put(config, checkpoint, metadata, new_versions)
+
+
+def run_turns(checkpointer, sessions=4, turns=3):
+    graph = build_graph(checkpointer)
+
+    async def scenario():
+        for turn in range(turns):
+            for session in range(sessions):
+                config = {"configurable": {"thread_id": f"s{session}"}}
+                state = await graph.ainvoke({"messages": [HumanMessage(content=f"Question {turn}")]}, config)
+                assert state["messages"][-1].content == f"Answer to Question {turn}"
+                # The earlier turns came back from memory or from the spill file
+                if turn:
+                    assert state["messages"][-4].content == f"Answer to Question {turn - 1}"
+        return state
+
+    return asyncio.run(scenario())
+
+
+def test_spilled_sessions_resume_and_io_runs_off_the_loop(tmp_path):
+    checkpointer = RecordingCheckpointer(max_bytes=6000, spill_path=str(tmp_path / "sessions.sqlite"),
+                                         max_tool_chars=200)
+    state = run_turns(checkpointer)
+    stats = checkpointer.stats()
+    assert stats["spilled"] > 0 and stats["restored"] > 0
+    assert checkpointer.threads and threading.get_ident() not in checkpointer.threads
+    # Earlier tool output comes back truncated; the current turn's is still whole
+    tool_messages = [message for message in state["messages"] if isinstance(message, ToolMessage)]
+    assert [len(message.content) < 300 for message in tool_messages] == [True] * (len(tool_messages) - 1) + [False]
+    assert len(state["messages"]) <= 6
+
+
+def test_in_memory_sessions_stay_on_the_loop():
+    checkpointer = RecordingCheckpointer()
+    run_turns(checkpointer, sessions=2, turns=2)
+    assert checkpointer.threads == {threading.get_ident()}
+
+
+def test_put_leaves_the_callers_checkpoint_unchanged():
+    from langgraph.checkpoint.base import empty_checkpoint
+
+    checkpointer = SessionCheckpointer(max_tool_chars=100)
+    messages = [HumanMessage(content="Question"), ToolMessage(content="x" * 5000, tool_call_id="t1")]
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = {"messages": messages}
+    checkpoint["channel_versions"] = {"messages": 1}
+    config = {"configurable": {"thread_id": "s1"}}
+
+    checkpointer.put(config, checkpoint, {}, {"messages": 1})
+
+    assert checkpoint["channel_values"]["messages"] is messages
+    assert len(messages[1].content) == 5000
+    stored = checkpointer.get_tuple(config).checkpoint["channel_values"]["messages"]
+    assert len(stored[1].content) < 200
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from svm_approx import ApproximateOneClassSVM
+
+pytest.importorskip("sklearn")
+from sklearn.svm import OneClassSVM  # noqa: E402
+
+# Lowest label agreement with the exact model each mode must reach. These are
+# realistic, not aspirational: RFF converges slowly (error ~ 1/sqrt(n)), and
+# pruning only catches up once it keeps a good share of the support vectors.
+MIN_AGREEMENT = {
+    "nystroem": {50: 0.93, 200: 0.98, 500: 0.995},
+    "pruned": {50: 0.80, 200: 0.87, 500: 0.99},
+    "rff": {50: 0.70, 200: 0.85, 500: 0.90},
+}
+
+
+@pytest.fixture(scope="module")
+def fitted():
+    rng = np.random.default_rng(0)
+    features = 12
+    X = np.vstack([rng.normal(size=(3000, features)), rng.normal(loc=2, size=(1000, features))])
+    svm = OneClassSVM(gamma="scale", nu=0.2).fit(X)
+    # Inliers from both clusters plus a wide cloud of outliers
+    X_test = np.vstack([rng.normal(size=(3000, features)), rng.normal(loc=2, size=(1000, features)),
+                        rng.normal(scale=2.5, size=(1000, features))])
+    return svm, X_test, svm.decision_function(X_test)
+
+
+@pytest.mark.parametrize("mode", sorted(MIN_AGREEMENT))
+def test_agreement_with_the_exact_model(fitted, mode):
+    svm, X_test, _ = fitted
+    assert len(svm.support_vectors_) > 500
+    for n_components, minimum in MIN_AGREEMENT[mode].items():
+        approx = ApproximateOneClassSVM.from_model(svm, mode, n_components, random_state=0)
+        agreement = np.mean(approx.predict(X_test) == svm.predict(X_test))
+        assert agreement >= minimum, f"{mode} n={n_components}: {agreement:.4f} < {minimum}"
+
+
+@pytest.mark.parametrize("mode", ["nystroem", "pruned"])
+def test_keeping_every_support_vector_is_exact(fitted, mode):
+    svm, X_test, exact = fitted
+    approx = ApproximateOneClassSVM.from_model(svm, mode, n_components=len(svm.support_vectors_))
+    np.testing.assert_allclose(approx.decision_function(X_test), exact, atol=1e-9)
+    np.testing.assert_array_equal(approx.predict(X_test), svm.predict(X_test))
+
+
+def test_only_known_modes_and_the_rbf_kernel_are_accepted(fitted):
+    svm, X_test, _ = fitted
+    with pytest.raises(ValueError, match="Unknown SVM approximation mode"):
+        ApproximateOneClassSVM.from_model(svm, "sketch")
+    linear = OneClassSVM(kernel="linear").fit(X_test[:200])
+    with pytest.raises(ValueError, match="Only the RBF kernel"):
+        ApproximateOneClassSVM.from_model(linear)
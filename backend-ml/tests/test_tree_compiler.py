@@ -0,0 +1,67 @@
+import re
+
+import numpy as np
+import pytest
+
+from tree_compiler import DECISION_THRESHOLDS, CompiledIsolationForest, CompiledXGBClassifier
+
+xgb = pytest.importorskip("xgboost")
+
+
+def _data(rows=3000, features=8, seed=0, nan_rate=0.05):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(rows, features)).astype(np.float32)
+    y = (X[:, 0] + X[:, 1] * X[:, 2] + rng.normal(size=rows) * 0.5 > 0.3).astype(int)
+    X[rng.random(X.shape) < nan_rate] = np.nan
+    return X, y
+
+
+@pytest.mark.parametrize("base_score", [None, 0.3, 0.17, 0.77])
+def test_xgboost_margins_match_booster(base_score):
+    X, y = _data()
+    model = xgb.XGBClassifier(n_estimators=60, max_depth=5, base_score=base_score).fit(X, y)
+    compiled = CompiledXGBClassifier.from_model(model)
+    X_test, _ = _data(seed=1)
+    booster = model.get_booster()
+
+    expected_leaves = booster.predict(xgb.DMatrix(X_test), pred_leaf=True)
+    leaves = compiled.trees.apply(X_test, strict=True) - compiled.trees.roots
+    # Rows of a tree are its nodes in node-id order
+    for t, dump in enumerate(booster.get_dump(dump_format="json")):
+        node_ids = np.array(sorted(int(n) for n in re.findall(r'"nodeid": (\d+)', dump)))
+        np.testing.assert_array_equal(node_ids[leaves[:, t]], expected_leaves[:, t])
+
+    expected_margin = booster.predict(xgb.DMatrix(X_test), output_margin=True)
+    np.testing.assert_array_equal(compiled.predict_margin(X_test), expected_margin)
+
+
+@pytest.mark.parametrize("base_score", [None, 0.3, 0.17])
+def test_xgboost_probabilities_match_predict_proba(base_score):
+    X, y = _data()
+    model = xgb.XGBClassifier(n_estimators=60, max_depth=5, base_score=base_score).fit(X, y)
+    compiled = CompiledXGBClassifier.from_model(model)
+    X_test, _ = _data(seed=1)
+
+    expected = model.predict_proba(X_test)
+    actual = compiled.predict_proba(X_test)
+    # Known deviation: the margins are equal, but XGBoost's expf is not always
+    # correctly rounded, so an occasional probability differs by up to 2 ulp.
+    # That must never change a decision at the thresholds the scores are read at.
+    np.testing.assert_array_max_ulp(actual[:, 1], expected[:, 1], maxulp=2)
+    assert np.count_nonzero(actual[:, 1] != expected[:, 1]) <= len(X_test) // 1000
+    for threshold in DECISION_THRESHOLDS:
+        np.testing.assert_array_equal(actual[:, 1] > threshold, expected[:, 1] > threshold)
+    np.testing.assert_array_equal(actual[:, 0], np.float32(1.0) - actual[:, 1])
+
+
+@pytest.mark.parametrize("max_features", [1.0, 0.5])
+def test_isolation_forest_scores_match_sklearn(max_features):
+    from sklearn.ensemble import IsolationForest
+
+    X, _ = _data(nan_rate=0)
+    model = IsolationForest(n_estimators=50, max_features=max_features, random_state=0).fit(X)
+    compiled = CompiledIsolationForest.from_model(model)
+    X_test, _ = _data(seed=1, nan_rate=0)
+
+    np.testing.assert_array_equal(compiled.score_samples(X_test), model.score_samples(X_test))
+    np.testing.assert_array_equal(compiled.predict(X_test), model.predict(X_test))
@@ -0,0 +1,319 @@
+"""Flat, array-backed scorers for the XGBoost and IsolationForest ensembles.
+
+Both pickled models walk their trees through Python/Cython wrapper objects
+(a DMatrix built from a DataFrame for XGBoost, one ``apply`` call per tree
+for the IsolationForest). Here every tree of an ensemble is flattened into one
+node table of contiguous NumPy arrays (feature, threshold, left, right,
+missing, value) and all trees are walked at once, level by level, for any
+number of rows.
+
+The traversal reproduces each library's arithmetic: XGBoost compares float32
+features with ``<`` against float32 split values and accumulates leaf values
+tree by tree in float32; scikit-learn casts X to float32, compares with ``<=``
+against float64 thresholds and sums path lengths in float64.
+
+Usage:
+    python tree_compiler.py verify --data reference.csv [--rows 10000]
+"""
+import argparse
+import json
+import sys
+from typing import List, Optional
+
+import numpy as np
+
+
+class FlatTreeEnsemble:
+    """Node table for a list of binary trees.
+
+    Leaves point ``left``/``right``/``missing`` at themselves, so after
+    ``max_depth`` steps every row has settled on a leaf and no per-row
+    termination check is needed.
+    """
+
+    def __init__(self, feature, threshold, left, right, missing, value, roots, max_depth: int):
+        self.feature = np.ascontiguousarray(feature, dtype=np.int32)
+        self.threshold = np.ascontiguousarray(threshold)
+        self.left = np.ascontiguousarray(left, dtype=np.int32)
+        self.right = np.ascontiguousarray(right, dtype=np.int32)
+        self.missing = np.ascontiguousarray(missing, dtype=np.int32)
+        self.value = np.ascontiguousarray(value)
+        self.roots = np.ascontiguousarray(roots, dtype=np.int32)
+        self.max_depth = max_depth
+
+    def __len__(self):
+        return len(self.roots)
+
+    def apply(self, X: np.ndarray, strict: bool) -> np.ndarray:
+        """Returns the leaf index reached in every tree, shape (n_rows, n_trees).
+
+        ``strict`` selects ``x < threshold`` (XGBoost) over ``x <= threshold``
+        (scikit-learn) for going left; NaN features follow ``missing``.
+        """
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[nodes]]
+            threshold = self.threshold[nodes]
+            go_left = x < threshold if strict else x <= threshold
+            next_nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+            nan = np.isnan(x)
+            if nan.any():
+                next_nodes = np.where(nan, self.missing[nodes], next_nodes)
+            nodes = next_nodes
+        return nodes
+
+
+def _as_float32_matrix(X) -> np.ndarray:
+    if hasattr(X, "toarray"):
+        X = X.toarray()
+    return np.ascontiguousarray(np.asarray(X, dtype=np.float32).reshape(-1, np.shape(X)[-1]))
+
+
+# ============ XGBoost ============
+
+# Probability cut-offs the fraud score is read at; parity is checked as "no
+# decision flips" at each of them
+DECISION_THRESHOLDS = (0.3, 0.4, 0.8)
+
+def _xgb_feature_index(split: str, feature_names: Optional[List[str]]) -> int:
+    if feature_names and split in feature_names:
+        return feature_names.index(split)
+    if split.startswith("f") and split[1:].isdigit():
+        return int(split[1:])
+    raise ValueError(f"Unknown XGBoost split feature: {split}")
+
+
+class CompiledXGBClassifier:
+    """Binary ``binary:logistic`` booster scored from a flat node table."""
+
+    def __init__(self, trees: FlatTreeEnsemble, base_margin: np.float32, feature_names: Optional[List[str]]):
+        self.trees = trees
+        self.base_margin = np.float32(base_margin)
+        self.feature_names = feature_names
+
+    @classmethod
+    def from_model(cls, xgb_model) -> "CompiledXGBClassifier":
+        booster = xgb_model.get_booster() if hasattr(xgb_model, "get_booster") else xgb_model
+        config = json.loads(booster.save_config())
+        learner = config["learner"]
+        objective = learner["objective"]["name"]
+        if objective != "binary:logistic":
+            raise ValueError(f"Unsupported XGBoost objective: {objective}")
+        base_score = np.float32(float(str(learner["learner_model_param"]["base_score"]).strip("[]")))
+        # The booster keeps base_score as a probability and works from its logit,
+        # -logf(1/p - 1) in float32 (a float64 logit rounds differently). As for
+        # the sigmoid, the log is taken in float64 and rounded to match logf
+        base_margin = np.float32(-np.log(np.float64(np.float32(1.0) / base_score - np.float32(1.0))))
+
+        dumps = booster.get_dump(dump_format="json")
+        # predict_proba stops at the best iteration when early stopping was used
+        best_iteration = getattr(xgb_model, "best_iteration", None) if hasattr(xgb_model, "get_booster") else None
+        if best_iteration is not None:
+            trees_per_round = len(dumps) // booster.num_boosted_rounds()
+            dumps = dumps[:(best_iteration + 1) * trees_per_round]
+
+        feature_names = list(booster.feature_names) if booster.feature_names else None
+        table = {key: [] for key in ("feature", "threshold", "left", "right", "missing", "value")}
+        roots, max_depth = [], 0
+        for dump in dumps:
+            tree = json.loads(dump)
+            offset = len(table["feature"])
+            nodes = {}
+            stack = [(tree, 0)]
+            while stack:
+                node, depth = stack.pop()
+                nodes[node["nodeid"]] = node
+                max_depth = max(max_depth, depth)
+                stack.extend((child, depth + 1) for child in node.get("children", []))
+            # Node ids can have gaps after pruning, so rows are assigned in id order
+            rows = {nodeid: offset + i for i, nodeid in enumerate(sorted(nodes))}
+            for nodeid in sorted(nodes):
+                node = nodes[nodeid]
+                row = rows[nodeid]
+                if "leaf" in node:
+                    table["feature"].append(0)
+                    table["threshold"].append(0.0)
+                    table["left"].append(row)
+                    table["right"].append(row)
+                    table["missing"].append(row)
+                    table["value"].append(node["leaf"])
+                else:
+                    if "split_condition" not in node:
+                        raise ValueError("Categorical XGBoost splits are not supported")
+                    table["feature"].append(_xgb_feature_index(node["split"], feature_names))
+                    table["threshold"].append(node["split_condition"])
+                    table["left"].append(rows[node["yes"]])
+                    table["right"].append(rows[node["no"]])
+                    table["missing"].append(rows[node["missing"]])
+                    table["value"].append(0.0)
+            roots.append(offset)
+
+        trees = FlatTreeEnsemble(
+            table["feature"], np.asarray(table["threshold"], dtype=np.float32),
+            table["left"], table["right"], table["missing"],
+            np.asarray(table["value"], dtype=np.float32), roots, max_depth
+        )
+        return cls(trees, base_margin, feature_names)
+
+    def predict_margin(self, X) -> np.ndarray:
+        leaves = self.trees.apply(_as_float32_matrix(X), strict=True)
+        margin = np.full(leaves.shape[0], self.base_margin, dtype=np.float32)
+        # Tree by tree, in float32, the same order the booster accumulates in
+        for t in range(leaves.shape[1]):
+            margin += self.trees.value[leaves[:, t]]
+        return margin
+
+    def predict_proba(self, X) -> np.ndarray:
+        margin = self.predict_margin(X)
+        # XGBoost's float32 sigmoid; exp is taken in float64 and rounded so it
+        # matches a correctly rounded expf. The platform expf XGBoost calls is
+        # not always correctly rounded, so a rare probability differs by up to
+        # 2 ulp. Margins are exact, and verify() and the tests require zero
+        # decision flips at DECISION_THRESHOLDS
+        exp = np.exp(np.minimum(-margin, np.float32(88.7)).astype(np.float64)).astype(np.float32)
+        prob = np.float32(1.0) / (exp + np.float32(1.0))
+        return np.column_stack([np.float32(1.0) - prob, prob])
+
+
+# ============ IsolationForest ============
+
+def _average_path_length(n_samples: np.ndarray) -> np.ndarray:
+    """scikit-learn's ``_average_path_length``: the expected path length of an
+    unsuccessful BST search over ``n_samples`` points."""
+    n_samples = np.asarray(n_samples, dtype=np.float64)
+    result = np.zeros(n_samples.shape, dtype=np.float64)
+    mask_2 = n_samples == 2
+    not_mask = ~(n_samples <= 1) & ~mask_2
+    result[mask_2] = 1.0
+    result[not_mask] = (
+        2.0 * (np.log(n_samples[not_mask] - 1.0) + np.euler_gamma)
+        - 2.0 * (n_samples[not_mask] - 1.0) / n_samples[not_mask]
+    )
+    return result
+
+
+class CompiledIsolationForest:
+    """IsolationForest whose per-leaf path lengths are precomputed, so scoring is
+    one traversal plus a lookup per tree."""
+
+    def __init__(self, trees: FlatTreeEnsemble, offset: float, max_samples: int):
+        self.trees = trees
+        self.offset = offset
+        self.denominator = len(trees) * float(_average_path_length([max_samples])[0])
+
+    @classmethod
+    def from_model(cls, iso_forest) -> "CompiledIsolationForest":
+        n_features = iso_forest.n_features_in_
+        subsample_features = iso_forest._max_features != n_features
+        table = {key: [] for key in ("feature", "threshold", "left", "right", "value")}
+        roots, max_depth, offset = [], 0, 0
+        for estimator, features in zip(iso_forest.estimators_, iso_forest.estimators_features_):
+            tree = estimator.tree_
+            is_leaf = tree.children_left == -1
+            own = offset + np.arange(tree.node_count)
+
+            depth = np.zeros(tree.node_count, dtype=np.int64)
+            for node in range(tree.node_count):  # children always follow their parent
+                if not is_leaf[node]:
+                    depth[tree.children_left[node]] = depth[node] + 1
+                    depth[tree.children_right[node]] = depth[node] + 1
+            max_depth = max(max_depth, int(depth.max()))
+
+            feature = np.where(is_leaf, 0, tree.feature)
+            if subsample_features:
+                feature = np.asarray(features)[feature]
+            table["feature"].append(feature)
+            table["threshold"].append(np.where(is_leaf, 0.0, tree.threshold))
+            table["left"].append(np.where(is_leaf, own, offset + tree.children_left))
+            table["right"].append(np.where(is_leaf, own, offset + tree.children_right))
+            # Same expression, in the same order, as IsolationForest._compute_score_samples
+            path_length = (depth + 1).astype(np.float64)
+            table["value"].append(path_length + _average_path_length(tree.n_node_samples) - 1.0)
+            roots.append(offset)
+            offset += tree.node_count
+
+        left = np.concatenate(table["left"])
+        trees = FlatTreeEnsemble(
+            np.concatenate(table["feature"]), np.concatenate(table["threshold"]).astype(np.float64),
+            left, np.concatenate(table["right"]), left,
+            np.concatenate(table["value"]).astype(np.float64), roots, max_depth
+        )
+        max_samples = getattr(iso_forest, "max_samples_", None) or iso_forest._max_samples
+        return cls(trees, float(iso_forest.offset_), max_samples)
+
+    def score_samples(self, X) -> np.ndarray:
+        # float32 features, widened for the comparison against float64 thresholds
+        leaves = self.trees.apply(_as_float32_matrix(X).astype(np.float64), strict=False)
+        depths = np.zeros(leaves.shape[0], dtype=np.float64)
+        for t in range(leaves.shape[1]):
+            depths += self.trees.value[leaves[:, t]]
+        if self.denominator == 0:
+            return -np.full(leaves.shape[0], 0.5)
+        return -(2 ** (-depths / self.denominator))
+
+    def decision_function(self, X) -> np.ndarray:
+        return self.score_samples(X) - self.offset
+
+    def predict(self, X) -> np.ndarray:
+        is_inlier = np.ones(np.shape(X)[0], dtype=int)
+        is_inlier[self.decision_function(X) < 0] = -1
+        return is_inlier
+
+
+# ============ Parity check ============
+
+def verify(data_path: str, rows: int = 10000) -> bool:
+    """Scores ``rows`` rows of a reference CSV (with the /predict input columns)
+    through the pickled models and the compiled ones and reports the differences."""
+    import joblib
+    import pandas as pd
+
+    from model_artifacts import OLD_MODEL_FEATURES, OLD_MODEL_INPUT_FIELDS, XGB_FEATURES
+
+    data = pd.read_csv(data_path, nrows=rows)
+    ok = True
+
+    xgb_model = joblib.load('xgb_fraud_model.pkl')
+    compiled_xgb = CompiledXGBClassifier.from_model(xgb_model)
+    expected = xgb_model.predict_proba(data[XGB_FEATURES])[:, 1]
+    actual = compiled_xgb.predict_proba(data[XGB_FEATURES].to_numpy(dtype=np.float32))[:, 1]
+    mismatches = int(np.count_nonzero(expected != actual))
+    flips = {threshold: int(np.count_nonzero((expected > threshold) != (actual > threshold)))
+             for threshold in DECISION_THRESHOLDS}
+    print(f"xgboost: {len(compiled_xgb.trees)} trees, {mismatches}/{len(data)} probabilities differ, "
+          f"max |diff| = {float(np.max(np.abs(expected - actual))):.3e}, decision flips {flips}")
+    # A few probabilities may differ by an ulp or two (see predict_proba); no
+    # decision may
+    ok &= not any(flips.values())
+
+    preprocessor = joblib.load('preprocessor.pkl')
+    iso_forest = joblib.load('isolation_forest_model.pkl')
+    compiled_iso = CompiledIsolationForest.from_model(iso_forest)
+    input_old = data[OLD_MODEL_INPUT_FIELDS]
+    input_old.columns = OLD_MODEL_FEATURES
+    X_transformed = preprocessor.transform(input_old)
+    expected_scores = iso_forest.score_samples(X_transformed)
+    actual_scores = compiled_iso.score_samples(X_transformed)
+    score_mismatches = int(np.count_nonzero(expected_scores != actual_scores))
+    label_mismatches = int(np.count_nonzero(iso_forest.predict(X_transformed) != compiled_iso.predict(X_transformed)))
+    print(f"isolation_forest: {len(compiled_iso.trees)} trees, {score_mismatches}/{len(data)} scores and "
+          f"{label_mismatches}/{len(data)} labels differ")
+    ok &= score_mismatches == 0 and label_mismatches == 0
+    return ok
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Check the compiled tree scorers against the pickled models")
+    sub = parser.add_subparsers(dest="command", required=True)
+    verify_cmd = sub.add_parser("verify", help="Compare compiled and pickled predictions on a reference CSV")
+    verify_cmd.add_argument("--data", required=True, help="CSV with the /predict input columns")
+    verify_cmd.add_argument("--rows", type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    if args.command == "verify" and not verify(args.data, args.rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -68,9 +68,11 @@ export const createTransaction = asyncHandler(async (req, res) => {
     const now = new Date();
     const hour = now.getHours();
 
+    // Only the fields the ML service analyses; it keeps per-account rolling
+    // state and uses this history just to seed accounts it has not seen yet
     const previousTransaction = await Transaction.find({
         senderAccountNumber
-    }).sort({ createdAt: -1 }).limit(3);
+    }).sort({ createdAt: -1 }).limit(3).select('amount location createdAt updatedAt');
 
     const previousDate = previousTransaction[0] ? previousTransaction[0].createdAt : now;
     const timeGapMinutes = Math.floor(Math.abs(now - previousDate) / (1000 * 60));
@@ -93,7 +95,8 @@ export const createTransaction = asyncHandler(async (req, res) => {
         AgeGroup: getAgeGroup(senderAccount.age),
         Days_Since_Last_Transaction: daysSinceLastTxn,
         location : location,
-        previousTransactions : previousTransaction,
+        senderAccountNumber : senderAccountNumber,
+        previousTransactions : previousTransaction.map(({ amount, location, updatedAt }) => ({ amount, location, updatedAt })),
         // XGBoost model inputs
         amount : Number(amount),
         oldBalanceOrig : Number(oldBalanceOrig),